@@ -0,0 +1,143 @@
+"""
+Background image loading for the viewer.
+
+Decoding the JPEGs used to take longer than everything else before the
+first frame, so AssetLoader does it on a worker thread while the window
+is already drawing. Each decoded image is cached as a raw bottom-up RGBA
+blob in CACHE_DIR, keyed by the file's path, size and mtime and by the
+decode size, and later launches memory-map the blob instead of decoding.
+Uploading to OpenGL stays with the caller, on the thread that owns the
+context.
+"""
+
+import hashlib
+import mmap
+import os
+import queue
+import struct
+import threading
+
+CACHE_DIR = os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'),
+                         'pyrubik')
+BLOB_HEADER = struct.Struct('<4sII')
+BLOB_MAGIC = b'RGBA'
+
+
+def blob_path(path, min_size=None):
+    """
+    Cache file for an image at one decode size: <name>-<size>-<digest>.rgba,
+    where the digest covers the image's path, length and mtime.
+    """
+    st = os.stat(path)
+    key = f"{os.path.abspath(path)}|{st.st_size}|{st.st_mtime_ns}"
+    stem = os.path.splitext(os.path.basename(path))[0]
+    size = f"{min_size[0]}x{min_size[1]}" if min_size else 'full'
+    return os.path.join(CACHE_DIR, f"{stem}-{size}-{hashlib.sha1(key.encode()).hexdigest()[:16]}.rgba")
+
+
+def decode_image(path, min_size=None):
+    """
+    Decode an image to bottom-up RGBA rows (the order glTexImage2D reads).
+
+    Args:
+        min_size: optional (width, height); JPEGs are decoded at the
+            smallest DCT scale that still covers it
+
+    Returns:
+        (width, height, bytes)
+    """
+    from PIL import Image
+    image = Image.open(path)
+    if min_size:
+        image.draft('RGB', min_size)
+    width, height = image.size
+    return width, height, image.tobytes("raw", "RGBA", 0, -1)
+
+
+def _read_blob(blob):
+    import numpy as np
+    with open(blob, 'rb') as f:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, width, height = BLOB_HEADER.unpack_from(data)
+    if magic != BLOB_MAGIC or len(data) != BLOB_HEADER.size + width * height * 4:
+        raise ValueError(f"Corrupt image cache {blob}")
+    return width, height, np.frombuffer(data, dtype=np.uint8, offset=BLOB_HEADER.size)
+
+
+def _write_blob(blob, width, height, pixels):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    temp = f"{blob}.{os.getpid()}.tmp"
+    with open(temp, 'wb') as f:
+        f.write(BLOB_HEADER.pack(BLOB_MAGIC, width, height))
+        f.write(pixels)
+    os.replace(temp, blob)
+    # Blobs of older versions of the same image at the same size are dead weight
+    prefix, digest = os.path.basename(blob).rsplit('-', 1)
+    for name in os.listdir(CACHE_DIR):
+        if name.rsplit('-', 1)[0] == prefix and len(name) == len(prefix) + 1 + len(digest) \
+                and os.path.join(CACHE_DIR, name) != blob:
+            os.remove(os.path.join(CACHE_DIR, name))
+
+
+def load_image(path, min_size=None):
+    """
+    Image pixels from the cache, decoding (and caching) them on a miss.
+
+    Returns:
+        (width, height, pixels, cached): pixels is bytes-like bottom-up RGBA
+    """
+    blob = blob_path(path, min_size)
+    try:
+        return _read_blob(blob) + (True,)
+    except (OSError, ValueError, struct.error):
+        pass
+    width, height, pixels = decode_image(path, min_size)
+    try:
+        _write_blob(blob, width, height, pixels)
+    except OSError as e:
+        print(f"Could not cache {path}: {e}")
+    return width, height, pixels, False
+
+
+class AssetLoader:
+    """
+    Loads images on a worker thread, in the order given.
+
+    poll() returns the images finished since the last call as
+    (name, (width, height, pixels, cached)), or (name, None) when an
+    image could not be loaded.
+    """
+    def __init__(self, images, min_size=None):
+        self.images = list(images)  # (name, path)
+        self.min_size = min_size
+        self.results = queue.Queue()
+        self.remaining = len(self.images)
+        self.thread = threading.Thread(target=self._load, daemon=True)
+        self.thread.start()
+
+    def _load(self):
+        for name, path in self.images:
+            try:
+                image = load_image(path, self.min_size)
+            except Exception as e:
+                print(f"Could not load {name} image: {e}")
+                image = None
+            self.results.put((name, image))
+
+    def poll(self):
+        done = []
+        while self.remaining:
+            try:
+                done.append(self.results.get_nowait())
+            except queue.Empty:
+                break
+            self.remaining -= 1
+        return done
+
+    def wait(self):
+        """Block until every image is loaded and return the ones not yet polled"""
+        done = []
+        while self.remaining:
+            done.append(self.results.get())
+            self.remaining -= 1
+        return done
@@ -0,0 +1,211 @@
+"""
+Micro-benchmarks for the cube model and the mesh draw paths.
+
+Each operation that runs every move or every frame is timed on its own
+(best of a few timeit repeats, per call) and its allocations measured with
+tracemalloc (peak bytes allocated during one call). The draw benchmarks run
+in an offscreen GL context and are skipped if none can be created.
+
+Results are compared with a stored baseline, and the run fails if any
+operation got slower, or allocates more, by more than the threshold:
+
+    python3 bench_model.py --save        # record bench_baseline.json
+    python3 bench_model.py               # compare with it
+    python3 bench_model.py --only draw   # benchmarks whose name contains "draw"
+
+Timings only compare on the machine that recorded the baseline; allocation
+sizes compare anywhere with the same Python and numpy.
+"""
+
+import argparse
+import json
+import os
+import sys
+import timeit
+import tracemalloc
+
+from offscreen import PLATFORMS, OffscreenContext, select_platform
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_baseline.json')
+REPEATS = 5
+ALLOC_CALLS = 20
+# Allocation differences below this many bytes are noise (dict resizes,
+# interned floats), not regressions
+ALLOC_SLACK = 512
+# A benchmark that looks slower is measured this many more times, keeping
+# its best time, before it counts as a regression
+RETRIES = 2
+SCRAMBLE = "R U2 F' L D B2 R' U F2 L' D2 B"
+
+
+def model_benchmarks():
+    """(name, function) for the GL-free cube model"""
+    import math
+    import numpy as np
+    from rubiks_cube import RubiksCube
+
+    def scrambled():
+        cube = RubiksCube(verbose=False)
+        for move in SCRAMBLE.split():
+            cube.apply_move(move)
+        return cube
+
+    # apply_move turns its own cube, so the read-only benchmarks always
+    # see the scramble (is_solved's cost depends on the position)
+    cube = scrambled()
+    moving = scrambled()
+
+    turning = RubiksCube(verbose=False)
+    turning.animator.start_move('R', turning.get_cubies_for_move('R'))
+
+    axis = np.array([1.0, 0.0, 0.0])  # As _move_plan passes it
+    return [
+        ('apply_rotation', turning.apply_rotation),
+        ('apply_move', lambda: moving.apply_move('U')),
+        ('rotate_face_name', lambda: cube.rotate_face_name('front', axis, math.pi / 2)),
+        ('get_face_state', lambda: cube.get_face_state('front')),
+        ('to_singmaster', cube.to_singmaster),
+        ('is_solved', cube.is_solved),
+    ]
+
+
+def draw_benchmarks():
+    """
+    (name, function) for the mesh, drawn into the current GL context.
+
+    CubeMesh keeps every cubie's vertices (the rounded sticker fans,
+    outlines and bodies) in arrays, so the per-frame cost is draw() and the
+    per-move cost is place_stale() rebuilding the turned cubies.
+    """
+    from OpenGL.GL import glFinish
+    from cube_mesh import RenderedCube
+
+    resting = RenderedCube(verbose=False)
+    for move in SCRAMBLE.split():
+        resting.apply_move(move)
+    resting.mesh.place_stale()
+
+    turning = RenderedCube(verbose=False)
+    cubies = turning.get_cubies_for_move('R')
+    turning.animator.start_move('R', cubies)
+    turning.animator.rotation_angle = 45
+    turning.mesh.set_rotating([[c.index for c in cubies]])
+
+    placing = RenderedCube(verbose=False)
+
+    def draw(cube):
+        cube.draw()
+        glFinish()
+
+    def place_stale():
+        placing.apply_move('R')
+        placing.mesh.place_stale()
+
+    return [
+        ('draw', lambda: draw(resting)),
+        ('draw_turning', lambda: draw(turning)),
+        ('place_stale', place_stale),
+    ]
+
+
+def measure(function):
+    """
+    Time and allocations of one call.
+
+    Returns:
+        (microseconds per call, peak bytes allocated during a call)
+    """
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    best = min(timer.repeat(REPEATS, number)) / number
+
+    function()  # Let caches settle before tracing
+    tracemalloc.start()
+    peaks = []
+    for _ in range(ALLOC_CALLS):
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+        peaks.append(peak - before)
+    tracemalloc.stop()
+    return best * 1e6, sorted(peaks)[len(peaks) // 2]
+
+
+def regressions(result, base, threshold):
+    """Descriptions of how result is worse than base, if it is"""
+    problems = []
+    if result['us'] > base['us'] * (1 + threshold):
+        problems.append(f"time +{result['us'] / base['us'] - 1:.0%}")
+    if result['bytes'] > base['bytes'] * (1 + threshold) + ALLOC_SLACK:
+        problems.append(f"alloc {base['bytes']} -> {result['bytes']} B")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the cube model and draw paths")
+    parser.add_argument('--baseline', default=BASELINE_FILE, help="baseline JSON file")
+    parser.add_argument('--save', action='store_true', help="record the results as the baseline")
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help="allowed slowdown or allocation growth (0.25 = 25%%)")
+    parser.add_argument('--only', help="run benchmarks whose name contains this")
+    parser.add_argument('--gl', choices=PLATFORMS, default='egl', help="offscreen GL backend")
+    parser.add_argument('--no-draw', action='store_true', help="skip the GL benchmarks")
+    args = parser.parse_args()
+
+    # Must happen before anything imports OpenGL
+    select_platform(args.gl)
+    benchmarks = model_benchmarks()
+    # The draw benchmarks run in this context, so it lives until main returns
+    context = None
+    if not args.no_draw:
+        try:
+            context = OffscreenContext(64, 64, args.gl)
+        except RuntimeError as e:
+            print(f"Skipping draw benchmarks: {e}")
+    if context is not None:
+        benchmarks += draw_benchmarks()
+    if args.only:
+        benchmarks = [(name, f) for name, f in benchmarks if args.only in name]
+
+    baseline = {}
+    if not args.save and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    results = {}
+    failed = False
+    print(f"{'benchmark':<18} {'us/call':>10} {'bytes/call':>11}  baseline")
+    for name, function in benchmarks:
+        us, peak = measure(function)
+        results[name] = {'us': round(us, 3), 'bytes': peak}
+        base = baseline.get(name)
+        if base is not None:
+            problems = regressions(results[name], base, args.threshold)
+            for _ in range(RETRIES if problems else 0):
+                us = min(us, measure(function)[0])
+                results[name]['us'] = round(us, 3)
+                problems = regressions(results[name], base, args.threshold)
+        line = f"{name:<18} {us:10.2f} {peak:11d}"
+        if base is not None:
+            failed = failed or bool(problems)
+            line += f"  {base['us']:.2f} us, {base['bytes']} B"
+            if problems:
+                line += "  REGRESSION: " + ', '.join(problems)
+        print(line)
+
+    if args.save:
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                # Keep entries for benchmarks this run skipped
+                results = {**json.load(f), **results}
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"Saved baseline to {args.baseline}")
+    elif not baseline:
+        print(f"No baseline at {args.baseline}; record one with --save")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
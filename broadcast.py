@@ -0,0 +1,664 @@
+"""
+Live broadcast of a cube to spectators over TCP.
+
+A Broadcaster is a cube's recorder (cube.recorder, like SessionRecorder)
+that streams the session log format to every connected spectator instead
+of writing a file. A move is a one-byte delta, and every `checkpoint_every`
+moves a checkpoint of the full sticker state is a keyframe:
+
+    header (start time shifted to the keyframe), keyframe, events since...
+
+A spectator that joins late starts at the latest keyframe. Each event is
+encoded once into a shared log that one I/O thread sends from, so the
+cube's thread only appends and never waits on a socket. Every client has
+its own position in the log; one that falls more than `max_lag` bytes
+behind finishes the event it is in and skips to the latest keyframe, with
+a time stamp for the skipped time. Only what such a client could still
+need is kept: the last max_lag bytes, and everything since the keyframe.
+Slow viewers drop moves, never the cube or the other viewers.
+
+A stream is a valid session log, so a saved one replays with
+session_log.py. Examples:
+
+    python3 broadcast.py serve 8642                   # shuffles and solves a demo cube
+    python3 broadcast.py watch localhost:8642         # text spectator
+    python3 cub3D.py --broadcast 8642                 # broadcast the interactive cube
+    python3 cub3D.py --watch localhost:8642           # 3D spectator
+    python3 broadcast.py loadtest --clients 1000
+"""
+
+import argparse
+import bisect
+import multiprocessing
+import queue
+import random
+import resource
+import selectors
+import socket
+import sys
+import threading
+import time
+from collections import deque
+
+from rubiks_cube import RubiksCube
+from session_log import (decode_events, SessionRecorder, _uvarint, EVENT_CHECKPOINT,
+                         EVENT_TIME, HEADER, MAGIC, VERSION)
+
+DEFAULT_PORT = 8642
+# Kernel send buffer per client: small, so a stalled viewer shows up as
+# lag in the log (and is skipped ahead) instead of queueing in the kernel
+SEND_BUFFER = 8192
+# Moves an animating spectator may have queued before it jumps to the state
+MAX_QUEUED_MOVES = 32
+FACE_MOVES = [face + suffix for face in 'URFDLB' for suffix in ('', "'", '2')]
+
+
+def parse_address(text, host='127.0.0.1'):
+    """(host, port) from "[HOST:]PORT" """
+    name, _, port = text.rpartition(':')
+    return (name or host), int(port)
+
+
+class _Client:
+    __slots__ = ('sock', 'pos', 'elapsed', 'tail', 'blocked', 'resyncs')
+
+    def __init__(self, sock, pos, elapsed, tail):
+        self.sock = sock
+        self.pos = pos          # Log offset of the next event to send
+        self.elapsed = elapsed  # Stream time (ms) the client has been sent up to pos
+        self.tail = tail        # Bytes to send before pos: the header or a partly sent event
+        self.blocked = False    # Waiting for the socket to become writable
+        self.resyncs = 0
+
+
+class Broadcaster(SessionRecorder):
+    """
+    Streams a cube's session to spectators (see the module docstring).
+
+    Args:
+        cube: the cube being broadcast; its state is the first keyframe
+        address: (host, port) to listen on; port 0 picks a free port
+            (self.address has the real one)
+        checkpoint_every: moves between keyframes
+        max_lag: bytes a client may fall behind before it skips ahead
+        resolution: seconds between time stamps at the most
+
+    Raises:
+        OSError: if the address cannot be listened on
+    """
+    def __init__(self, cube, address=('127.0.0.1', DEFAULT_PORT), checkpoint_every=64,
+                 max_lag=16384, resolution=0.01):
+        self.max_lag = max_lag
+        self.listener = socket.create_server(address, backlog=1024)
+        self.listener.setblocking(False)
+        self.address = self.listener.getsockname()[:2]
+        self.wake_r, self.wake_w = socket.socketpair()
+        self.wake_r.setblocking(False)
+        self.wake_w.setblocking(False)
+
+        # Written by the cube's thread, taken by the I/O thread
+        self.pending = deque()
+        self.wake_pending = False
+        self.closing = False
+
+        # The log; only the I/O thread touches it
+        self.header = None
+        self.start = 0.0
+        self.log = bytearray()
+        self.base = 0            # Offset of log[0]; older data is dropped
+        self.end = 0
+        self.ends = []           # Offset after each event in the log
+        self.stamps = []         # Stream time (ms) after each event
+        self.elapsed = 0
+        self.keyframe_at = 0
+        self.keyframe_elapsed = 0
+        self.clients = {}
+        self.counts = {'joined': 0, 'left': 0, 'resyncs': 0, 'bytes': 0}
+
+        # SessionRecorder writes each event whole to its file, here write()
+        super().__init__(self, cube.size, checkpoint_every, resolution)
+        self.checkpoint(cube)
+        self.thread = threading.Thread(target=self._serve, daemon=True)
+        self.thread.start()
+
+    def write(self, data):
+        """Publish one event (called by SessionRecorder, on the cube's thread)"""
+        self.pending.append(bytes(data))
+        if not self.wake_pending:
+            self.wake_pending = True
+            try:
+                self.wake_w.send(b'\0')
+            except OSError:
+                pass
+
+    def flush(self):
+        pass
+
+    def close(self, cube=None, linger=2.0):
+        """
+        Send a final keyframe (if given the cube), give clients up to
+        `linger` seconds to receive everything, and stop.
+        """
+        if cube is not None:
+            self.checkpoint(cube)
+        self.linger = linger
+        self.closing = True
+        self.write(b'')  # Wakes the I/O thread; empty events are skipped
+        self.thread.join()
+
+    def stats(self):
+        """Connected clients and totals: joined, left, resyncs, bytes sent"""
+        return {'clients': len(self.clients), **self.counts}
+
+    def _take_pending(self):
+        self.wake_pending = False
+        while self.pending:
+            data = self.pending.popleft()
+            if not data:
+                continue
+            if self.header is None:
+                self.header = data
+                self.start = HEADER.unpack(data)[3]
+                continue
+            if data[0] == EVENT_TIME:
+                _, _, self.elapsed = decode_events(data, self.size, 0, self.elapsed)
+            elif data[0] == EVENT_CHECKPOINT and self.ends:
+                self.keyframe_at = self.end
+                self.keyframe_elapsed = self.elapsed
+                # Clients more than max_lag behind skip to the keyframe, so
+                # only the events after that point are kept
+                drop = bisect.bisect_right(self.ends, min(self.keyframe_at, self.end - self.max_lag))
+                if drop:
+                    del self.log[:self.ends[drop - 1] - self.base]
+                    self.base = self.ends[drop - 1]
+                    del self.ends[:drop]
+                    del self.stamps[:drop]
+            self.log += data
+            self.end += len(data)
+            self.ends.append(self.end)
+            self.stamps.append(self.elapsed)
+
+    def _accept(self, selector):
+        while True:
+            try:
+                sock, _ = self.listener.accept()
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                return  # Out of descriptors; the client waits in the backlog
+            sock.setblocking(False)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SEND_BUFFER)
+            # The header's start time is moved to the keyframe, so the stream
+            # times line up with the source's from there on
+            magic, version, size, _ = HEADER.unpack(self.header)
+            header = HEADER.pack(magic, version, size, self.start + self.keyframe_elapsed / 1000)
+            client = _Client(sock, self.keyframe_at, self.keyframe_elapsed, header)
+            self.clients[sock] = client
+            selector.register(sock, selectors.EVENT_READ, client)
+            self.counts['joined'] += 1
+
+    def _drop(self, selector, client):
+        selector.unregister(client.sock)
+        client.sock.close()
+        del self.clients[client.sock]
+        self.counts['left'] += 1
+
+    def _send(self, selector, client):
+        """Send a client what it is missing, as far as its socket takes it"""
+        sock = client.sock
+        try:
+            if client.tail:
+                sent = sock.send(client.tail)
+                self.counts['bytes'] += sent
+                client.tail = client.tail[sent:]
+            if not client.tail:
+                if client.pos < self.base or (self.end - client.pos > self.max_lag
+                                              and self.keyframe_at > client.pos):
+                    skipped = self.keyframe_elapsed - client.elapsed
+                    client.tail = bytes((EVENT_TIME,)) + _uvarint(skipped) if skipped > 0 else b''
+                    client.pos = self.keyframe_at
+                    client.elapsed = self.keyframe_elapsed
+                    client.resyncs += 1
+                    self.counts['resyncs'] += 1
+                    if client.tail:
+                        sent = sock.send(client.tail)
+                        self.counts['bytes'] += sent
+                        client.tail = client.tail[sent:]
+                if not client.tail and client.pos < self.end:
+                    with memoryview(self.log) as view:
+                        chunk = view[client.pos - self.base:]
+                        sent = sock.send(chunk)
+                        self.counts['bytes'] += sent
+                        stop = client.pos + sent
+                        # Always stop between events: the rest of a cut
+                        # event is the tail
+                        i = bisect.bisect_left(self.ends, stop)
+                        client.tail = bytes(view[stop - self.base:self.ends[i] - self.base])
+                        client.pos = self.ends[i]
+                        client.elapsed = self.stamps[i]
+        except (BlockingIOError, InterruptedError):
+            pass
+        except OSError:
+            self._drop(selector, client)
+            return
+        blocked = bool(client.tail) or client.pos < self.end
+        if blocked != client.blocked:
+            client.blocked = blocked
+            events = selectors.EVENT_READ | (selectors.EVENT_WRITE if blocked else 0)
+            selector.modify(sock, events, client)
+
+    def _serve(self):
+        selector = selectors.DefaultSelector()
+        selector.register(self.listener, selectors.EVENT_READ)
+        selector.register(self.wake_r, selectors.EVENT_READ)
+        self._take_pending()
+        deadline = None
+        while True:
+            for key, mask in selector.select(timeout=0.5):
+                if key.fileobj is self.listener:
+                    if not self.closing:
+                        self._accept(selector)
+                elif key.fileobj is self.wake_r:
+                    try:
+                        while self.wake_r.recv(4096):
+                            pass
+                    except BlockingIOError:
+                        pass
+                else:
+                    client = key.data
+                    if mask & selectors.EVENT_READ:
+                        # Spectators send nothing; readable means they left
+                        try:
+                            data = client.sock.recv(4096)
+                        except (BlockingIOError, InterruptedError):
+                            data = None
+                        except OSError:
+                            data = b''
+                        if data == b'':
+                            self._drop(selector, client)
+                            continue
+                    if mask & selectors.EVENT_WRITE:
+                        self._send(selector, client)
+            self._take_pending()
+            for client in list(self.clients.values()):
+                if not client.blocked and (client.tail or client.pos < self.end):
+                    self._send(selector, client)
+            if self.closing:
+                deadline = deadline or time.monotonic() + self.linger
+                if not any(c.blocked for c in self.clients.values()) or time.monotonic() > deadline:
+                    break
+        for client in list(self.clients.values()):
+            self._drop(selector, client)
+        selector.close()
+        self.listener.close()
+        self.wake_r.close()
+        self.wake_w.close()
+
+
+class StreamDecoder:
+    """Decodes a session log that arrives in pieces"""
+    def __init__(self):
+        self.buffer = b''
+        self.size = None   # Cube size and start time, once the header is in
+        self.start = None
+        self.elapsed_ms = 0
+
+    def feed(self, data):
+        """
+        Events completed by data, as session_log.read_session lists them.
+
+        Raises:
+            ValueError: if the stream is not a session log or is corrupt
+        """
+        self.buffer += data
+        if self.size is None:
+            if len(self.buffer) < HEADER.size:
+                return []
+            magic, version, self.size, self.start = HEADER.unpack_from(self.buffer)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError("Not a session log stream")
+            self.buffer = self.buffer[HEADER.size:]
+        events, pos, self.elapsed_ms = decode_events(self.buffer, self.size, 0, self.elapsed_ms)
+        self.buffer = self.buffer[pos:]
+        return events
+
+
+def apply_events(cube, events):
+    """
+    Apply decoded stream events to a cube, instantly.
+
+    Returns:
+        How many checkpoints the cube did not match; it takes the
+        checkpoint's state (this is how skipping to a keyframe shows up)
+    """
+    corrections = 0
+    for _, kind, value in events:
+        if kind == 'move':
+            cube.apply_move(value)
+        elif kind == 'checkpoint':
+            if cube.facelets() != value:
+                cube.set_facelets(value)
+                corrections += 1
+        elif kind == 'reset':
+            cube.initialize_cube()
+    return corrections
+
+
+class Spectator:
+    """
+    Follows a broadcast. The stream is read and decoded on a thread; apply()
+    hands what has arrived to a cube.
+
+    Args:
+        address: (host, port) of the Broadcaster
+        timeout: seconds to wait for the connection and the stream header
+
+    Raises:
+        OSError: if the broadcaster cannot be reached
+        ValueError: if it does not send a session log
+    """
+    def __init__(self, address, timeout=5.0):
+        self.sock = socket.create_connection(address, timeout)
+        self.decoder = StreamDecoder()
+        self.events = queue.SimpleQueue()
+        while self.decoder.size is None:
+            data = self.sock.recv(4096)
+            if not data:
+                raise ValueError("The broadcast ended before its header")
+            for event in self.decoder.feed(data):
+                self.events.put(event)
+        self.sock.settimeout(None)
+        self.size = self.decoder.size
+        self.open = True
+        self.moves = 0
+        self.corrections = 0  # Times the stream skipped ahead
+        self.joined = False   # Set by the first keyframe, the state the spectator starts from
+        self.latency = 0.0  # Seconds between the source making the last event and apply()
+        # Follows the stream instantly; an animating cube lags behind it
+        self.model = RubiksCube(size=self.size, verbose=False)
+        threading.Thread(target=self._read, daemon=True).start()
+
+    def _read(self):
+        try:
+            while True:
+                data = self.sock.recv(65536)
+                if not data:
+                    break
+                for event in self.decoder.feed(data):
+                    self.events.put(event)
+        except (OSError, ValueError):
+            pass
+        self.events.put(None)
+
+    def apply(self, cube, animate=True):
+        """
+        Apply everything received so far to cube: moves are queued for
+        animation (or applied at once), and the cube jumps to the stream's
+        state when the stream skipped ahead or the animation falls more
+        than MAX_QUEUED_MOVES behind.
+
+        Returns:
+            False once the broadcast has ended
+        """
+        while True:
+            try:
+                event = self.events.get_nowait()
+            except queue.Empty:
+                break
+            if event is None:
+                self.open = False
+                break
+            secs, kind, value = event
+            self.latency = time.time() - (self.decoder.start + secs)
+            corrected = apply_events(self.model, [event])
+            if kind == 'checkpoint':
+                self.corrections += corrected if self.joined else 0
+                self.joined = True
+            if kind == 'move':
+                self.moves += 1
+                if animate:
+                    cube.queue_moves([value], track_history=False)
+                else:
+                    cube.apply_move(value)
+            elif kind == 'reset':
+                cube.initialize_cube()
+            elif corrected:
+                cube.set_facelets(value)
+        if len(cube.move_queue) > MAX_QUEUED_MOVES:
+            cube.set_facelets(self.model.facelets())
+        return self.open
+
+    def close(self):
+        self.sock.close()
+
+
+def serve(address, interval):
+    """Broadcast a demo cube that shuffles and solves itself (no solver needed)"""
+    cube = RubiksCube(speed=10.0, verbose=False)
+    caster = Broadcaster(cube, address)
+    cube.recorder = caster
+    print(f"Broadcasting on {caster.address[0]}:{caster.address[1]}")
+    last_report = time.monotonic()
+    try:
+        while True:
+            if not cube.move_queue and not cube.animator.is_animating():
+                if cube.is_solved():
+                    cube.shuffle(21)
+                else:
+                    cube.start_solution(cube.history_solution())
+            cube.update_animation()
+            time.sleep(interval)
+            if time.monotonic() - last_report >= 10:
+                print(caster.stats())
+                last_report = time.monotonic()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        caster.close(cube)
+    return 0
+
+
+def watch(address):
+    """Follow a broadcast in the terminal"""
+    spectator = Spectator(address)
+    cube = RubiksCube(size=spectator.size, verbose=False)
+    print(f"Watching a {spectator.size}x{spectator.size}x{spectator.size} cube")
+    try:
+        while spectator.apply(cube, animate=False):
+            print(f"\r{spectator.moves} moves, latency {spectator.latency * 1000:.0f} ms, "
+                  f"{spectator.corrections} skips, {'solved' if cube.is_solved() else 'scrambled'}  ",
+                  end='', flush=True)
+            time.sleep(0.1)
+    except KeyboardInterrupt:
+        pass
+    spectator.close()
+    print(f"\nBroadcast ended after {spectator.moves} moves")
+    return 0
+
+
+def _raise_file_limit(needed):
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft != resource.RLIM_INFINITY and soft < needed:
+        limit = needed if hard == resource.RLIM_INFINITY else min(needed, hard)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (limit, hard))
+
+
+def _simulate_clients(address, clients, slow, verify, slow_rate, late_at, finished, results):
+    """
+    Load test spectators, run in their own process: `verify` of them apply
+    the stream to a cube (half join late), `slow` read slow_rate bytes/s
+    until `finished` is set, the rest read and discard. Sends a summary to
+    results once every stream has ended.
+    """
+    _raise_file_limit(clients + 64)
+    selector = selectors.DefaultSelector()
+    state = {}
+
+    def connect(kind):
+        sock = socket.socket()
+        if kind == 'slow':
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+        sock.connect(address)
+        sock.setblocking(False)
+        entry = {'kind': kind, 'bytes': 0, 'open': True}
+        if kind == 'verify':
+            entry.update(decoder=StreamDecoder(), cube=None, corrections=0, latencies=[])
+        state[sock] = entry
+        if kind != 'slow':
+            selector.register(sock, selectors.EVENT_READ, entry)
+
+    def receive(sock, entry, limit=65536):
+        try:
+            data = sock.recv(limit)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            data = b''
+        if not data:
+            entry['open'] = False
+            if entry['kind'] != 'slow':
+                selector.unregister(sock)
+            sock.close()
+            return
+        entry['bytes'] += len(data)
+        if entry['kind'] == 'verify':
+            events = entry['decoder'].feed(data)
+            if entry['cube'] is None and events:
+                # Every stream starts with a keyframe
+                entry['cube'] = RubiksCube(size=entry['decoder'].size, verbose=False)
+                entry['cube'].set_facelets(events[0][2])
+            entry['corrections'] += apply_events(entry['cube'], events)
+            if events:
+                entry['latencies'].append(time.time() - (entry['decoder'].start + events[-1][0]))
+
+    early = verify - verify // 2
+    kinds = ['verify'] * early + ['slow'] * slow + ['fast'] * (clients - verify - slow)
+    for kind in kinds:
+        connect(kind)
+    results.send('connected')
+    started = time.monotonic()
+    late_pending = verify // 2
+    last_slow = time.monotonic()
+    while any(entry['open'] for entry in state.values()):
+        for key, _ in selector.select(timeout=0.05):
+            receive(key.fileobj, key.data)
+        now = time.monotonic()
+        if late_pending and now - started >= late_at:
+            for _ in range(late_pending):
+                connect('verify')
+            late_pending = 0
+        if now - last_slow >= 0.05:
+            budget = 65536 if finished.is_set() else max(1, int(slow_rate * (now - last_slow)))
+            for sock, entry in list(state.items()):
+                if entry['kind'] == 'slow' and entry['open']:
+                    receive(sock, entry, budget)
+            last_slow = now
+
+    summary = {'bytes': {}, 'verify': []}
+    for entry in state.values():
+        summary['bytes'][entry['kind']] = summary['bytes'].get(entry['kind'], 0) + entry['bytes']
+        if entry['kind'] == 'verify':
+            cube = entry['cube']
+            summary['verify'].append((cube.facelets() if cube else None, entry['corrections'],
+                                      entry['latencies']))
+    results.send(summary)
+
+
+def loadtest(clients, slow, verify, rate, seconds, max_lag, slow_rate):
+    """
+    Broadcast a cube turning `rate` moves/s to `clients` local spectators.
+
+    Returns:
+        0 if every verifying spectator ended with the source's state and
+        never had to skip, 1 otherwise
+    """
+    _raise_file_limit(clients + 64)
+    cube = RubiksCube(verbose=False)
+    caster = Broadcaster(cube, ('127.0.0.1', 0), max_lag=max_lag)
+    cube.recorder = caster
+    receiver, sender = multiprocessing.Pipe(duplex=False)
+    finished = multiprocessing.Event()
+    proc = multiprocessing.Process(target=_simulate_clients, daemon=True,
+                                   args=(caster.address, clients, slow, verify, slow_rate,
+                                         seconds / 2, finished, sender))
+    proc.start()
+    receiver.recv()  # All connected
+    while caster.stats()['joined'] < clients - verify // 2:
+        time.sleep(0.01)
+    print(f"{clients} spectators connected ({slow} slow at {slow_rate} B/s, "
+          f"{verify} applying the stream, half of them joining after {seconds / 2:.0f}s)")
+
+    costs = []
+    rng = random.Random(1)
+    start = time.monotonic()
+    while time.monotonic() - start < seconds:
+        due = int((time.monotonic() - start) * rate) - len(costs)
+        for _ in range(due):
+            t = time.perf_counter()
+            cube.apply_move(rng.choice(FACE_MOVES))
+            costs.append(time.perf_counter() - t)
+        time.sleep(0.002)
+    stats = caster.stats()
+    caster.close(cube, linger=5.0)
+    finished.set()
+    summary = receiver.recv()
+    proc.join()
+
+    costs.sort()
+    print(f"Source: {len(costs)} moves in {seconds:.0f}s; apply_move + publish "
+          f"{sum(costs) / len(costs) * 1e6:.0f} us mean, "
+          f"{costs[int(len(costs) * 0.99)] * 1e6:.0f} us p99, {costs[-1] * 1e3:.1f} ms max")
+    print(f"Broadcast: {stats['bytes'] / 1e6:.1f} MB sent, {stats['resyncs']} skips to a keyframe, "
+          f"{stats['left']} clients left early")
+    for kind, count in sorted(summary['bytes'].items()):
+        print(f"  {kind:<7} clients received {count / 1e6:.1f} MB")
+    target = cube.facelets()
+    failed = 0
+    latencies = sorted(l for _, _, samples in summary['verify'] for l in samples)
+    for facelets, corrections, _ in summary['verify']:
+        if facelets != target or corrections:
+            failed += 1
+    if latencies:
+        print(f"Latency to verifying spectators: {latencies[len(latencies) // 2] * 1000:.0f} ms median, "
+              f"{latencies[int(len(latencies) * 0.99)] * 1000:.0f} ms p99")
+    print(f"{len(summary['verify']) - failed} of {len(summary['verify'])} verifying spectators "
+          f"match the source")
+    return 1 if failed else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Broadcast a cube to spectators")
+    parser.add_argument('command', choices=('serve', 'watch', 'loadtest'))
+    parser.add_argument('address', nargs='?', default=str(DEFAULT_PORT),
+                        help="serve: [HOST:]PORT to listen on, watch: [HOST:]PORT to follow")
+    parser.add_argument('--interval', type=float, default=1 / 60,
+                        help="serve: seconds per animation frame")
+    parser.add_argument('--clients', type=int, default=1000, help="loadtest: spectators")
+    parser.add_argument('--slow', type=int, default=100, help="loadtest: spectators that read slowly")
+    parser.add_argument('--slow-rate', type=int, default=512,
+                        help="loadtest: bytes/s a slow spectator reads")
+    parser.add_argument('--verify', type=int, default=4,
+                        help="loadtest: spectators that apply the stream and check the result")
+    parser.add_argument('--rate', type=int, default=2000, help="loadtest: source moves per second")
+    parser.add_argument('--seconds', type=float, default=20, help="loadtest: duration")
+    parser.add_argument('--max-lag', type=int, default=4096,
+                        help="loadtest: bytes a spectator may fall behind before skipping ahead")
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        return serve(parse_address(args.address, '0.0.0.0'), args.interval)
+    if args.command == 'watch':
+        try:
+            return watch(parse_address(args.address))
+        except (OSError, ValueError) as e:
+            print(f"Cannot watch {args.address}: {e}")
+            return 1
+    if args.verify + args.slow > args.clients:
+        parser.error("--verify plus --slow must not exceed --clients")
+    return loadtest(args.clients, args.slow, args.verify, args.rate, args.seconds,
+                    args.max_lag, args.slow_rate)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,11 +1,19 @@
 import os
-import subprocess
+import time
+import argparse
 import threading
 
+# Time to first frame is measured from here, before the heavy imports
+LAUNCH_TIME = time.perf_counter()
+
 # Suppress libdecor warnings on Wayland
 os.environ.setdefault('SDL_VIDEODRIVER', 'x11')
-from PIL import Image
-from rubiks_cube import RubiksCube
+from assets import AssetLoader
+from cube_mesh import RenderedCube
+from cube_wall import CubeWall
+from solver import SolverPool, build_tables, is_twophase_available, tables_present
+from session_log import RecorderTee, SessionRecorder
+from broadcast import Broadcaster, Spectator, parse_address
 import pygame
 from pygame.locals import *
 from OpenGL.GLU import *
@@ -14,26 +22,68 @@ from OpenGL.GL import *
 
 class CubeViewer:
     """Main application class"""
-    def __init__(self):
-        pygame.init()
-        self.width, self.height = 1200, 800
-        self.screen = pygame.display.set_mode((self.width, self.height), DOUBLEBUF | OPENGL)
-        pygame.display.set_caption("3D Rubik's Cube Solver")
-        self.background_texture = self.load_background_texture()
-        self.loading_texture = self.load_loading_texture()
-        
-        # Initialize solver in background
-        self.solver_initialized = False
+    def __init__(self, size=3, wall=0, solver_workers=1, headless=False,
+                 width=1200, height=800, record=None, broadcast=None, watch=None):
+        self.startup = {'imports': time.perf_counter() - LAUNCH_TIME}
+        # Only what the viewer uses; pygame.init() would also open audio
+        pygame.display.init()
+        pygame.font.init()
+        self.width, self.height = width, height
+        # Headless viewers draw into an offscreen context made by the caller
+        # (see render_video.py) and never open a window
+        self.headless = headless
+        if not headless:
+            self.screen = pygame.display.set_mode((self.width, self.height), DOUBLEBUF | OPENGL)
+            pygame.display.set_caption("3D Rubik's Cube Solver")
+        self.startup['window'] = time.perf_counter() - LAUNCH_TIME
+
+        # Build or load the tables in the background; the cube is usable
+        # meanwhile and solves that need the solver wait for them
+        self.solver_initialized = headless
         self.solver_progress = 0  # 0-100 for progress bar
         self.solver_phase = "Loading..."  # Current phase text
-        self.solver_thread = threading.Thread(target=self._initialize_solver, daemon=True)
-        self.solver_thread.start()
-        
-        # Create loading cube with auto-animation and slower speed (5.0 instead of 10.0)
-        self.loading_cube = RubiksCube(auto_animate=True, speed=5.0)
-        
+        if not headless:
+            self.solver_thread = threading.Thread(target=self._initialize_solver, daemon=True)
+            self.solver_thread.start()
+
+        # Images decode on a worker thread and are uploaded as they arrive
+        # (see upload_textures)
+        self.background_texture = None
+        images_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'images')
+        images = [('background', os.path.join(images_dir, 'background.jpg'))]
+        self.assets = AssetLoader(images, min_size=(self.width, self.height))
+        if headless:
+            # Rendered frames must not depend on how fast the decoder was
+            self.upload_textures(self.assets.wait())
+        
+        # Spectators show someone else's cube (see broadcast.py)
+        self.spectator = None
+        if watch:
+            self.spectator = Spectator(parse_address(watch))
+            size = self.spectator.size
+
         # Main cube (NO auto-animation - starts solved, normal speed 10.0)
-        self.cube = RubiksCube(auto_animate=False, speed=10.0)
+        self.cube = RenderedCube(auto_animate=False, speed=10.0, size=size)
+        self.cube.solver_ready = self.solver_initialized
+        recorders = []
+        if record:
+            # Log every move, shuffle and solve (see session_log.py)
+            recorders.append(SessionRecorder(record, size))
+        if broadcast:
+            caster = Broadcaster(self.cube, parse_address(broadcast, '0.0.0.0'))
+            print(f"Broadcasting on {caster.address[0]}:{caster.address[1]}")
+            recorders.append(caster)
+        if recorders:
+            self.cube.recorder = recorders[0] if len(recorders) == 1 else RecorderTee(*recorders)
+
+        # Wall mode: a grid of cubes that shuffle and solve on their own
+        self.wall = None
+        self.solver_workers = solver_workers
+        self.far_plane = 50.0
+        if wall > 0:
+            # The solver pool starts once the tables are ready (see run)
+            self.wall = CubeWall(wall, speed=10.0)
+            self.far_plane = 50.0 + 2 * max(self.wall.width, self.wall.height)
         self.setup_opengl()
         
         # Camera control
@@ -53,6 +103,15 @@ class CubeViewer:
         
         # Auto-rotation
         self.auto_rotate = True
+
+        if self.wall:
+            # Face the wall head on, far enough back to fit every cube
+            fit = max(self.wall.width * self.height / self.width, self.wall.height)
+            self.zoom = self.target_zoom = 0.6 * fit / 0.414 + 2
+            self.max_zoom = max(self.max_zoom, 2 * self.zoom)
+            self.target_rotation_x = self.current_rotation_x = 0
+            self.target_rotation_y = self.current_rotation_y = 0
+            self.auto_rotate = False
         
         # Font for text display
         self.font = pygame.font.Font(None, 36)
@@ -60,79 +119,37 @@ class CubeViewer:
         
         # Clock for FPS
         self.clock = pygame.time.Clock()
+        self.fps_report_time = pygame.time.get_ticks()
+        self.startup['scene'] = time.perf_counter() - LAUNCH_TIME
     
     def _initialize_solver(self):
-        """Initialize solver by running it with test input (background thread)"""
-        try:
-            solver_dir = os.path.join(os.path.dirname(__file__), 'solver')
-            solver_path = os.path.join(solver_dir, 'twophase')
-            
-            # Check if pruning tables already exist
-            data1_path = os.path.join(solver_dir, 'data1.dat')
-            data2_path = os.path.join(solver_dir, 'data2.dat')
-            
-            if os.path.exists(data1_path) and os.path.exists(data2_path):
-                # Tables already exist, just mark as ready
-                self.solver_progress = 100
-                self.solver_phase = "Ready!"
-                print("✓ Solver tables already initialized")
-                self.solver_initialized = True
-                return
-            
-            test_input = "DL FD BL FR BD UL UR BU LF FU RB DR DLB RBU LUB DRF FLD RUF BRD FUL\n"
-            
-            # Run solver with unbuffered output to generate tables
-            process = subprocess.Popen(
-                [solver_path],
-                stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                text=True,
-                bufsize=1,  # Line buffered
-                cwd=solver_dir
-            )
-            
-            # Send input
-            process.stdin.write(test_input)
-            process.stdin.close()
-            
-            # Read output line by line in real-time
-            for line in process.stdout:
-                line = line.strip()
-                if line:
-                    if '[phase1:' in line:
-                        self.solver_phase = "Generating Phase 1..."
-                        try:
-                            percent = int(line.split('[phase1:')[1].split('%')[0])
-                            self.solver_progress = max(1, min(50, percent // 2))
-                        except:
-                            pass
-                    elif '[phase2:' in line:
-                        self.solver_phase = "Generating Phase 2..."
-                        try:
-                            percent = int(line.split('[phase2:')[1].split('%')[0])
-                            self.solver_progress = 50 + max(1, min(50, percent // 2))
-                        except:
-                            pass
-            
-            process.wait(timeout=300)
+        """Build or load the pruning tables up front (background thread)"""
+        if tables_present():
+            # Tables already exist, just mark as ready
             self.solver_progress = 100
             self.solver_phase = "Ready!"
-            print("✓ Solver initialized successfully")
-            self.solver_initialized = True
-        except subprocess.TimeoutExpired:
-            try:
-                process.kill()
-            except:
-                pass
-            print("⚠ Solver initialization timed out")
-            self.solver_progress = 100
+            print("✓ Solver tables already initialized")
             self.solver_initialized = True
+            return
+
+        def progress(phase, done, total, eta):
+            # Entries settled, not depths, so the bar moves at the rate work gets done
+            base = 0 if phase == 'phase1' else 50
+            self.solver_progress = base + max(1, min(50, done * 50 // total))
+            name = "Phase 1" if phase == 'phase1' else "Phase 2"
+            self.solver_phase = f"Generating {name}..." + (f" ({eta}s left)" if eta else "")
+
+        try:
+            if build_tables(progress=progress):
+                print("✓ Solver initialized successfully")
+            else:
+                print("⚠ Solver table build failed")
         except Exception as e:
             print(f"⚠ Solver initialization error: {e}")
-            self.solver_progress = 100
-            self.solver_initialized = True
-        
+        self.solver_progress = 100
+        self.solver_phase = "Ready!"
+        self.solver_initialized = True
+
     def setup_opengl(self):
         """Initialize OpenGL settings"""
         glEnable(GL_DEPTH_TEST)
@@ -152,61 +169,33 @@ class CubeViewer:
         
         # Perspective
         glMatrixMode(GL_PROJECTION)
-        gluPerspective(45, self.width / self.height, 0.1, 50.0)
+        gluPerspective(45, self.width / self.height, 0.1, self.far_plane)
         glMatrixMode(GL_MODELVIEW)
     
-    def load_background_texture(self):
-        """Load and setup background texture"""
-        # Load image using PIL
-        try:
-            image_path = os.path.join(os.path.dirname(__file__), "./images/background.jpg")
-            image = Image.open(image_path)
-            ix, iy = image.size
-            image_data = image.tobytes("raw", "RGBA", 0, -1)
-        except Exception as e:
-            print(f"Could not load background image: {e}")
-            return None
-
-        # Generate and bind texture
+    def create_texture(self, width, height, pixels):
+        """Upload bottom-up RGBA pixels as a linear-filtered, edge-clamped texture"""
         texture_id = glGenTextures(1)
         glBindTexture(GL_TEXTURE_2D, texture_id)
-
-        # ensure correct packing
         glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
-        
-       # Setup texture parameters
         glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
         glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
         glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_EDGE)
         glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_EDGE)
-        
-        # Create texture from image data
-        glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, ix, iy, 0, GL_RGBA, GL_UNSIGNED_BYTE, image_data)
-        # unbind
+        glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, width, height, 0, GL_RGBA, GL_UNSIGNED_BYTE, pixels)
         glBindTexture(GL_TEXTURE_2D, 0)
         return texture_id
 
-    def load_loading_texture(self):
-        """Load and setup loading screen image"""
-        try:
-            image_path = os.path.join(os.path.dirname(__file__), "images", "loading.jpg")
-            image = Image.open(image_path)
-            ix, iy = image.size
-            image_data = image.tobytes("raw", "RGBA", 0, -1)
-        except Exception as e:
-            print(f"Could not load loading image: {e}")
-            return None
-
-        texture_id = glGenTextures(1)
-        glBindTexture(GL_TEXTURE_2D, texture_id)
-        glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_EDGE)
-        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_EDGE)
-        glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, ix, iy, 0, GL_RGBA, GL_UNSIGNED_BYTE, image_data)
-        glBindTexture(GL_TEXTURE_2D, 0)
-        return texture_id
+    def upload_textures(self, images=None):
+        """Turn images finished by the asset loader into textures"""
+        if images is None:
+            images = self.assets.poll()
+        for name, image in images:
+            if image is None:
+                continue
+            width, height, pixels, cached = image
+            setattr(self, f"{name}_texture", self.create_texture(width, height, pixels))
+            self.startup[f"{name} image"] = time.perf_counter() - LAUNCH_TIME
+            self.startup[f"{name} cached"] = cached
 
     def draw_background(self):
         """Draw background image"""
@@ -317,16 +306,18 @@ class CubeViewer:
             ('bottom', 1, 2)
         ]
         
-        cell_size = 25
+        # Each face net keeps the 3x3 footprint whatever the cube size
+        n = self.cube.size
+        cell_size = 75 / n
         gap = 2
         
         for face_name, grid_x, grid_y in faces_layout:
             state = self.cube.get_face_state(face_name)
             
-            for row in range(3):
-                for col in range(3):
-                    x = x_start + grid_x * (3 * cell_size + gap) + col * cell_size
-                    y = y_start + grid_y * (3 * cell_size + gap) + row * cell_size
+            for row in range(n):
+                for col in range(n):
+                    x = x_start + grid_x * (n * cell_size + gap) + col * cell_size
+                    y = y_start + grid_y * (n * cell_size + gap) + row * cell_size
 
                     color = state[row][col]
                     if color:
@@ -353,6 +344,11 @@ class CubeViewer:
         """Display current move and solution sequence"""
         center_x = self.width // 2
         
+        if self.cube.solve_pending:
+            status_text = "SOLVE QUEUED  (waiting for solver tables)"
+            text_width = len(status_text) * 9
+            self.draw_text_2d(status_text, center_x - text_width // 2, 80, self.small_font, (255, 170, 40))
+        
         if self.cube.shuffling and self.cube.move_queue:
             remaining_moves = list(self.cube.move_queue)
             current_move = self.cube.animator.current_move if self.cube.animator.is_animating() else None
@@ -396,6 +392,28 @@ class CubeViewer:
             move_text = f"[ {self.cube.animator.current_move} ]"
             self.draw_text_2d(move_text, center_x - 25, self.height - 100, self.font, (255, 255, 255))
     
+    def draw_wall_status(self):
+        """Display cube count, solver backlog and frame rate in wall mode"""
+        fps = self.clock.get_fps()
+        status_text = f"WALL  {self.wall.count} cubes   {fps:.0f} FPS"
+        self.draw_text_2d(status_text, 20, 20, self.font, (255, 255, 255))
+        solver_text = f"solved {self.wall.solves}   waiting for solver {self.wall.waiting()}"
+        if self.wall.pool is None:
+            solver_text += "   (no solver: undoing shuffles)"
+        self.draw_text_2d(solver_text, 20, 55, self.small_font, (220, 220, 220))
+
+    def update_wall(self):
+        """Step the wall and report its frame rate every few seconds"""
+        if self.wall.pool is None and self.solver_initialized and is_twophase_available():
+            self.wall.pool = SolverPool(workers=self.solver_workers)
+        self.wall.update()
+
+        now = pygame.time.get_ticks()
+        if now - self.fps_report_time >= 5000:
+            self.fps_report_time = now
+            print(f"Wall: {self.wall.count} cubes at {self.clock.get_fps():.1f} FPS, "
+                  f"{self.wall.solves} solved, {self.wall.waiting()} waiting for solver")
+
     def handle_events(self):
         """Handle keyboard and mouse events"""
         for event in pygame.event.get():
@@ -427,6 +445,9 @@ class CubeViewer:
                     self.last_mouse_pos = pos
 
             if event.type == KEYDOWN:
+                if self.spectator is not None and event.key in (K_f, K_b, K_u, K_d, K_r, K_l,
+                                                                K_w, K_x, K_s):
+                    continue  # A spectator's cube only follows the broadcast
                 # Face rotations
                 if event.key == K_f:
                     self.cube.queue_move('F')
@@ -447,13 +468,11 @@ class CubeViewer:
                 elif event.key == K_w:
                     self.cube.initialize_cube()  # Reset
                     print("Cube reset to solved state")
-                # Prevent shuffle and solve before solver is initialized
+                # Solves that need the tables wait for them (see RubiksCube.solve)
                 elif event.key == K_x:
-                    if self.solver_initialized:
-                        self.cube.shuffle()  # Shuffle
+                    self.cube.shuffle()  # Shuffle
                 elif event.key == K_s:
-                    if self.solver_initialized:
-                        self.cube.solve()  # Solve
+                    self.cube.solve()  # Solve
                 elif event.key == K_SPACE:
                     self.auto_rotate = not self.auto_rotate
                 elif event.key == K_ESCAPE:
@@ -531,12 +550,8 @@ class CubeViewer:
         glMatrixMode(GL_MODELVIEW)
         glPopMatrix()
     
-    def draw_loading_screen(self):
-        """Draw loading screen with animated cube overlay and progress bar"""
-        glClearColor(0, 0, 0, 1)
-        glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
-        
-        # Draw loading image background
+    def draw_solver_status(self):
+        """Show table build progress at the top right while the solver is not ready"""
         glMatrixMode(GL_PROJECTION)
         glPushMatrix()
         glLoadIdentity()
@@ -550,71 +565,10 @@ class CubeViewer:
         glEnable(GL_BLEND)
         glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
         
-        if self.loading_texture:
-            glEnable(GL_TEXTURE_2D)
-            glBindTexture(GL_TEXTURE_2D, self.loading_texture)
-            glColor4f(1, 1, 1, 1)
-            glBegin(GL_QUADS)
-            glTexCoord2f(0, 0); glVertex2f(0, 0)
-            glTexCoord2f(1, 0); glVertex2f(self.width, 0)
-            glTexCoord2f(1, 1); glVertex2f(self.width, self.height)
-            glTexCoord2f(0, 1); glVertex2f(0, self.height)
-            glEnd()
-            glBindTexture(GL_TEXTURE_2D, 0)
-            glDisable(GL_TEXTURE_2D)
-        
-        glMatrixMode(GL_PROJECTION)
-        glPopMatrix()
-        glMatrixMode(GL_MODELVIEW)
-        glPopMatrix()
-        
-        # Draw 3D animated cube on top (center of screen)
-        glEnable(GL_DEPTH_TEST)
-        glEnable(GL_LIGHTING)
-        
-        glMatrixMode(GL_PROJECTION)
-        glPushMatrix()
-        glLoadIdentity()
-        gluPerspective(45, self.width / self.height, 0.1, 50.0)
-        glMatrixMode(GL_MODELVIEW)
-        glPushMatrix()
-        glLoadIdentity()
-        
-        # Position and rotate cube in center
-        gluLookAt(0, 0, 10, 0, 0, 0, 0, 1, 0)
-        glRotatef(25, 1, 0, 0)
-        glRotatef(45, 0, 1, 0)
-        
-        # Draw the animated loading cube
-        self.loading_cube.draw()
-        text_width, text_height = self.font.size("initializing...")
-        text_x = (self.width - text_width) // 2
-        text_y = self.height - 70
-        self.draw_text_2d("initializing...", text_x, text_y, self.font, (255, 255, 255))
-        
-        glMatrixMode(GL_PROJECTION)
-        glPopMatrix()
-        glMatrixMode(GL_MODELVIEW)
-        glPopMatrix()
-        
-        # Draw progress bar
-        glMatrixMode(GL_PROJECTION)
-        glPushMatrix()
-        glLoadIdentity()
-        glOrtho(0, self.width, self.height, 0, -1, 1)
-        glMatrixMode(GL_MODELVIEW)
-        glPushMatrix()
-        glLoadIdentity()
-        
-        glDisable(GL_DEPTH_TEST)
-        glDisable(GL_LIGHTING)
-        glEnable(GL_BLEND)
-        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
-        
-        bar_width = 400
-        bar_height = 20
-        bar_x = (self.width - bar_width) // 2
-        bar_y = self.height - 60
+        bar_width = 260
+        bar_height = 8
+        bar_x = self.width - bar_width - 20
+        bar_y = 48
         
         # Progress bar background (dark)
         glColor4f(0.2, 0.2, 0.2, 0.8)
@@ -635,7 +589,6 @@ class CubeViewer:
         glVertex2f(bar_x, bar_y + bar_height)
         glEnd()
         
-        
         glEnable(GL_DEPTH_TEST)
         glEnable(GL_LIGHTING)
         
@@ -643,15 +596,13 @@ class CubeViewer:
         glPopMatrix()
         glMatrixMode(GL_MODELVIEW)
         glPopMatrix()
+        
+        self.draw_text_2d(f"Solver: {self.solver_phase}", bar_x, 20, self.small_font, (255, 255, 255))
 
     def render(self):
-        # Show loading screen while solver initializes
-        if not self.solver_initialized:
-            # Update loading cube animation
-            self.loading_cube.update_animation()
-            self.draw_loading_screen()
-            return
-        
+        if self.assets.remaining:
+            self.upload_textures()
+
         glClearColor(0.85, 0.85, 0.85, 1)
         glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
         glLoadIdentity()
@@ -671,22 +622,78 @@ class CubeViewer:
             self.target_rotation_y += 0.15
 
         self.draw_background()
-        self.cube.draw()
-        self.draw_2d_minimap()
-        self.draw_move_display()
-        self.draw_controls_guide()
+        if self.wall:
+            self.wall.draw()
+            self.draw_wall_status()
+        else:
+            self.cube.draw()
+            self.draw_2d_minimap()
+            self.draw_move_display()
+            if not self.headless:
+                self.draw_controls_guide()
+        if not self.solver_initialized:
+            self.draw_solver_status()
+
+    def report_startup(self):
+        """Print how long startup took, in milliseconds since launch"""
+        steps = ', '.join(f"{name} {self.startup[name] * 1000:.0f}"
+                          for name in ('imports', 'window', 'scene') if name in self.startup)
+        print(f"First frame after {self.startup['first frame'] * 1000:.0f} ms ({steps}); "
+              f"the cube is interactive from here on")
 
     def run(self):
         """Main game loop"""
         running = True
+        first_frame = True
         while running:
             running = self.handle_events()
-            self.cube.update_animation()
+            if self.solver_initialized and not self.cube.solver_ready:
+                # A solve queued while the tables were built starts now
+                self.cube.solver_ready = True
+                self.startup['solver'] = time.perf_counter() - LAUNCH_TIME
+                print(f"Solver ready after {self.startup['solver'] * 1000:.0f} ms")
+            if self.wall:
+                self.update_wall()
+            else:
+                if self.spectator is not None:
+                    self.spectator.apply(self.cube)
+                self.cube.update_animation()
             self.render()
             self.clock.tick(60)
             pygame.display.flip()
+            if first_frame:
+                first_frame = False
+                self.startup['first frame'] = time.perf_counter() - LAUNCH_TIME
+                self.report_startup()
+            if 'images' not in self.startup and not self.assets.remaining:
+                self.startup['images'] = time.perf_counter() - LAUNCH_TIME
+                loaded = [name for name in ('background',) if f"{name} image" in self.startup]
+                cached = [name for name in loaded if self.startup[f"{name} cached"]]
+                print(f"Images ready after {self.startup['images'] * 1000:.0f} ms "
+                      f"({len(cached)} of {len(loaded)} from cache)")
+        if self.wall and self.wall.pool:
+            self.wall.pool.close()
+        if self.cube.recorder is not None:
+            self.cube.recorder.close(self.cube)
+        if self.spectator is not None:
+            self.spectator.close()
 
         
 if __name__ == "__main__":
-    viewer = CubeViewer()
+    parser = argparse.ArgumentParser(description="3D Rubik's Cube Solver")
+    parser.add_argument('--size', type=int, default=3,
+                        help="cube size N for an NxNxN cube (solver needs 3)")
+    parser.add_argument('--wall', type=int, default=0, metavar='COUNT',
+                        help="show a wall of COUNT 3x3x3 cubes shuffling and solving")
+    parser.add_argument('--solver-workers', type=int, default=1,
+                        help="twophase processes solving for the wall")
+    parser.add_argument('--record', metavar='LOG',
+                        help="log the session to LOG (replay with session_log.py)")
+    parser.add_argument('--broadcast', metavar='[HOST:]PORT',
+                        help="stream the cube to spectators (see broadcast.py)")
+    parser.add_argument('--watch', metavar='HOST:PORT',
+                        help="follow a broadcast cube instead of playing")
+    args = parser.parse_args()
+    viewer = CubeViewer(size=args.size, wall=args.wall, solver_workers=args.solver_workers,
+                        record=args.record, broadcast=args.broadcast, watch=args.watch)
     viewer.run()
\ No newline at end of file
@@ -0,0 +1,481 @@
+import numpy as np
+from OpenGL.GL import *
+from rubiks_cube import RubiksCube, FACE_INDEX
+
+# World faces: (name, normal, up), in rubiks_cube.FACE_NAMES order
+FACE_FRAMES = [
+    ('front', [0, 0, 1], [0, 1, 0]),
+    ('back', [0, 0, -1], [0, 1, 0]),
+    ('top', [0, 1, 0], [0, 0, -1]),
+    ('bottom', [0, -1, 0], [0, 0, 1]),
+    ('right', [1, 0, 0], [0, 1, 0]),
+    ('left', [-1, 0, 0], [0, 1, 0])
+]
+BODY_COLOR = (0.1, 0.1, 0.1)
+
+# Per-mesh arrays that a WallMesh can pool into shared storage
+MESH_ARRAYS = ('box_verts', 'box_normals', 'sticker_verts', 'sticker_normals',
+               'sticker_colors', 'sticker_lines')
+
+
+class CubeMesh:
+    """
+    Vertex arrays for every cubie of one cube.
+
+    Stickers are rounded triangle fans with black outlines; the rest of each
+    cubie is a plain dark box drawn just behind them. A sticker keeps its
+    color for life and only changes the world face it points at, so a move
+    rewrites the vertices of the turned cubies and nothing else. The whole
+    cube is drawn with a handful of glDrawElements calls (resting cubies,
+    then the turning layer) instead of one immediate-mode call per vertex.
+    Turned cubies are only marked stale; their vertices are rebuilt once
+    when the mesh is next drawn, so moves that are never shown (instant
+    scrambles, session replays) cost no vertex work.
+
+    Vertices are stored after the mesh's placement (an orientation matrix
+    and an origin), which is the identity unless a WallMesh positions it.
+    """
+    _templates = {}  # Shared geometry per (size, corner_radius, corner_segments)
+
+    def __init__(self, cubies, size=0.95, corner_radius=0.08, corner_segments=4):
+        self.count = len(cubies)
+        self.origin = np.zeros(3, dtype=np.float32)
+        self.orientation = None  # Identity
+        self.split_version = 0   # Bumped by set_rotating
+        key = (size, corner_radius, corner_segments)
+        if key not in CubeMesh._templates:
+            face_tris, face_lines = self._build_face_templates(*key)
+            box_template, box_normals = self._build_box_template(size)
+            normal_templates = np.array(
+                [np.tile(normal, (face_tris.shape[1], 1)) for _, normal, _ in FACE_FRAMES],
+                dtype=np.float32)
+            CubeMesh._templates[key] = (face_tris, face_lines, box_template,
+                                        box_normals, normal_templates)
+        (self.face_tris, self.face_lines, self.box_template,
+         self.box_normal_template, self.normal_templates) = CubeMesh._templates[key]
+        per_sticker = self.face_tris.shape[1]
+
+        # One entry per sticker: owning cubie, current world face and color
+        owner, faces, colors = [], [], []
+        self.cubie_stickers = []
+        for cubie in cubies:
+            first = len(owner)
+            for name, color in cubie.colors.items():
+                owner.append(cubie.index)
+                faces.append(FACE_INDEX[name])
+                colors.append(color)
+            self.cubie_stickers.append(np.arange(first, len(owner)))
+        self.sticker_cubie = np.array(owner, dtype=np.intp)
+        self.sticker_face = np.array(faces, dtype=np.intp)
+        self.sticker_colors = np.repeat(np.array(colors, dtype=np.float32)[:, None, :],
+                                        per_sticker, axis=1)
+        self.sticker_verts = np.zeros((len(owner), per_sticker, 3), dtype=np.float32)
+        self.sticker_normals = np.zeros_like(self.sticker_verts)
+        self.sticker_lines = np.zeros((len(owner), self.face_lines.shape[1], 3), dtype=np.float32)
+
+        self.positions = np.array([c.position for c in cubies], dtype=np.float32)
+        self.box_verts = np.zeros((self.count,) + self.box_template.shape, dtype=np.float32)
+        self.box_normals = np.zeros_like(self.box_verts)
+        self.stale = np.zeros(self.count, dtype=bool)  # Cubies moved since last placed
+        self._place_all()
+        self.set_rotating([])
+
+    def set_placement(self, origin, orientation):
+        """Position the whole cube in the world and rebuild its vertices"""
+        self.origin = np.asarray(origin, dtype=np.float32)
+        self.orientation = None if orientation is None else np.asarray(orientation, dtype=np.float32)
+        self._place_all()
+
+    def share(self, storage):
+        """Move the arrays into views of larger arrays (see WallMesh)"""
+        for name in MESH_ARRAYS:
+            view = storage[name]
+            view[...] = getattr(self, name)
+            setattr(self, name, view)
+
+    def _world(self, points):
+        if self.orientation is None:
+            return points + self.origin
+        return points @ self.orientation.T + self.origin
+
+    def _world_normals(self, normals):
+        if self.orientation is None:
+            return normals
+        return normals @ self.orientation.T
+
+    def _place_all(self):
+        self.box_verts[...] = self._world(self.box_template + self.positions[:, None, :])
+        self.box_normals[...] = self._world_normals(self.box_normal_template)
+        self._place_stickers(np.arange(len(self.sticker_face)))
+        self.stale[:] = False
+
+    def place_stale(self):
+        """Rebuild the vertices of cubies moved since they were last placed"""
+        if not self.stale.any():
+            return
+        slots = np.nonzero(self.stale)[0]
+        self.box_verts[slots] = self._world(self.box_template + self.positions[slots][:, None, :])
+        self._place_stickers(np.nonzero(self.stale[self.sticker_cubie])[0])
+        self.stale[:] = False
+
+    @staticmethod
+    def _build_face_templates(size, corner_radius, corner_segments):
+        """Rounded sticker triangles and outline segments for each world face"""
+        half_size = size / 2
+        inset = half_size - corner_radius
+        outline = []
+        for (cx, cy), start_angle in zip([(inset, inset), (-inset, inset),
+                                          (-inset, -inset), (inset, -inset)],
+                                         [0, 90, 180, 270]):
+            for i in range(corner_segments + 1):
+                angle = np.radians(start_angle + i * 90 / corner_segments)
+                outline.append((cx + corner_radius * np.cos(angle),
+                                cy + corner_radius * np.sin(angle)))
+        outline = np.array(outline)
+        ring = np.vstack([outline, outline[:1]])
+
+        tris, lines = [], []
+        for _, normal, up in FACE_FRAMES:
+            normal = np.array(normal, dtype=float)
+            up = np.array(up, dtype=float)
+            center = normal * half_size
+            right = np.cross(normal, up)
+            points = center + ring[:, :1] * right + ring[:, 1:] * up
+            face_tris, face_lines = [], []
+            for i in range(len(outline)):
+                face_tris.extend([center, points[i], points[i + 1]])
+                face_lines.extend([points[i], points[i + 1]])
+            tris.append(face_tris)
+            lines.append(face_lines)
+        return np.array(tris, dtype=np.float32), np.array(lines, dtype=np.float32)
+
+    @staticmethod
+    def _build_box_template(size):
+        """Two triangles per face of a cubie-sized box, with normals"""
+        s = size / 2
+        verts, normals = [], []
+        for _, normal, up in FACE_FRAMES:
+            normal = np.array(normal, dtype=float)
+            up = np.array(up, dtype=float)
+            right = np.cross(normal, up)
+            c = normal * s
+            quad = [c + (-right - up) * s, c + (right - up) * s,
+                    c + (right + up) * s, c + (-right + up) * s]
+            verts.extend([quad[0], quad[1], quad[2], quad[0], quad[2], quad[3]])
+            normals.extend([normal] * 6)
+        return np.array(verts, dtype=np.float32), np.array(normals, dtype=np.float32)
+
+    def _place_stickers(self, stickers):
+        """Recompute sticker vertices from their faces and owners' positions"""
+        faces = self.sticker_face[stickers]
+        offsets = self.positions[self.sticker_cubie[stickers]][:, None, :]
+        self.sticker_verts[stickers] = self._world(self.face_tris[faces] + offsets)
+        self.sticker_normals[stickers] = self._world_normals(self.normal_templates[faces])
+        self.sticker_lines[stickers] = self._world(self.face_lines[faces] + offsets)
+
+    def move_cubies(self, slots, positions, face_perm):
+        """
+        Move cubies after a turn.
+
+        Args:
+            slots: cubie indices that turned
+            positions: their new positions, (n, 3)
+            face_perm: array mapping each face index to the face it turns onto
+        """
+        if len(slots) == 0:
+            return
+        slots = np.asarray(slots, dtype=np.intp)
+        self.positions[slots] = positions
+        stickers = np.concatenate([self.cubie_stickers[i] for i in slots])
+        self.sticker_face[stickers] = face_perm[self.sticker_face[stickers]]
+        self.stale[slots] = True
+
+    def set_rotating(self, groups):
+        """
+        Split cubies into resting and turning index lists for draw().
+
+        Args:
+            groups: one list of cubie indices per layer turning on its own
+        """
+        per_box = self.box_template.shape[0]
+        per_tri = self.face_tris.shape[1]
+        per_line = self.face_lines.shape[1]
+        turning = np.zeros(self.count, dtype=bool)
+        # (boxes, tris, lines) index arrays for each group
+        self.rotating_groups = []
+        for slots in groups:
+            group = np.zeros(self.count, dtype=bool)
+            group[list(slots)] = True
+            turning |= group
+            sticker_group = group[self.sticker_cubie]
+            self.rotating_groups.append((self._indices(group, per_box),
+                                         self._indices(sticker_group, per_tri),
+                                         self._indices(sticker_group, per_line)))
+        sticker_turning = turning[self.sticker_cubie]
+        self.static_boxes = self._indices(~turning, per_box)
+        self.static_tris = self._indices(~sticker_turning, per_tri)
+        self.static_lines = self._indices(~sticker_turning, per_line)
+        self.split_version += 1
+
+    @staticmethod
+    def _indices(mask, per_item):
+        items = np.nonzero(mask)[0].astype(np.uint32)
+        return (items[:, None] * per_item + np.arange(per_item, dtype=np.uint32)).ravel()
+
+    def _draw_split(self, mode, static, kind, rotations):
+        if len(static):
+            glDrawElements(mode, len(static), GL_UNSIGNED_INT, static)
+        for group, (angle, axis) in zip(self.rotating_groups, rotations):
+            rotating = group[kind]
+            if len(rotating):
+                glPushMatrix()
+                glRotatef(angle, *axis)
+                glDrawElements(mode, len(rotating), GL_UNSIGNED_INT, rotating)
+                glPopMatrix()
+
+    def draw(self, rotations=()):
+        """
+        Draw all cubies.
+
+        Args:
+            rotations: (angle, axis) for each group given to set_rotating
+        """
+        self.place_stale()
+        glEnable(GL_LIGHTING)
+        glEnable(GL_LIGHT0)
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glEnableClientState(GL_NORMAL_ARRAY)
+
+        # Dark bodies, pushed back so the stickers on their faces win
+        glEnable(GL_POLYGON_OFFSET_FILL)
+        glPolygonOffset(1.0, 1.0)
+        glColor3f(*BODY_COLOR)
+        glVertexPointer(3, GL_FLOAT, 0, self.box_verts)
+        glNormalPointer(GL_FLOAT, 0, self.box_normals)
+        self._draw_split(GL_TRIANGLES, self.static_boxes, 0, rotations)
+        glDisable(GL_POLYGON_OFFSET_FILL)
+
+        glEnableClientState(GL_COLOR_ARRAY)
+        glVertexPointer(3, GL_FLOAT, 0, self.sticker_verts)
+        glNormalPointer(GL_FLOAT, 0, self.sticker_normals)
+        glColorPointer(3, GL_FLOAT, 0, self.sticker_colors)
+        self._draw_split(GL_TRIANGLES, self.static_tris, 1, rotations)
+        glDisableClientState(GL_COLOR_ARRAY)
+        glDisableClientState(GL_NORMAL_ARRAY)
+
+        glColor3f(0, 0, 0)
+        glLineWidth(1.5)
+        glVertexPointer(3, GL_FLOAT, 0, self.sticker_lines)
+        self._draw_split(GL_LINES, self.static_lines, 2, rotations)
+        glDisableClientState(GL_VERTEX_ARRAY)
+        glDisable(GL_LIGHTING)
+
+
+class RenderedCube(RubiksCube):
+    """
+    A RubiksCube that can be drawn: it keeps a CubeMesh of its cubies,
+    rebuilt whenever the cubies are, and updated by every move.
+    """
+    def initialize_cube(self):
+        super().initialize_cube()
+        self.mesh = CubeMesh(self.cubies)
+
+    def set_facelets(self, data):
+        super().set_facelets(data)
+        # Sticker colors are fixed in the mesh, so it is built again
+        self.mesh = CubeMesh(self.cubies)
+
+    def draw(self):
+        """Draw all cubies, scaled so every size fills the same space as a 3x3x3"""
+        glPushMatrix()
+        if self.size != 3:
+            scale = 3.0 / self.size
+            glScalef(scale, scale, scale)
+        self.mesh.draw(self.animator.rotations())
+        glPopMatrix()
+
+
+def rotation_matrices(angles, axes):
+    """
+    Rotation matrices matching glRotatef(angle, *axis) for many rotations.
+
+    Args:
+        angles: (n,) angles in degrees
+        axes: (n, 3) rotation axes (not necessarily unit length)
+
+    Returns:
+        (n, 3, 3) float32 array
+    """
+    axes = np.asarray(axes, dtype=np.float64)
+    axes = axes / np.linalg.norm(axes, axis=1, keepdims=True)
+    theta = np.radians(np.asarray(angles, dtype=np.float64))
+    x, y, z = axes.T
+    zero = np.zeros_like(x)
+    k = np.stack([np.stack([zero, -z, y], -1),
+                  np.stack([z, zero, -x], -1),
+                  np.stack([-y, x, zero], -1)], 1)
+    eye = np.broadcast_to(np.eye(3), k.shape)
+    return (eye + np.sin(theta)[:, None, None] * k +
+            (1 - np.cos(theta))[:, None, None] * (k @ k)).astype(np.float32)
+
+
+class WallMesh:
+    """
+    One set of vertex arrays shared by many cubes.
+
+    Each cube's CubeMesh is given a placement and then keeps writing into
+    views of the wall's arrays, so the wall never copies geometry per frame.
+    draw() renders every resting cubie of every cube in one glDrawElements
+    call per primitive type. The turning layers, each with its own axis and
+    angle (a cube may turn several at once), are rotated together in numpy
+    and drawn in one more call each.
+    """
+    def __init__(self, meshes, origins, orientation=None):
+        self.meshes = meshes
+        self.bases = {}
+        for name in MESH_ARRAYS:
+            parts = [getattr(m, name) for m in meshes]
+            sizes = [p.shape[0] for p in parts]
+            starts = np.concatenate([[0], np.cumsum(sizes)])
+            storage = np.zeros((starts[-1],) + parts[0].shape[1:], dtype=np.float32)
+            setattr(self, name, storage)
+            self.bases[name] = starts[:-1]
+
+        for i, (mesh, origin) in enumerate(zip(meshes, origins)):
+            mesh.set_placement(origin, orientation)
+            mesh.share({name: getattr(self, name)[self.bases[name][i]:
+                                                  self.bases[name][i] + getattr(mesh, name).shape[0]]
+                        for name in MESH_ARRAYS})
+
+        # Vertex offsets of each cube inside the flattened arrays
+        self.box_base = self.bases['box_verts'] * self.box_verts.shape[1]
+        self.tri_base = self.bases['sticker_verts'] * self.sticker_verts.shape[1]
+        self.line_base = self.bases['sticker_lines'] * self.sticker_lines.shape[1]
+        self.origins = np.asarray(origins, dtype=np.float32)
+        self.static_versions = None
+
+    def _gather(self, attr, bases, cubes):
+        parts = [getattr(self.meshes[i], attr) + np.uint32(bases[i]) for i in cubes]
+        if not parts:
+            return np.zeros(0, dtype=np.uint32)
+        return np.concatenate(parts)
+
+    def _rotated(self, flat, index, bounds, matrices, offsets=None):
+        """Rotate the vertices at index, one slice per turning layer"""
+        points = flat[index]
+        for k, (start, end) in enumerate(zip(bounds[:-1], bounds[1:])):
+            chunk = points[start:end]
+            np.matmul(chunk, matrices[k].T, out=chunk)
+            if offsets is not None:
+                chunk += offsets[k]
+        return points
+
+    def draw(self, rotations):
+        """
+        Draw every cube.
+
+        Args:
+            rotations: for each cube, the (angle, axis) of each of its
+                turning groups (see CubeMesh.set_rotating); empty when idle
+        """
+        count = len(self.meshes)
+        for mesh in self.meshes:
+            mesh.place_stale()
+        # One entry per turning layer: (cube, its index arrays, angle, axis)
+        turning = [(i, group, angle, axis)
+                   for i in range(count)
+                   for group, (angle, axis) in zip(self.meshes[i].rotating_groups, rotations[i])
+                   if len(group[0])]
+
+        # Resting index lists only change when some cube starts or ends a move
+        versions = [mesh.split_version for mesh in self.meshes]
+        if versions != self.static_versions:
+            self.static_versions = versions
+            self.static_boxes = self._gather('static_boxes', self.box_base, range(count))
+            self.static_tris = self._gather('static_tris', self.tri_base, range(count))
+            self.static_lines = self._gather('static_lines', self.line_base, range(count))
+        static_boxes, static_tris, static_lines = (self.static_boxes, self.static_tris,
+                                                   self.static_lines)
+
+        box_verts = self.box_verts.reshape(-1, 3)
+        box_normals = self.box_normals.reshape(-1, 3)
+        tri_verts = self.sticker_verts.reshape(-1, 3)
+        tri_normals = self.sticker_normals.reshape(-1, 3)
+        tri_colors = self.sticker_colors.reshape(-1, 3)
+        line_verts = self.sticker_lines.reshape(-1, 3)
+
+        if turning:
+            cubes = [i for i, _, _, _ in turning]
+            matrices = rotation_matrices([angle for _, _, angle, _ in turning],
+                                         [axis for _, _, _, axis in turning])
+            # Turns are about each cube's own axes, which the wall may tilt
+            for k, i in enumerate(cubes):
+                orientation = self.meshes[i].orientation
+                if orientation is not None:
+                    matrices[k] = orientation @ matrices[k] @ orientation.T
+            # Rotating about the origin o: v' = M (v - o) + o = M v + (o - M o)
+            origins = self.origins[cubes]
+            offsets = origins - np.einsum('nij,nj->ni', matrices, origins)
+            rotating = []
+            for kind, bases in enumerate((self.box_base, self.tri_base, self.line_base)):
+                parts = [group[kind] + np.uint32(bases[i]) for i, group, _, _ in turning]
+                sizes = [len(part) for part in parts]
+                rotating.append((np.concatenate(parts), np.concatenate([[0], np.cumsum(sizes)])))
+
+        glEnable(GL_LIGHTING)
+        glEnable(GL_LIGHT0)
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glEnableClientState(GL_NORMAL_ARRAY)
+
+        # Boxes and stickers wind clockwise seen from outside; with hundreds
+        # of cubes, skipping the faces turned away halves the fill work
+        glFrontFace(GL_CW)
+        glEnable(GL_CULL_FACE)
+
+        glEnable(GL_POLYGON_OFFSET_FILL)
+        glPolygonOffset(1.0, 1.0)
+        glColor3f(*BODY_COLOR)
+        glVertexPointer(3, GL_FLOAT, 0, box_verts)
+        glNormalPointer(GL_FLOAT, 0, box_normals)
+        if len(static_boxes):
+            glDrawElements(GL_TRIANGLES, len(static_boxes), GL_UNSIGNED_INT, static_boxes)
+        if turning:
+            index, bounds = rotating[0]
+            verts = self._rotated(box_verts, index, bounds, matrices, offsets)
+            normals = self._rotated(box_normals, index, bounds, matrices)
+            glVertexPointer(3, GL_FLOAT, 0, verts)
+            glNormalPointer(GL_FLOAT, 0, normals)
+            glDrawArrays(GL_TRIANGLES, 0, len(verts))
+        glDisable(GL_POLYGON_OFFSET_FILL)
+
+        glEnableClientState(GL_COLOR_ARRAY)
+        glVertexPointer(3, GL_FLOAT, 0, tri_verts)
+        glNormalPointer(GL_FLOAT, 0, tri_normals)
+        glColorPointer(3, GL_FLOAT, 0, tri_colors)
+        if len(static_tris):
+            glDrawElements(GL_TRIANGLES, len(static_tris), GL_UNSIGNED_INT, static_tris)
+        if turning:
+            index, bounds = rotating[1]
+            verts = self._rotated(tri_verts, index, bounds, matrices, offsets)
+            normals = self._rotated(tri_normals, index, bounds, matrices)
+            glVertexPointer(3, GL_FLOAT, 0, verts)
+            glNormalPointer(GL_FLOAT, 0, normals)
+            glColorPointer(3, GL_FLOAT, 0, tri_colors[index])
+            glDrawArrays(GL_TRIANGLES, 0, len(verts))
+        glDisableClientState(GL_COLOR_ARRAY)
+        glDisableClientState(GL_NORMAL_ARRAY)
+        glDisable(GL_CULL_FACE)
+        glFrontFace(GL_CCW)
+
+        glColor3f(0, 0, 0)
+        glLineWidth(1.5)
+        glVertexPointer(3, GL_FLOAT, 0, line_verts)
+        if len(static_lines):
+            glDrawElements(GL_LINES, len(static_lines), GL_UNSIGNED_INT, static_lines)
+        if turning:
+            index, bounds = rotating[2]
+            verts = self._rotated(line_verts, index, bounds, matrices, offsets)
+            glVertexPointer(3, GL_FLOAT, 0, verts)
+            glDrawArrays(GL_LINES, 0, len(verts))
+        glDisableClientState(GL_VERTEX_ARRAY)
+        glDisable(GL_LIGHTING)
@@ -0,0 +1,111 @@
+import math
+import random
+import numpy as np
+from cube_mesh import RenderedCube, WallMesh, rotation_matrices
+from solver import singmaster_to_cubepos
+
+# Per-cube activity, advanced by CubeWall.update()
+RESTING, SHUFFLING, WAITING, SOLVING = range(4)
+
+
+class CubeWall:
+    """
+    A grid of independent 3x3x3 cubes that shuffle and solve forever.
+
+    Every cube is an ordinary RenderedCube with its own move queue, but the
+    wall steps all their animations at once with numpy (angles, targets and
+    speeds are arrays) and only calls back into a cube when its move starts
+    or ends. All cubes render through one WallMesh, and solves go through a
+    shared SolverPool so no frame ever waits on the solver. Without a pool
+    a cube undoes its shuffle instead.
+    """
+    def __init__(self, count, speed=8.0, spacing=4.5, pool=None, idle_frames=40):
+        self.count = count
+        self.pool = pool
+        self.idle_frames = idle_frames
+        self.cubes = [RenderedCube(speed=speed, verbose=False) for _ in range(count)]
+
+        # Lay the cubes out in rows, each tilted to show three faces
+        self.columns = math.ceil(math.sqrt(count))
+        self.rows = math.ceil(count / self.columns)
+        origins = [((i % self.columns - (self.columns - 1) / 2) * spacing,
+                    ((self.rows - 1) / 2 - i // self.columns) * spacing, 0)
+                   for i in range(count)]
+        orientation = (rotation_matrices([25], [[1, 0, 0]])[0] @
+                       rotation_matrices([45], [[0, 1, 0]])[0])
+        self.width = self.columns * spacing
+        self.height = self.rows * spacing
+        self.mesh = WallMesh([cube.mesh for cube in self.cubes], origins, orientation)
+
+        # Batched animation state
+        self.angles = np.zeros(count)
+        self.targets = np.zeros(count)
+        self.speeds = np.full(count, float(speed))
+        self.active = np.zeros(count, dtype=bool)
+
+        # Stagger the first shuffles so the wall doesn't move in lockstep
+        self.state = [RESTING] * count
+        self.wait = [random.randint(0, idle_frames) for _ in range(count)]
+        self.solves = 0
+
+    def update(self):
+        """Advance every cube by one frame"""
+        if self.pool is not None:
+            for i, solution in self.pool.poll():
+                self._play_solution(i, solution)
+
+        for i, cube in enumerate(self.cubes):
+            state = self.state[i]
+            if state == RESTING:
+                if self.wait[i] > 0:
+                    self.wait[i] -= 1
+                else:
+                    cube.shuffle()
+                    self.state[i] = SHUFFLING
+            elif not self.active[i] and not cube.move_queue:
+                if state == SHUFFLING:
+                    self._request_solve(i)
+                elif state == SOLVING:
+                    self.state[i] = RESTING
+                    self.wait[i] = self.idle_frames
+                    self.solves += 1
+
+            if not self.active[i] and cube.move_queue:
+                cube.start_next_move()
+                self.angles[i] = 0
+                self.targets[i] = cube.animator.target_angle
+                self.active[i] = True
+
+        # One step for every animating cube, then finish the ones that landed
+        self.angles[self.active] += self.speeds[self.active]
+        done = np.nonzero(self.active & (self.angles >= self.targets))[0]
+        self.angles[done] = self.targets[done]
+        for i in done:
+            self.cubes[i].finish_move()
+            self.active[i] = False
+
+    def _request_solve(self, i):
+        cube = self.cubes[i]
+        self.state[i] = WAITING
+        if self.pool is None:
+            self._play_solution(i, None)
+            return
+        self.pool.submit(singmaster_to_cubepos(cube.to_singmaster()), i)
+
+    def _play_solution(self, i, solution):
+        cube = self.cubes[i]
+        if not solution:
+            # No solver answer: retrace the shuffle instead
+            solution = cube.history_solution() or []
+        cube.start_solution(solution)
+        self.state[i] = SOLVING
+
+    def waiting(self):
+        """Number of cubes waiting for the solver"""
+        return self.state.count(WAITING)
+
+    def draw(self):
+        """Draw every cube with the shared mesh"""
+        rotations = [cube.animator.rotations(angle) if active else []
+                     for cube, angle, active in zip(self.cubes, self.angles, self.active)]
+        self.mesh.draw(rotations)
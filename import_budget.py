@@ -0,0 +1,67 @@
+"""
+Import-time budget for the GL-free core.
+
+Headless code (the solve service, session replays, the load generator)
+imports the cube model and the solver bridge and nothing else, so those
+modules must not pull in OpenGL or pygame and must import quickly. This
+imports each of them in a fresh interpreter with -X importtime, keeps the
+best of a few runs and fails if one goes over its budget or loads a GL
+module:
+
+    python3 import_budget.py
+"""
+
+import os
+import subprocess
+import sys
+
+# Cumulative import time allowed per module, in milliseconds. numpy is
+# most of rubiks_cube's (about 75ms of 105ms when measured).
+IMPORT_BUDGET_MS = {
+    'solver': 50,
+    'rubiks_cube': 200,
+    'session_log': 200,
+    'solve_service': 150,
+    'broadcast': 250,
+}
+GL_PACKAGES = ('OpenGL', 'pygame')
+RUNS = 5
+
+
+def import_time(module):
+    """
+    Import module in a fresh interpreter.
+
+    Returns:
+        (milliseconds, GL modules it loaded)
+    """
+    code = (f"import sys, {module}\n"
+            f"print(' '.join(m for m in sys.modules if m.split('.')[0] in {GL_PACKAGES!r}))")
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                            capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    # Lines are "import time: self [us] | cumulative | name", nested by indentation
+    for line in result.stderr.splitlines():
+        fields = line.split('|')
+        if len(fields) == 3 and fields[2].strip() == module:
+            return int(fields[1]) / 1000, result.stdout.split()
+    raise RuntimeError(f"No import time reported for {module}")
+
+
+def main():
+    failed = False
+    for module, budget in IMPORT_BUDGET_MS.items():
+        times, gl = zip(*(import_time(module) for _ in range(RUNS)))
+        best = min(times)
+        problem = ''
+        if gl[0]:
+            problem = f"  loads {', '.join(gl[0])}"
+        elif best > budget:
+            problem = "  over budget"
+        failed = failed or bool(problem)
+        print(f"{module:<14} {best:7.1f} ms  (budget {budget} ms){problem}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+"""
+Offscreen OpenGL contexts for rendering without a display.
+
+PyOpenGL chooses its platform when OpenGL is first imported, so call
+select_platform() before importing anything that imports OpenGL
+(rubiks_cube, cub3D, ...). EGL renders through the GPU driver or Mesa's
+llvmpipe; OSMesa is the pure software fallback.
+"""
+
+import os
+import ctypes
+
+PLATFORMS = ('egl', 'osmesa')
+
+
+def select_platform(platform='egl'):
+    """Point PyOpenGL (and pygame) at a display-less backend"""
+    if platform not in PLATFORMS:
+        raise ValueError(f"Unknown offscreen platform: {platform}")
+    os.environ['PYOPENGL_PLATFORM'] = platform
+    os.environ['SDL_VIDEODRIVER'] = 'dummy'
+    if platform == 'egl':
+        # Mesa needs no window system at all on the surfaceless platform
+        os.environ.setdefault('EGL_PLATFORM', 'surfaceless')
+
+
+class OffscreenContext:
+    """
+    An OpenGL context with a width x height color and depth buffer and no window.
+
+    Raises:
+        RuntimeError: if the platform cannot create a context
+    """
+    def __init__(self, width, height, platform='egl'):
+        self.width = width
+        self.height = height
+        self.platform = platform
+        if platform == 'egl':
+            self._create_egl()
+        elif platform == 'osmesa':
+            self._create_osmesa()
+        else:
+            raise ValueError(f"Unknown offscreen platform: {platform}")
+
+    def _create_egl(self):
+        try:
+            from OpenGL import EGL
+        except (ImportError, AttributeError):
+            raise RuntimeError("EGL is not available (install libegl)")
+        display = EGL.eglGetDisplay(EGL.EGL_DEFAULT_DISPLAY)
+        if not display or not EGL.eglInitialize(display, None, None):
+            raise RuntimeError("Cannot initialize an EGL display")
+        attributes = (EGL.EGLint * 13)(
+            EGL.EGL_SURFACE_TYPE, EGL.EGL_PBUFFER_BIT,
+            EGL.EGL_RED_SIZE, 8, EGL.EGL_GREEN_SIZE, 8, EGL.EGL_BLUE_SIZE, 8,
+            EGL.EGL_DEPTH_SIZE, 24,
+            EGL.EGL_RENDERABLE_TYPE, EGL.EGL_OPENGL_BIT,
+            EGL.EGL_NONE)
+        config = EGL.EGLConfig()
+        count = EGL.EGLint()
+        if not EGL.eglChooseConfig(display, attributes, ctypes.pointer(config), 1,
+                                   ctypes.pointer(count)) or count.value == 0:
+            raise RuntimeError("No EGL config with an 8-bit RGB pbuffer and a depth buffer")
+        surface = EGL.eglCreatePbufferSurface(
+            display, config,
+            (EGL.EGLint * 5)(EGL.EGL_WIDTH, self.width, EGL.EGL_HEIGHT, self.height, EGL.EGL_NONE))
+        EGL.eglBindAPI(EGL.EGL_OPENGL_API)
+        context = EGL.eglCreateContext(display, config, EGL.EGL_NO_CONTEXT, None)
+        if not surface or not context or not EGL.eglMakeCurrent(display, surface, surface, context):
+            raise RuntimeError("Cannot create an EGL pbuffer context")
+        self._handles = (display, surface, context)
+
+    def _create_osmesa(self):
+        try:
+            from OpenGL import osmesa, arrays
+            from OpenGL.GL import GL_UNSIGNED_BYTE
+        except (ImportError, AttributeError):
+            # PyOpenGL fails this way when libOSMesa is not installed
+            raise RuntimeError("OSMesa is not available (install libosmesa)")
+        context = osmesa.OSMesaCreateContextExt(osmesa.OSMESA_RGBA, 24, 0, 0, None)
+        if not context:
+            raise RuntimeError("Cannot create an OSMesa context")
+        buffer = arrays.GLubyteArray.zeros((self.height, self.width, 4))
+        if not osmesa.OSMesaMakeCurrent(context, buffer, GL_UNSIGNED_BYTE,
+                                        self.width, self.height):
+            raise RuntimeError("Cannot make the OSMesa context current")
+        self._handles = (context, buffer)
+
+    def read_pixels(self):
+        """Return the current frame as top-to-bottom rows of RGB bytes"""
+        import numpy as np
+        from OpenGL.GL import glFinish, glPixelStorei, glReadPixels, \
+            GL_PACK_ALIGNMENT, GL_RGB, GL_UNSIGNED_BYTE
+        glFinish()
+        glPixelStorei(GL_PACK_ALIGNMENT, 1)
+        data = glReadPixels(0, 0, self.width, self.height, GL_RGB, GL_UNSIGNED_BYTE)
+        rows = np.frombuffer(data, dtype=np.uint8).reshape(self.height, self.width * 3)
+        return rows[::-1].tobytes()
@@ -0,0 +1,236 @@
+"""
+Headless solve video export.
+
+Renders the viewer (cube, minimap and move captions) into an offscreen
+EGL or OSMesa context and writes every frame to an image sequence or to
+an encoder's stdin. Frames are produced as fast as the CPU allows: the
+animation advances a fixed angle per frame, so the output plays back at
+--fps no matter how long it took to render.
+
+Script format, one job per line ('#' starts a comment):
+
+    R U R' U'                    scramble only; the solver finds the solution
+    R U R' U' | U R U' R'        scramble | solution, rendered as given
+
+Examples:
+    python3 render_video.py jobs.txt --frames out/
+    python3 render_video.py jobs.txt --ffmpeg solves.mp4
+    python3 render_video.py jobs.txt --pipe "x264 --demuxer raw ... -"
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+from offscreen import PLATFORMS, OffscreenContext, select_platform
+
+
+def parse_script(lines, size=3):
+    """
+    Read scramble/solution jobs.
+
+    Returns:
+        List of (scramble, solution) move lists; solution is None when the
+        line gives only a scramble
+
+    Raises:
+        ValueError: naming the first line with a move a cube of this size
+            can't make
+    """
+    from rubiks_cube import RubiksCube, parse_move
+
+    cube = RubiksCube(size=size, verbose=False)
+    jobs = []
+    for number, line in enumerate(lines, 1):
+        line = line.split('#', 1)[0].strip()
+        if not line:
+            continue
+        scramble, _, solution = line.partition('|')
+        job = (scramble.split(), solution.split() if solution.strip() else None)
+        try:
+            for move in job[0] + (job[1] or []):
+                cube.move_layers(parse_move(move))
+        except ValueError as e:
+            raise ValueError(f"line {number}: {e}") from None
+        jobs.append(job)
+    return jobs
+
+
+def solve_jobs(jobs, size):
+    """Fill in missing solutions with one batch run of the solver"""
+    from rubiks_cube import RubiksCube
+    from solver import singmaster_to_cubepos, solve_states
+
+    missing = [i for i, (_, solution) in enumerate(jobs) if solution is None]
+    if not missing:
+        return jobs
+    if size != 3:
+        print(f"The TwoPhase solver only handles 3x3x3 cubes; give solutions for size {size}")
+        return [(scramble, solution or []) for scramble, solution in jobs]
+
+    records = []
+    for i in missing:
+        cube = RubiksCube(verbose=False)
+        for move in jobs[i][0]:
+            cube.apply_move(move)
+        records.append(singmaster_to_cubepos(cube.to_singmaster()))
+    print(f"Solving {len(records)} scrambles...")
+    solutions = solve_states(records) or [None] * len(records)
+
+    jobs = list(jobs)
+    for i, solution in zip(missing, solutions):
+        if solution is None:
+            print(f"Could not solve job {i + 1}; rendering its scramble only")
+        jobs[i] = (jobs[i][0], solution or [])
+    return jobs
+
+
+class FrameSink:
+    """Writes RGB frames to numbered image files or to a command's stdin"""
+    def __init__(self, width, height, frames_dir=None, image_format='png', pipe=None):
+        self.width = width
+        self.height = height
+        self.frames_dir = frames_dir
+        self.image_format = image_format
+        self.count = 0
+        self.process = None
+        if frames_dir:
+            os.makedirs(frames_dir, exist_ok=True)
+        if pipe:
+            self.process = subprocess.Popen(pipe, shell=True, stdin=subprocess.PIPE)
+
+    def write(self, rgb):
+        if self.frames_dir:
+            from PIL import Image
+            image = Image.frombytes('RGB', (self.width, self.height), rgb)
+            path = os.path.join(self.frames_dir, f"frame_{self.count:06d}.{self.image_format}")
+            if self.image_format == 'png':
+                # Fastest zlib level: default PNG compression costs more than rendering
+                image.save(path, compress_level=1)
+            else:
+                image.save(path)
+        if self.process:
+            self.process.stdin.write(rgb)
+        self.count += 1
+
+    def close(self):
+        if self.process:
+            self.process.stdin.close()
+            return self.process.wait()
+        return 0
+
+
+def render_jobs(viewer, context, jobs, sink, animate_scramble=False, hold=30):
+    """Render every job: scramble (instant or animated), solve, then a short hold"""
+    cube = viewer.cube
+
+    def emit():
+        viewer.render()
+        sink.write(context.read_pixels())
+
+    def play():
+        while cube.move_queue or cube.animator.is_animating():
+            cube.update_animation()
+            emit()
+
+    for scramble, solution in jobs:
+        cube.initialize_cube()
+        if animate_scramble:
+            cube.shuffling = True
+            cube.shuffle_total = len(scramble)
+            cube.queue_moves(scramble)
+            play()
+        else:
+            for move in scramble:
+                cube.apply_move(move)
+        for _ in range(hold):
+            emit()
+        if solution:
+            cube.start_solution(solution)
+            play()
+        for _ in range(hold):
+            emit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render solve videos without a display")
+    parser.add_argument('script', help="job file, one 'scramble [| solution]' per line ('-' for stdin)")
+    parser.add_argument('--frames', metavar='DIR', help="write numbered images to DIR")
+    parser.add_argument('--image-format', default='png',
+                        help="image file type for --frames (png, ppm, bmp, jpg, ...)")
+    parser.add_argument('--pipe', metavar='CMD', help="stream raw rgb24 frames to CMD's stdin")
+    parser.add_argument('--ffmpeg', metavar='OUT', help="encode to OUT with ffmpeg")
+    parser.add_argument('--width', type=int, default=1200)
+    parser.add_argument('--height', type=int, default=800)
+    parser.add_argument('--fps', type=int, default=60, help="playback rate of the output")
+    parser.add_argument('--speed', type=float, default=10.0, help="degrees turned per frame")
+    parser.add_argument('--size', type=int, default=3, help="cube size N for an NxNxN cube")
+    parser.add_argument('--hold', type=int, default=30, help="still frames after scramble and solve")
+    parser.add_argument('--animate-scramble', action='store_true', help="show the scramble being applied")
+    parser.add_argument('--no-rotate', action='store_true', help="keep the camera still")
+    parser.add_argument('--exact', action='store_true',
+                        help="animate scripts move for move instead of canonicalizing them")
+    parser.add_argument('--gl', choices=PLATFORMS, default='egl', help="offscreen GL backend")
+    args = parser.parse_args()
+
+    pipe = args.pipe
+    if args.ffmpeg:
+        pipe = (f"ffmpeg -loglevel error -y -f rawvideo -pix_fmt rgb24 "
+                f"-s {args.width}x{args.height} -r {args.fps} -i - "
+                f"-pix_fmt yuv420p \"{args.ffmpeg}\"")
+    if not args.frames and not pipe:
+        parser.error("give --frames, --pipe or --ffmpeg")
+
+    try:
+        if args.script == '-':
+            jobs = parse_script(sys.stdin, args.size)
+        else:
+            with open(args.script) as f:
+                jobs = parse_script(f, args.size)
+    except ValueError as e:
+        print(f"Bad move in {args.script}, {e}")
+        return 1
+
+    # Must happen before anything imports OpenGL
+    select_platform(args.gl)
+    try:
+        context = OffscreenContext(args.width, args.height, args.gl)
+    except RuntimeError as e:
+        print(f"Cannot render offscreen: {e}")
+        return 1
+    from cub3D import CubeViewer
+    from cube_mesh import RenderedCube
+    from solver import simplify_moves
+
+    if not args.exact:
+        # Fewer moves to animate; the positions shown are the same
+        jobs = [(simplify_moves(scramble), solution and simplify_moves(solution))
+                for scramble, solution in jobs]
+    jobs = solve_jobs(jobs, args.size)
+
+    viewer = CubeViewer(size=args.size, headless=True, width=args.width, height=args.height)
+    viewer.cube = RenderedCube(speed=args.speed, size=args.size, verbose=False)
+    viewer.auto_rotate = not args.no_rotate
+    # The camera eases toward its target; start it there
+    viewer.zoom = viewer.target_zoom
+
+    sink = FrameSink(args.width, args.height, args.frames, args.image_format, pipe)
+    start = time.perf_counter()
+    try:
+        render_jobs(viewer, context, jobs, sink, args.animate_scramble, args.hold)
+    finally:
+        status = sink.close()
+    elapsed = time.perf_counter() - start
+
+    rate = sink.count / elapsed if elapsed > 0 else 0
+    print(f"Rendered {len(jobs)} jobs, {sink.count} frames in {elapsed:.1f}s "
+          f"({rate:.1f} frames/s, {rate / args.fps:.2f}x realtime at {args.fps} fps)")
+    if status:
+        print(f"Encoder exited with status {status}")
+    return 1 if status else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,387 @@
+"""
+Columnar store for bulk solve results.
+
+A store is a directory of NumPy .npy files, one per column, plus an
+index (index.json) with the committed row count and the batches that
+wrote them:
+
+    state.npy   uint8 (rows, 20)      cubepos records (singmaster_to_cubepos)
+    moves.npy   uint8 (rows, width)   solving move indices (solver.move_names),
+                                      padded with MOVE_PAD
+    length.npy  uint8 (rows,)         solution length, UNSOLVABLE if none
+    ms.npy      float32 (rows,)       solve time in milliseconds
+
+Writers append under an exclusive lock on the store (flock), so any
+number of threads or processes on the host can add rows. Each column
+file keeps a fixed-size header that is rewritten in place after its
+rows are written, and the index is replaced last, so a reader that
+trusts the index never sees a half-written row. Readers memory-map the
+columns: a length histogram or the slowest states is a NumPy expression
+over the files with no parsing and no copies.
+
+Examples:
+    python3 results_store.py solve corpus.txt results/ --workers 4
+    python3 results_store.py solve --random 10000 results/
+    python3 results_store.py summary results/ --slowest 10
+    python3 results_store.py verify results/
+"""
+
+import argparse
+import contextlib
+import fcntl
+import json
+import os
+import struct
+import subprocess
+import sys
+import threading
+import time
+
+import numpy as np
+
+from solver import (encode_states, move_indices, move_names, moves_from_indices, read_answers,
+                    singmaster_to_cubepos, verify_encoded, SOLVED_RECORD, TWOPHASE_PATH,
+                    VERIFY_OK)
+
+# twophase stops at the first solution of at most --target (default 45) moves
+DEFAULT_WIDTH = 45
+MOVE_PAD = 255
+UNSOLVABLE = 255
+INDEX_VERSION = 1
+
+# Every column file starts with an NPY 1.0 header padded to this size, so
+# it can be rewritten in place as the row count grows
+NPY_HEADER_SIZE = 128
+NPY_MAGIC = b'\x93NUMPY\x01\x00'
+
+
+def _columns(width):
+    """Column name -> (dtype, shape of one row)"""
+    return {
+        'state': (np.dtype(np.uint8), (20,)),
+        'moves': (np.dtype(np.uint8), (width,)),
+        'length': (np.dtype(np.uint8), ()),
+        'ms': (np.dtype('<f4'), ()),
+    }
+
+
+def _npy_header(dtype, shape):
+    header = repr({'descr': np.lib.format.dtype_to_descr(dtype),
+                   'fortran_order': False, 'shape': tuple(shape)}).encode('latin1')
+    room = NPY_HEADER_SIZE - len(NPY_MAGIC) - 2 - 1
+    if len(header) > room:
+        raise ValueError("Column header does not fit")
+    return NPY_MAGIC + struct.pack('<H', NPY_HEADER_SIZE - len(NPY_MAGIC) - 2) \
+        + header.ljust(room) + b'\n'
+
+
+class ResultsStore:
+    """
+    One results directory: append() writes rows, the read helpers map them.
+
+    Args:
+        path: store directory; created with `width` move columns if it
+            does not exist yet
+        width: most moves a stored solution may have (new stores only)
+    """
+    def __init__(self, path, width=DEFAULT_WIDTH):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        with self._locked():
+            if not os.path.exists(self._file('index.json')):
+                for name, (dtype, shape) in _columns(width).items():
+                    with open(self._file(f'{name}.npy'), 'wb') as f:
+                        f.write(_npy_header(dtype, (0,) + shape))
+                self._write_index({'version': INDEX_VERSION, 'width': width, 'rows': 0,
+                                   'batches': []})
+        index = self.index()
+        if index.get('version') != INDEX_VERSION:
+            raise ValueError(f"{path} has index version {index.get('version')}")
+        self.width = index['width']
+        self.columns = _columns(self.width)
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    @contextlib.contextmanager
+    def _locked(self):
+        with open(self._file('.lock'), 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _write_index(self, index):
+        temp = self._file(f'index.json.{os.getpid()}.{threading.get_ident()}.tmp')
+        with open(temp, 'w') as f:
+            json.dump(index, f)
+        os.replace(temp, self._file('index.json'))
+
+    def index(self):
+        """The committed index: row count, width and the batch list"""
+        with open(self._file('index.json')) as f:
+            return json.load(f)
+
+    def __len__(self):
+        return self.index()['rows']
+
+    def append(self, records, solutions, ms, writer=None):
+        """
+        Add solved positions.
+
+        Args:
+            records: 20-byte cubepos records
+            solutions: move lists as solve_states returns them, or None
+            ms: solve time of each position in milliseconds
+            writer: optional name kept with the batch in the index
+
+        Returns:
+            Row number of the first appended position
+
+        Raises:
+            ValueError: if the lists differ in length or a solution is
+                longer than the store's width
+        """
+        count = len(records)
+        if len(solutions) != count or len(ms) != count:
+            raise ValueError("records, solutions and ms must be the same length")
+        rows = {
+            'state': np.frombuffer(b''.join(records), dtype=np.uint8).reshape(count, 20),
+            'moves': np.full((count, self.width), MOVE_PAD, dtype=np.uint8),
+            'length': np.full(count, UNSOLVABLE, dtype=np.uint8),
+            'ms': np.asarray(ms, dtype='<f4'),
+        }
+        for i, moves in enumerate(solutions):
+            if moves is None:
+                continue
+            if len(moves) > self.width:
+                raise ValueError(f"A {len(moves)}-move solution does not fit in {self.width} columns")
+            rows['moves'][i, :len(moves)] = move_indices(moves)
+            rows['length'][i] = len(moves)
+
+        with self._locked():
+            index = self.index()
+            first = index['rows']
+            for name, (dtype, shape) in self.columns.items():
+                row_bytes = dtype.itemsize * int(np.prod(shape, dtype=int))
+                with open(self._file(f'{name}.npy'), 'r+b') as f:
+                    f.seek(NPY_HEADER_SIZE + first * row_bytes)
+                    f.write(rows[name].tobytes())
+                    f.seek(0)
+                    f.write(_npy_header(dtype, (first + count,) + shape))
+            index['rows'] = first + count
+            index['batches'].append({'first': first, 'rows': count, 'writer': writer,
+                                     'time': time.time()})
+            self._write_index(index)
+        return first
+
+    def column(self, name):
+        """Read-only memory map of one column's committed rows"""
+        rows = len(self)
+        dtype, shape = self.columns[name]
+        if rows == 0:
+            return np.empty((0,) + shape, dtype=dtype)
+        return np.load(self._file(f'{name}.npy'), mmap_mode='r')[:rows]
+
+    def solution(self, row):
+        """Solving moves of one row, or None if it was unsolvable"""
+        length = int(self.column('length')[row])
+        if length == UNSOLVABLE:
+            return None
+        return move_names(self.column('moves')[row, :length].tolist())
+
+    def find(self, record):
+        """Rows holding a 20-byte cubepos record"""
+        states = self.column('state')
+        return np.flatnonzero((states == np.frombuffer(record, dtype=np.uint8)).all(axis=1))
+
+    def length_histogram(self):
+        """Counts of solution lengths (index = moves); unsolvable rows are left out"""
+        lengths = self.column('length')
+        return np.bincount(lengths[lengths != UNSOLVABLE], minlength=1)
+
+    def verify(self, twophase_path=None, threads=0):
+        """
+        Check every stored solution with twophase --verify.
+
+        The request is cut straight out of the state, length and moves
+        columns, so nothing is decoded in Python.
+
+        Returns:
+            Rows whose solution does not solve their state (unsolvable
+            rows are skipped), or None if the verifier failed
+        """
+        lengths = self.column('length')
+        rows = np.flatnonzero(lengths != UNSOLVABLE)
+        if len(rows) == 0:
+            return rows
+        table = np.concatenate([self.column('state')[rows], lengths[rows, None],
+                                self.column('moves')[rows]], axis=1)
+        keep = np.arange(table.shape[1]) < 21 + lengths[rows, None].astype(np.intp)
+        results = verify_encoded(table[keep].tobytes(), len(rows), twophase_path,
+                                 threads=threads)
+        if results is None:
+            return None
+        return rows[np.frombuffer(results, dtype=np.uint8) != VERIFY_OK]
+
+    def slowest(self, count=10):
+        """Rows of the `count` slowest solves, slowest first"""
+        ms = self.column('ms')
+        count = min(count, len(ms))
+        if count == 0:
+            return np.empty(0, dtype=np.intp)
+        top = np.argpartition(ms, len(ms) - count)[len(ms) - count:]
+        return top[np.argsort(ms[top])[::-1]]
+
+
+def solve_to_store(records, store, twophase_path=None, args=(), batch=1024, writer=None):
+    """
+    Solve positions with one twophase --binary process, appending to a store.
+
+    The solver answers in order and flushes each answer, so the time
+    between answers is each position's solve time. A solved cube goes
+    first to wait out table loading.
+
+    Args:
+        records: 20-byte cubepos records
+        store: ResultsStore
+        batch: positions per append
+
+    Returns:
+        Number of positions stored
+    """
+    if twophase_path is None:
+        twophase_path = TWOPHASE_PATH
+    proc = subprocess.Popen([twophase_path, '--binary'] + list(args),
+                            stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                            stderr=subprocess.DEVNULL, cwd=os.path.dirname(twophase_path))
+
+    def feed():
+        try:
+            proc.stdin.write(encode_states([SOLVED_RECORD] + list(records)))
+            proc.stdin.close()
+        except BrokenPipeError:
+            pass
+
+    threading.Thread(target=feed, daemon=True).start()
+    done = 0
+    pending = ([], [])
+    last = None
+    try:
+        for answer in read_answers(proc.stdout):
+            now = time.perf_counter()
+            if last is None:
+                last = now
+                continue
+            pending[0].append(None if answer is None else moves_from_indices(answer))
+            pending[1].append((now - last) * 1000)
+            last = now
+            if len(pending[0]) >= batch:
+                store.append(records[done:done + len(pending[0])], *pending, writer=writer)
+                done += len(pending[0])
+                pending = ([], [])
+        if pending[0]:
+            store.append(records[done:done + len(pending[0])], *pending, writer=writer)
+            done += len(pending[0])
+    finally:
+        proc.wait()
+    if done < len(records):
+        print(f"TwoPhase solver stopped after {done} of {len(records)} positions")
+    return done
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Solve into and inspect columnar result stores")
+    parser.add_argument('command', choices=('solve', 'summary', 'verify'))
+    parser.add_argument('paths', nargs='+', metavar='PATH',
+                        help="solve: [CORPUS] STORE, summary and verify: STORE")
+    parser.add_argument('--random', type=int, metavar='N', help="solve N random 25-move shuffles")
+    parser.add_argument('--seed', type=int, help="seed for --random")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="solver processes appending at once (verify: checking threads, "
+                             "0 for one per CPU)")
+    parser.add_argument('--batch', type=int, default=1024, help="positions per append")
+    parser.add_argument('--twophase', default=TWOPHASE_PATH, help="solver executable")
+    parser.add_argument('--compact', action='store_true', help="use the compact pruning tables")
+    parser.add_argument('--slowest', type=int, default=10, help="slowest solves to list")
+    args = parser.parse_args()
+
+    if args.command == 'verify':
+        store = ResultsStore(args.paths[0])
+        start = time.perf_counter()
+        wrong = store.verify(args.twophase, threads=args.workers)
+        elapsed = time.perf_counter() - start
+        if wrong is None:
+            return 1
+        checked = int((store.column('length') != UNSOLVABLE).sum())
+        print(f"Checked {checked} solutions in {elapsed:.2f}s "
+              f"({checked / elapsed if elapsed > 0 else 0:.0f}/s): {len(wrong)} wrong")
+        for row in wrong[:10]:
+            print(f"  row {row:8d}  {' '.join(store.solution(row))}")
+        return 1 if len(wrong) else 0
+
+    if args.command == 'summary':
+        store = ResultsStore(args.paths[0])
+        index = store.index()
+        lengths = store.column('length')
+        ms = store.column('ms')
+        solved = lengths != UNSOLVABLE
+        print(f"{index['rows']} rows in {len(index['batches'])} batches, "
+              f"{int(solved.sum())} solved, {int((~solved).sum())} unsolvable")
+        if solved.any():
+            print(f"Length: mean {lengths[solved].mean():.2f}, max {lengths[solved].max()}")
+            for length, count in enumerate(store.length_histogram()):
+                if count:
+                    print(f"  {length:3d} {count:9d}")
+        if len(ms):
+            p50, p90, p99 = np.percentile(ms, (50, 90, 99))
+            print(f"Time: total {ms.sum() / 1000:.1f}s, p50 {p50:.2f}ms, p90 {p90:.2f}ms, "
+                  f"p99 {p99:.2f}ms")
+            for row in store.slowest(args.slowest):
+                moves = store.solution(row)
+                print(f"  row {row:8d} {ms[row]:9.2f}ms  "
+                      f"{'unsolvable' if moves is None else ' '.join(moves)}")
+        return 0
+
+    store_path = args.paths[-1]
+    if args.random is not None:
+        from solve_loadgen import random_states
+        states = random_states(args.random, seed=args.seed)
+    elif len(args.paths) == 2:
+        with open(args.paths[0]) as f:
+            states = [line.split('#', 1)[0].strip() for line in f]
+        states = [state for state in states if state]
+    else:
+        parser.error("solve needs a corpus file or --random N, then the store")
+    try:
+        records = [singmaster_to_cubepos(state) for state in states]
+    except ValueError as e:
+        print(f"Bad state: {e}")
+        return 1
+
+    store = ResultsStore(store_path)
+    extra = ['--compact'] if args.compact else []
+    workers = max(1, args.workers)
+    shards = [records[len(records) * i // workers:len(records) * (i + 1) // workers]
+              for i in range(workers)]
+    stored = [0] * workers
+
+    def run(i):
+        stored[i] = solve_to_store(shards[i], store, args.twophase, extra, args.batch,
+                                   writer=f"{os.getpid()}/{i}")
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    print(f"Stored {sum(stored)} of {len(records)} positions in {elapsed:.2f}s "
+          f"({sum(stored) / elapsed if elapsed > 0 else 0:.0f}/s); {len(store)} rows in {store_path}")
+    return 0 if sum(stored) == len(records) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
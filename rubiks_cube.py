@@ -1,12 +1,20 @@
-from solver import solve_state, is_twophase_available
-from collections import deque
-from pygame.locals import *
-from OpenGL.GLU import *
-from OpenGL.GL import *
+"""
+The cube model: state, moves, move animation timing and the solver calls.
+
+Nothing here imports OpenGL or pygame, so headless code (the solve service,
+session replays, load generators) can use RubiksCube without a display or
+GL libraries installed, and without paying for those imports; keep it that
+way (make import-budget checks it). Drawing lives in cube_mesh.py, whose
+RenderedCube adds vertex arrays and draw() to this class.
+"""
+
+from solver import solve_state, is_twophase_available, simplify_moves, invert_moves
+from collections import deque, namedtuple
 from cubie import Cubie
 import numpy as np
 import random
 import math
+import re
 
 
 COLORS = {
@@ -23,9 +31,89 @@ COLORS = {
 FACE_MOVES = ['F', 'B', 'U', 'D', 'L', 'R']
 MOVE_MODIFIERS = ['', "'", '2']
 
+# Undoing a move history this short beats asking the solver; longer
+# histories bound the solver's search instead (see RubiksCube.solve)
+SHORT_HISTORY = 17
+
+# Face letter -> (grid axis, +1 if the face is at the high end of that axis)
+FACE_LAYERS = {
+    'R': (0, 1), 'L': (0, -1),
+    'U': (1, 1), 'D': (1, -1),
+    'F': (2, 1), 'B': (2, -1)
+}
+# Middle slices turn in the direction of these faces
+SLICE_FACES = {'M': 'L', 'E': 'D', 'S': 'F'}
+FACE_NAMES = ['front', 'back', 'top', 'bottom', 'right', 'left']
+FACE_INDEX = {name: k for k, name in enumerate(FACE_NAMES)}
+# Compact sticker colors for RubiksCube.facelets()
+COLOR_CODES = {color: i for i, color in enumerate(COLORS.values())}
+
+# A parsed move: the face whose direction it follows, the 1-based range of
+# layers counted from that face (None for the middle slice), the turn
+# direction (1 = clockwise seen from the face) and the angle in degrees
+Move = namedtuple('Move', 'face first last direction angle')
+MOVE_PATTERN = re.compile(r"^(\d*)([UDLRFB]w|[UDLRFBMES]|[udlrfb])(['2]?)$")
+
+
+def parse_move(move):
+    """
+    Parse a move in extended cube notation.
+
+    Accepts outer turns (R, U', F2), inner layer turns with a depth prefix
+    (2R turns the second layer from R), wide turns (Rw or r turn the two
+    outer layers, 3Rw the outer three) and the middle slices M, E and S.
+
+    Returns:
+        Move tuple
+
+    Raises:
+        ValueError: if the move is not in this notation
+    """
+    match = MOVE_PATTERN.match(move)
+    if not match:
+        raise ValueError(f"Unknown move: {move}")
+    prefix, body, modifier = match.groups()
+    direction = -1 if modifier == "'" else 1
+    angle = 180 if modifier == '2' else 90
+
+    if body in SLICE_FACES:
+        if prefix:
+            raise ValueError(f"Slice moves take no depth: {move}")
+        return Move(SLICE_FACES[body], None, None, direction, angle)
+    if body.islower() or body.endswith('w'):
+        depth = int(prefix) if prefix else 2
+        return Move(body[0].upper(), 1, depth, direction, angle)
+    depth = int(prefix) if prefix else 1
+    return Move(body, depth, depth, direction, angle)
+
+
+def move_axis(move):
+    """Animation rotation axis for a parsed move (see MoveAnimator)"""
+    axis, end = FACE_LAYERS[move.face]
+    vector = [0, 0, 0]
+    vector[axis] = -end * move.direction
+    return vector
+
 class RubiksCube:
-    """Represents the complete 3x3x3 Rubik's Cube"""
-    def __init__(self, auto_animate=False, speed=8.0):
+    """
+    Represents a complete NxNxN Rubik's Cube (3x3x3 by default).
+
+    Cubies are indexed by a size^3 grid (None inside the cube), so a turn
+    only looks at the layers it moves. Each move's grid permutation is
+    computed once per cube size and cached in _move_plans.
+
+    mesh is None here; a RenderedCube keeps a CubeMesh in step with the
+    cubies through it.
+    """
+    _move_plans = {}
+
+    def __init__(self, auto_animate=False, speed=8.0, size=3, verbose=True,
+                 parallel_moves=True):
+        if size < 2:
+            raise ValueError("Cube size must be at least 2")
+        self.size = size
+        self.verbose = verbose  # Print shuffle/solve progress
+        self.parallel_moves = parallel_moves  # Animate commuting moves together
         self.cubies = []
         self.animator = MoveAnimator(speed=speed)
         self.move_queue = deque()
@@ -33,32 +121,52 @@ class RubiksCube:
         self.solving = False
         self.shuffling = False
         self.shuffle_total = 0
-        self.move_history = []
+        self.move_history = []  # Moves queued since the cube was last solved
+        self.history_valid = True  # False once the history stops matching the cube
         self.auto_moving = auto_animate
+        self.recorder = None  # Optional session_log.SessionRecorder
+        self.mesh = None  # Optional cube_mesh.CubeMesh (see RenderedCube)
+        # False while the pruning tables are still being built; solves that
+        # need the solver then wait in solve_pending until it is set
+        self.solver_ready = True
+        self.solve_pending = False
         self.initialize_cube()
         if auto_animate:
             self._queue_initial_animation()
         
     def initialize_cube(self):
-        """Create all 27 cubies with appropriate colors"""
+        """Create the surface cubies with appropriate colors"""
+        n = self.size
+        offset = (n - 1) / 2
         self.cubies = []
-        for x in range(-1, 2):
-            for y in range(-1, 2):
-                for z in range(-1, 2):
+        self.grid = np.empty((n, n, n), dtype=object)
+        for i in range(n):
+            for j in range(n):
+                for k in range(n):
+                    if 0 < i < n - 1 and 0 < j < n - 1 and 0 < k < n - 1:
+                        continue  # Hidden inside the cube
                     colors = {}
-                    if z == 1: colors['front'] = COLORS['G']
-                    if z == -1: colors['back'] = COLORS['B']
-                    if y == 1: colors['top'] = COLORS['W']
-                    if y == -1: colors['bottom'] = COLORS['Y']
-                    if x == 1: colors['right'] = COLORS['R']
-                    if x == -1: colors['left'] = COLORS['O']
-                    
-                    self.cubies.append(Cubie([x, y, z], colors))
-        
+                    if k == n - 1: colors['front'] = COLORS['G']
+                    if k == 0: colors['back'] = COLORS['B']
+                    if j == n - 1: colors['top'] = COLORS['W']
+                    if j == 0: colors['bottom'] = COLORS['Y']
+                    if i == n - 1: colors['right'] = COLORS['R']
+                    if i == 0: colors['left'] = COLORS['O']
+
+                    cubie = Cubie([i - offset, j - offset, k - offset], colors,
+                                  index=len(self.cubies))
+                    self.cubies.append(cubie)
+                    self.grid[i, j, k] = cubie
+
+        self.animator.reset()
         self.move_queue.clear()
         self.current_solution = []
         self.solving = False
+        self.solve_pending = False
         self.move_history = []
+        self.history_valid = True
+        if self.recorder is not None:
+            self.recorder.reset()
     
     def _queue_initial_animation(self):
         """Queue initial animation: forward sequence then backward"""
@@ -69,64 +177,90 @@ class RubiksCube:
         self.queue_moves(initial_sequence, track_history=False)
         self.queue_moves(reverse_sequence, track_history=False)
     
-    def get_face_state(self, face):
-        """Get 3x3 grid of colors for a specific face for minimap"""
-        state = [[None for _ in range(3)] for _ in range(3)]
-        
+    def _face_layer(self, face):
+        """size x size grid of the cubies on a face, as the face is read"""
+        n = self.size
+        g = self.grid
         if face == 'front':
-            for cubie in self.cubies:
-                if abs(cubie.position[2] - 1) < 0.1:
-                    x = int(cubie.position[0] + 1)
-                    y = int(-cubie.position[1] + 1)
-                    state[y][x] = cubie.colors.get('front', COLORS['K'])
+            return g[:, ::-1, n - 1].T
         elif face == 'back':
-            for cubie in self.cubies:
-                if abs(cubie.position[2] + 1) < 0.1:
-                    x = int(-cubie.position[0] + 1)
-                    y = int(-cubie.position[1] + 1)
-                    state[y][x] = cubie.colors.get('back', COLORS['K'])
+            return g[::-1, ::-1, 0].T
         elif face == 'top':
-            for cubie in self.cubies:
-                if abs(cubie.position[1] - 1) < 0.1:
-                    x = int(cubie.position[0] + 1)
-                    y = int(-cubie.position[2] + 1)
-                    state[y][x] = cubie.colors.get('top', COLORS['K'])
+            return g[:, n - 1, ::-1].T
         elif face == 'bottom':
-            for cubie in self.cubies:
-                if abs(cubie.position[1] + 1) < 0.1:
-                    x = int(cubie.position[0] + 1)
-                    y = int(cubie.position[2] + 1)
-                    state[y][x] = cubie.colors.get('bottom', COLORS['K'])
+            return g[:, 0, :].T
         elif face == 'right':
-            for cubie in self.cubies:
-                if abs(cubie.position[0] - 1) < 0.1:
-                    x = int(-cubie.position[2] + 1)
-                    y = int(-cubie.position[1] + 1)
-                    state[y][x] = cubie.colors.get('right', COLORS['K'])
+            return g[n - 1, ::-1, ::-1]
         elif face == 'left':
-            for cubie in self.cubies:
-                if abs(cubie.position[0] + 1) < 0.1:
-                    x = int(cubie.position[2] + 1)
-                    y = int(-cubie.position[1] + 1)
-                    state[y][x] = cubie.colors.get('left', COLORS['K'])
-        
-        return state
+            return g[0, ::-1, :]
+        return None
+
+    def get_face_state(self, face):
+        """Get size x size grid of colors for a specific face for minimap"""
+        layer = self._face_layer(face)
+        if layer is None:
+            return [[None] * self.size for _ in range(self.size)]
+        return [[cubie.colors.get(face, COLORS['K']) for cubie in row] for row in layer]
+
+    def facelets(self):
+        """Sticker colors as 6 * size^2 bytes (FACE_NAMES order, COLOR_CODES values)"""
+        return bytes(COLOR_CODES[color] for face in FACE_NAMES
+                     for row in self.get_face_state(face) for color in row)
+
+    def set_facelets(self, data):
+        """
+        Recolor the stickers from facelets() bytes.
+
+        Queued moves and the move in progress are dropped, and the move
+        history no longer explains the state.
+
+        Raises:
+            ValueError: if data is not 6 * size^2 color codes
+        """
+        n = self.size
+        colors = list(COLOR_CODES)
+        if len(data) != 6 * n * n or max(data) >= len(colors):
+            raise ValueError(f"Expected {6 * n * n} sticker color codes")
+        self.animator.reset()
+        self.move_queue.clear()
+        for k, face in enumerate(FACE_NAMES):
+            codes = data[k * n * n:(k + 1) * n * n]
+            for cubie, code in zip(self._face_layer(face).ravel(), codes):
+                cubie.colors[face] = colors[code]
+        self.current_solution = []
+        self.solving = False
+        self.shuffling = False
+        self.solve_pending = False
+        self.move_history = []
+        self.history_valid = False
+    
+    def move_layers(self, move):
+        """Grid axis and layer indices turned by a parsed move"""
+        n = self.size
+        axis, end = FACE_LAYERS[move.face]
+        if move.first is None:
+            if n % 2 == 0:
+                raise ValueError("Slice moves need an odd-sized cube")
+            depths = [n // 2 + 1]
+        else:
+            if move.first < 1 or move.last > n:
+                raise ValueError(f"Layer out of range for a {n}x{n}x{n} cube")
+            depths = range(move.first, move.last + 1)
+        return axis, [n - d if end > 0 else d - 1 for d in depths]
+    
+    def get_cubies_for_move(self, move):
+        """Get list of cubies turned by a move (string or parsed)"""
+        if isinstance(move, str):
+            move = parse_move(move)
+        axis, layers = self.move_layers(move)
+        slab = np.take(self.grid, layers, axis=axis).ravel()
+        return [c for c in slab if c is not None]
     
     def get_cubies_for_face(self, face):
         """Get list of cubies that belong to a specific face"""
-        if face == 'F':
-            return [c for c in self.cubies if abs(c.position[2] - 1) < 0.1]
-        elif face == 'B':
-            return [c for c in self.cubies if abs(c.position[2] + 1) < 0.1]
-        elif face == 'U':
-            return [c for c in self.cubies if abs(c.position[1] - 1) < 0.1]
-        elif face == 'D':
-            return [c for c in self.cubies if abs(c.position[1] + 1) < 0.1]
-        elif face == 'R':
-            return [c for c in self.cubies if abs(c.position[0] - 1) < 0.1]
-        elif face == 'L':
-            return [c for c in self.cubies if abs(c.position[0] + 1) < 0.1]
-        return []
+        if face not in FACE_LAYERS:
+            return []
+        return self.get_cubies_for_move(face)
     
     def to_singmaster(self):
         """
@@ -214,74 +348,149 @@ class RubiksCube:
     def queue_move(self, move):
         """Add a move to the queue"""
         self.move_queue.append(move)
-        # Track move history for solver (only if not solving)
-        if not self.solving:
-            self.move_history.append(move)
+        # Track move history for solver. Moves queued during a solve run
+        # after it, from the solved cube start_solution's history assumes
+        self.move_history.append(move)
     
     def queue_moves(self, moves, track_history=True):
         """Add multiple moves to the queue"""
         for move in moves:
             self.move_queue.append(move)
-            # Track move history for solver (only if not solving)
-            if track_history and not self.solving:
+            # Track move history for solver (see queue_move)
+            if track_history:
                 self.move_history.append(move)
     
     def update_animation(self):
         """Update rotation animation"""
+        if self.solve_pending and self.solver_ready and not self.animator.is_animating() \
+                and not self.move_queue:
+            # The solver just became ready; run the solve that waited for it
+            self.solve_pending = False
+            self.solve()
         if not self.animator.is_animating() and self.move_queue:
-            # Start next move
-            move = self.move_queue.popleft()
-            face = move[0]
-            cubies = self.get_cubies_for_face(face)
-            self.animator.start_move(move, cubies)
+            self.start_next_move()
         
         if self.animator.is_animating():
             complete = self.animator.update()
             
             if complete:
-                # Apply the rotation
-                self.apply_rotation()
-                self.animator.reset()
-                
-                # Check if solving is complete
-                if self.solving and not self.move_queue:
-                    self.solving = False
-                    print(f"Cube Solved Successfully!")
-                    print(f"------------------------------------------------------------------------------------------------")
-                
-                # Check if shuffling is complete
-                if self.shuffling and not self.move_queue:
-                    self.shuffling = False
-                
-                # Re-loop auto-animation
-                if self.auto_moving and not self.move_queue and not self.solving and not self.shuffling:
-                    self._queue_initial_animation()
+                self.finish_move()
+    
+    def start_next_move(self):
+        """Start animating the next queued move, with any that commute with it"""
+        moves = self.next_move_group()
+        cubie_groups = [self.get_cubies_for_move(move) for move in moves]
+        self.animator.start_moves(moves, cubie_groups)
+        if self.mesh is not None:
+            self.mesh.set_rotating([[c.index for c in cubies] for cubies in cubie_groups])
+    
+    def next_move_group(self):
+        """
+        Pop the next queued move plus the queued moves right after it that
+        turn other layers about the same axis. Those commute and touch
+        disjoint cubies, so they can be animated at the same time.
+        """
+        first = self.move_queue.popleft()
+        group = [first]
+        if not self.parallel_moves:
+            return group
+        axis, layers = self.move_layers(parse_move(first))
+        used = set(layers)
+        while self.move_queue:
+            next_axis, next_layers = self.move_layers(parse_move(self.move_queue[0]))
+            if next_axis != axis or used.intersection(next_layers):
+                break
+            used.update(next_layers)
+            group.append(self.move_queue.popleft())
+        return group
+    
+    def finish_move(self):
+        """Apply the move that just finished animating and update state"""
+        # Apply the rotation
+        self.apply_rotation()
+        self.animator.reset()
+        if self.mesh is not None:
+            self.mesh.set_rotating([])
+        
+        # Check if solving is complete
+        if self.solving and not self.move_queue:
+            self.solving = False
+            if self.verbose:
+                print(f"Cube Solved Successfully!")
+                print(f"------------------------------------------------------------------------------------------------")
+        
+        # Check if shuffling is complete
+        if self.shuffling and not self.move_queue:
+            self.shuffling = False
+        
+        # Re-loop auto-animation
+        if self.auto_moving and not self.move_queue and not self.solving and not self.shuffling:
+            self._queue_initial_animation()
     
     def apply_rotation(self):
         """Apply the completed rotation to cubie positions and colors"""
         if not self.animator.rotating_cubies:
             return
-        
-        angle_rad = math.radians(self.animator.target_angle)
-        axis = np.array(self.animator.rotation_axis)
-        axis = axis / np.linalg.norm(axis)
-        
-        # Rotation matrix using Rodrigues' formula
-        cos_a = math.cos(angle_rad)
-        sin_a = math.sin(angle_rad)
-        
-        for cubie in self.animator.rotating_cubies:
-            # Rotate position
-            pos = cubie.position
-            rotated = pos * cos_a + np.cross(axis, pos) * sin_a + axis * np.dot(axis, pos) * (1 - cos_a)
-            cubie.position = np.round(rotated)
-            
-            # Rotate colors
-            new_colors = {}
-            for face, color in cubie.colors.items():
-                new_face = self.rotate_face_name(face, axis, angle_rad)
-                new_colors[new_face] = color
-            cubie.colors = new_colors
+        for move in self.animator.current_moves:
+            self.apply_move(move)
+    
+    def apply_move(self, move):
+        """Apply a move instantly, without animation"""
+        src, dst, coords, face_map, face_perm = self._move_plan(move)
+        flat = self.grid.reshape(-1)
+        moved = flat[src]
+        flat[dst] = moved
+        present = moved != None
+        cubies = moved[present]
+        positions = coords[present]
+        for cubie, pos in zip(cubies, positions):
+            cubie.position = pos
+            cubie.colors = {face_map[face]: color for face, color in cubie.colors.items()}
+        if self.mesh is not None:
+            self.mesh.move_cubies([c.index for c in cubies], positions, face_perm)
+        if self.recorder is not None:
+            self.recorder.move(move, self)
+    
+    def _move_plan(self, move):
+        """
+        Grid permutation for a move on this cube size, cached per class.
+
+        Returns:
+            (src, dst, coords, face_map, face_perm): flat grid indices
+            before and after the turn, the new cubie positions in dst order,
+            and the mapping of sticker faces by name and by CubeMesh index
+        """
+        key = (self.size, move)
+        plan = RubiksCube._move_plans.get(key)
+        if plan is not None:
+            return plan
+
+        parsed = parse_move(move)
+        axis, layers = self.move_layers(parsed)
+        n = self.size
+        offset = (n - 1) / 2
+
+        # Rotation matrix using Rodrigues' formula, exact after rounding
+        angle_rad = math.radians(parsed.angle)
+        k = np.array(move_axis(parsed), dtype=float)
+        cross = np.array([[0, -k[2], k[1]], [k[2], 0, -k[0]], [-k[1], k[0], 0]])
+        rotation = np.round(np.eye(3) + math.sin(angle_rad) * cross +
+                            (1 - math.cos(angle_rad)) * cross @ cross)
+
+        index = np.indices((n, n, n)).reshape(3, -1).T
+        index = index[np.isin(index[:, axis], layers)]
+        coords = (index - offset) @ rotation.T
+        new_index = np.round(coords + offset).astype(int)
+        src = np.ravel_multi_index(index.T, (n, n, n))
+        dst = np.ravel_multi_index(new_index.T, (n, n, n))
+        face_map = {face: self.rotate_face_name(face, k, angle_rad) for face in FACE_NAMES}
+        face_perm = np.zeros(len(FACE_INDEX), dtype=np.intp)
+        for face, new_face in face_map.items():
+            face_perm[FACE_INDEX[face]] = FACE_INDEX[new_face]
+
+        plan = (src, dst, coords, face_map, face_perm)
+        RubiksCube._move_plans[key] = plan
+        return plan
     
     def rotate_face_name(self, face, axis, angle):
         """Determine new face name after rotation"""
@@ -310,8 +519,10 @@ class RubiksCube:
         if self.animator.is_animating() or self.move_queue:
             return
         
-        # Clear history before shuffling
-        self.move_history = []
+        # Start the history over if the shuffle begins from solved
+        if self.is_solved():
+            self.move_history = []
+            self.history_valid = True
         
         moves = []
         last_face = None
@@ -321,22 +532,44 @@ class RubiksCube:
             available_faces = [f for f in FACE_MOVES if f != last_face]
             face = random.choice(available_faces)
             modifier = random.choice(MOVE_MODIFIERS)
-            moves.append(face + modifier)
+            # Bigger cubes also turn inner layers, up to the middle
+            depth = random.randint(1, self.size // 2) if self.size > 3 else 1
+            moves.append((str(depth) if depth > 1 else '') + face + modifier)
             last_face = face
         
         self.shuffling = True
         self.shuffle_total = len(moves)
+        if self.recorder is not None:
+            self.recorder.shuffle(moves)
         self.queue_moves(moves)
-        print(f"Shuffling with ({len(moves)} moves) ==> {' '.join(moves)}")
+        if self.verbose:
+            print(f"Shuffling with ({len(moves)} moves) ==> {' '.join(moves)}")
     
     
     def solve(self):
-        """Solve the cube using TwoPhase algorithm"""
+        """
+        Solve the cube using TwoPhase algorithm.
+
+        While solver_ready is False only a short undo of move_history,
+        checked against the cube, is played at once; anything else waits in
+        solve_pending and starts from update_animation as soon as the solver
+        is ready and the cube is idle. Solving again while a solve waits
+        cancels it.
+        """
+        if self.solve_pending:
+            self.solve_pending = False
+            print("Cancelled the queued solve.")
+            return
+
         # Cancel any ongoing animation/solve first
         if self.animator.is_animating() or self.move_queue:
             self.move_queue.clear()
             self.animator.reset()
             self.solving = False
+            # Dropped moves are in the history but were never made
+            self.history_valid = False
+            if self.recorder is not None:
+                self.recorder.cancel()
             print("Cancelled current solve. Press S again to solve from current state.")
             return
         
@@ -344,22 +577,76 @@ class RubiksCube:
         if self.is_solved():
             print("Cube is already solved!")
             return
-        
-        # Get cube state directly from visual cube
-        cube_state = self.to_singmaster()
+
+        if self.size != 3:
+            print(f"The TwoPhase solver only handles 3x3x3 cubes, not {self.size}x{self.size}x{self.size}")
+            return
+
+        # Undoing the moves made since the cube was last solved is always a
+        # solution, so it bounds what the solver has to find
+        bound = self.history_solution()
+        if bound is not None and not self.solves(bound):
+            # The history missed a change to the cube (an empty undo of an
+            # unsolved cube, say), so it bounds nothing and the solve waits
+            # for the solver like any other
+            self.history_valid = False
+            bound = None
+        near_solved = bound is not None and len(bound) <= SHORT_HISTORY
+        if not near_solved and not self.solver_ready:
+            self.solve_pending = True
+            print("Solve queued until the solver tables are ready")
+            return
+        if self.recorder is not None:
+            self.recorder.solve_request()
+
         solution = None
-        if is_twophase_available():
-            solution = solve_state(cube_state)
-            if solution:
-                print(f"solving with  ({len(solution)} moves)  ==> {' '.join(solution)}")
+        if near_solved:
+            solution = bound
+        elif is_twophase_available():
+            # Get cube state directly from visual cube
+            cube_state = self.to_singmaster()
+            solution = solve_state(cube_state, target=len(bound) if bound else None)
+        if not solution:
+            solution = bound
+        if solution:
+            print(f"solving with  ({len(solution)} moves)  ==> {' '.join(solution)}")
         
         if solution:
-            self.current_solution = solution
-            self.solving = True
-            self.queue_moves(solution, track_history=False)
+            self.start_solution(solution)
         else:
             print("Could not find solution!")
 
+    def start_solution(self, solution):
+        """Queue a solution found by the solver and play it back"""
+        self.current_solution = solution
+        self.solving = True
+        if self.recorder is not None:
+            self.recorder.solution(solution)
+        # Once played back the cube is solved, so the history starts over
+        self.move_history = []
+        self.history_valid = True
+        self.queue_moves(solution, track_history=False)
+
+    def solves(self, moves):
+        """True if moves, applied to the current state, solve the cube"""
+        check = RubiksCube(size=self.size, verbose=False)
+        check.set_facelets(self.facelets())
+        for move in moves:
+            check.apply_move(move)
+        return check.is_solved()
+
+    def history_solution(self):
+        """
+        Canonicalized inverse of move_history, or None if the history
+        cannot serve as a solution (cancelled moves, other cube sizes or
+        non-face moves).
+        """
+        if not self.history_valid or self.size != 3:
+            return None
+        if any(parse_move(m).first != 1 or parse_move(m).last != 1 for m in self.move_history):
+            return None
+        return simplify_moves(invert_moves(self.move_history))
+
     
     def is_solved(self):
         """Check if the cube is solved"""
@@ -377,63 +664,51 @@ class RubiksCube:
                         return False
         
         return True
-    
-    def draw(self):
-        """Draw all cubies"""
-        for cubie in self.cubies:
-            if cubie in self.animator.rotating_cubies:
-                glPushMatrix()
-                glRotatef(self.animator.rotation_angle, *self.animator.rotation_axis)
-                cubie.draw()
-                glPopMatrix()
-            else:
-                cubie.draw()
 
 class MoveAnimator:
-    """Handles smooth animation of cube moves"""
+    """
+    Handles smooth animation of cube moves.
+
+    One animation slot may hold several moves on disjoint layers of the same
+    axis (R L', U D2, ...). They all start together and turn at the same
+    speed; each stops at its own angle and the slot ends with the longest.
+    """
     
     def __init__(self, speed=10.0):
         self.speed = speed  # degrees per frame
         self.animation_speed = speed 
         self.current_move = None
+        self.current_moves = []
         self.rotation_angle = 0
         self.target_angle = 0
         self.rotation_axis = None
         self.rotating_cubies = []
+        self.turns = []  # (target angle, axis) of each move in the slot
         
     def start_move(self, move, cubies):
         """Start animating a move"""
-        self.current_move = move
+        self.start_moves([move], [cubies])
+    
+    def start_moves(self, moves, cubie_groups):
+        """Start animating commuting moves together, one cubie list per move"""
+        self.current_moves = list(moves)
+        self.current_move = ' '.join(moves)
         self.rotation_angle = 0
-        self.rotating_cubies = cubies
+        self.rotating_cubies = [c for cubies in cubie_groups for c in cubies]
         
         # Parse move notation
-        face = move[0]
-        modifier = move[1:] if len(move) > 1 else ''
-        
-        if modifier == "'":
-            direction = -1
-            self.target_angle = 90
-        elif modifier == '2':
-            direction = 1
-            self.target_angle = 180
-        else:
-            direction = 1
-            self.target_angle = 90
-        
-        # Set rotation axis based on face
-        if face == 'F':
-            self.rotation_axis = [0, 0, -direction]
-        elif face == 'B':
-            self.rotation_axis = [0, 0, direction]
-        elif face == 'U':
-            self.rotation_axis = [0, -direction, 0]
-        elif face == 'D':
-            self.rotation_axis = [0, direction, 0]
-        elif face == 'R':
-            self.rotation_axis = [-direction, 0, 0]
-        elif face == 'L':
-            self.rotation_axis = [direction, 0, 0]
+        self.turns = []
+        for move in moves:
+            parsed = parse_move(move)
+            self.turns.append((parsed.angle, move_axis(parsed)))
+        self.target_angle = max(angle for angle, _ in self.turns)
+        self.rotation_axis = self.turns[0][1]
+    
+    def rotations(self, progress=None):
+        """(angle, axis) of each move in the slot after turning progress degrees"""
+        if progress is None:
+            progress = self.rotation_angle
+        return [(min(progress, angle), axis) for angle, axis in self.turns]
     
     def update(self):
         """Update animation state, returns True if animation complete"""
@@ -462,5 +737,7 @@ class MoveAnimator:
     def reset(self):
         """Reset animator state"""
         self.current_move = None
+        self.current_moves = []
         self.rotation_angle = 0
         self.rotating_cubies = []
+        self.turns = []
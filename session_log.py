@@ -0,0 +1,458 @@
+"""
+Compact binary session logs.
+
+A SessionRecorder attached to a RubiksCube (cube.recorder) appends every
+move the cube makes, plus resets, shuffles, solve requests, solutions
+and cancelled solves, to a log file. Moves take one byte each; a time
+stamp is only written when at least `resolution` seconds passed since the
+previous one, and every `checkpoint_every` moves the full sticker state
+is stored so a replay can check it is still on track.
+
+Format: a header (MAGIC, version, cube size, start time as a float64 Unix
+time) followed by events. A byte below EVENT_TIME is a move code (see
+MOVE_CODES); anything else is an event tag followed by its payload:
+
+    EVENT_TIME        uvarint milliseconds since the previous stamp
+    EVENT_CHECKPOINT  6 * size^2 sticker bytes (RubiksCube.facelets)
+    EVENT_RESET
+    EVENT_SHUFFLE     uvarint number of shuffle moves queued
+    EVENT_SOLVE       a solve was requested for the current state
+    EVENT_SOLUTION    uvarint count, then that many encoded moves
+    EVENT_CANCEL      queued moves were dropped
+    EVENT_MOVE_TEXT   length byte, then an ASCII move with no code
+
+The replayer re-applies a log at full speed with no animation:
+
+    python3 session_log.py replay session.rlog
+    python3 session_log.py replay session.rlog --records solves.bin
+    python3 session_log.py list session.rlog
+
+and `trajectory` prints the solver's distance after every move of a 3x3x3
+session (see solver.solve_trajectory):
+
+    python3 session_log.py trajectory session.rlog --budget 5000
+"""
+
+import argparse
+import struct
+import sys
+import time
+
+from rubiks_cube import parse_move, SLICE_FACES
+
+MAGIC = b'RUBIKLOG'
+VERSION = 1
+HEADER = struct.Struct('<8sBBd')
+
+(EVENT_TIME, EVENT_CHECKPOINT, EVENT_RESET, EVENT_SHUFFLE, EVENT_SOLVE,
+ EVENT_SOLUTION, EVENT_CANCEL, EVENT_MOVE_TEXT) = range(0xF0, 0xF8)
+EVENT_NAMES = {EVENT_TIME: 'time', EVENT_CHECKPOINT: 'checkpoint', EVENT_RESET: 'reset',
+               EVENT_SHUFFLE: 'shuffle', EVENT_SOLVE: 'solve', EVENT_SOLUTION: 'solution',
+               EVENT_CANCEL: 'cancel', EVENT_MOVE_TEXT: 'move'}
+
+
+def canonical_move(move):
+    """Spell a move the one way MOVE_CODES knows it (r -> Rw, 2Rw -> Rw, 1R -> R)"""
+    parsed = parse_move(move)
+    suffix = '2' if parsed.angle == 180 else ("'" if parsed.direction < 0 else '')
+    if parsed.first is None:
+        body = next(s for s, face in SLICE_FACES.items() if face == parsed.face)
+    elif parsed.first == parsed.last:
+        body = (str(parsed.first) if parsed.first > 1 else '') + parsed.face
+    else:
+        body = (str(parsed.last) if parsed.last > 2 else '') + parsed.face + 'w'
+    return body + suffix
+
+
+def _move_table():
+    """Outer and inner turns to depth 4, wide turns to depth 4 and slices"""
+    bodies = []
+    for face in 'URFDLB':
+        bodies += [face] + [f"{d}{face}" for d in range(2, 5)]
+        bodies += [f"{face}w"] + [f"{d}{face}w" for d in range(3, 5)]
+    bodies += list(SLICE_FACES)
+    return [body + suffix for body in bodies for suffix in ('', "'", '2')]
+
+
+MOVE_NAMES = _move_table()
+MOVE_CODES = {name: code for code, name in enumerate(MOVE_NAMES)}
+assert len(MOVE_NAMES) < EVENT_TIME
+
+
+_encoded = {}
+
+
+def encode_move(move):
+    """One byte for moves in MOVE_CODES, an EVENT_MOVE_TEXT escape otherwise"""
+    data = _encoded.get(move)
+    if data is None:
+        name = canonical_move(move)
+        code = MOVE_CODES.get(name)
+        if code is not None:
+            data = bytes((code,))
+        else:
+            text = name.encode('ascii')
+            data = bytes((EVENT_MOVE_TEXT, len(text))) + text
+        _encoded[move] = data
+    return data
+
+
+def _uvarint(value):
+    out = bytearray()
+    while value >= 0x80:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+class SessionRecorder:
+    """
+    Appends a cube's session to a binary log.
+
+    Each event goes to the file in a single write() call (see broadcast.py).
+
+    Args:
+        path: log file, overwritten, or an open binary file to write to
+        size: cube size N
+        checkpoint_every: moves between full state checkpoints
+        resolution: seconds between time stamps at the most
+    """
+    def __init__(self, path, size=3, checkpoint_every=256, resolution=0.01):
+        self.file = path if hasattr(path, 'write') else open(path, 'wb')
+        self.size = size
+        self.checkpoint_every = checkpoint_every
+        self.resolution = resolution
+        self.moves = 0
+        self.since_checkpoint = 0
+        self.file.write(HEADER.pack(MAGIC, VERSION, size, time.time()))
+        self.stamped = time.monotonic()
+
+    def _stamp(self):
+        now = time.monotonic()
+        if now - self.stamped >= self.resolution:
+            ms = int((now - self.stamped) * 1000)
+            self.file.write(bytes((EVENT_TIME,)) + _uvarint(ms))
+            self.stamped += ms / 1000
+
+    def _event(self, tag, payload=b''):
+        self._stamp()
+        self.file.write(bytes((tag,)) + payload)
+        # Anything but a move is rare and worth having on disk after a crash
+        self.file.flush()
+
+    def move(self, move, cube):
+        """Log one applied move; cube supplies the state for checkpoints"""
+        self._stamp()
+        self.file.write(encode_move(move))
+        self.moves += 1
+        self.since_checkpoint += 1
+        if self.since_checkpoint >= self.checkpoint_every:
+            self.checkpoint(cube)
+
+    def checkpoint(self, cube):
+        self.since_checkpoint = 0
+        self._event(EVENT_CHECKPOINT, cube.facelets())
+
+    def reset(self):
+        self.since_checkpoint = 0
+        self._event(EVENT_RESET)
+
+    def shuffle(self, moves):
+        self._event(EVENT_SHUFFLE, _uvarint(len(moves)))
+
+    def solve_request(self):
+        self._event(EVENT_SOLVE)
+
+    def solution(self, moves):
+        self._event(EVENT_SOLUTION, _uvarint(len(moves)) + b''.join(map(encode_move, moves)))
+
+    def cancel(self):
+        self._event(EVENT_CANCEL)
+
+    def close(self, cube=None):
+        """Write a final checkpoint (if given the cube) and close the file"""
+        if cube is not None:
+            self.checkpoint(cube)
+        self.file.close()
+
+
+class RecorderTee:
+    """Passes every recorder call on to several recorders (cube.recorder holds one)"""
+    def __init__(self, *recorders):
+        self.recorders = recorders
+
+    def __getattr__(self, name):
+        def call(*args, **kwargs):
+            for recorder in self.recorders:
+                getattr(recorder, name)(*args, **kwargs)
+        return call
+
+
+def read_session(data):
+    """
+    Decode a session log.
+
+    Args:
+        data: the whole log as bytes
+
+    Returns:
+        (size, start_time, events): events is a list of (seconds since
+        start, kind, value). kind is 'move' (value: move string),
+        'checkpoint' (sticker bytes), 'shuffle' (move count), 'solution'
+        (move list) or 'reset', 'solve', 'cancel' (value None).
+
+    An event cut short at the end of the data (the recorder died while
+    writing it) is dropped.
+
+    Raises:
+        ValueError: if the data is not a session log or is corrupt
+    """
+    if len(data) < HEADER.size:
+        raise ValueError("Not a session log")
+    magic, version, size, start = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Not a session log (or an unknown version)")
+    events, _, _ = decode_events(data, size, HEADER.size)
+    return size, start, events
+
+
+def decode_events(data, size, pos=0, elapsed_ms=0):
+    """
+    Decode the events in data[pos:], as far as they are complete.
+
+    For logs that arrive in pieces (see broadcast.py): call again with the
+    returned offset and elapsed_ms once more data is there.
+
+    Args:
+        data: log bytes after the header
+        size: cube size N (checkpoints hold 6 * N^2 bytes)
+        pos: offset of the first event
+        elapsed_ms: time stamp total so far
+
+    Returns:
+        (events as read_session lists them, offset of the first event cut
+        short or len(data), the time stamp total after the last event)
+
+    Raises:
+        ValueError: if the data is corrupt
+    """
+    view = memoryview(data)
+    events = []
+
+    def uvarint():
+        nonlocal pos
+        value = shift = 0
+        while True:
+            byte = view[pos]
+            pos += 1
+            value |= (byte & 0x7F) << shift
+            shift += 7
+            if byte < 0x80:
+                return value
+
+    def move():
+        nonlocal pos
+        code = view[pos]
+        pos += 1
+        if code < EVENT_TIME:
+            return MOVE_NAMES[code]
+        if code != EVENT_MOVE_TEXT:
+            raise ValueError(f"Expected a move at byte {pos - 1}")
+        length = view[pos]
+        pos += 1 + length
+        if pos > len(view):
+            raise IndexError
+        return bytes(view[pos - length:pos]).decode('ascii')
+
+    while pos < len(view):
+        start = pos
+        try:
+            tag = view[pos]
+            if tag < EVENT_TIME or tag == EVENT_MOVE_TEXT:
+                events.append((elapsed_ms / 1000, 'move', move()))
+                continue
+            pos += 1
+            kind = EVENT_NAMES.get(tag)
+            value = None
+            if tag == EVENT_TIME:
+                elapsed_ms += uvarint()
+                continue
+            elif tag == EVENT_CHECKPOINT:
+                count = 6 * size * size
+                value = bytes(view[pos:pos + count])
+                if len(value) != count:
+                    raise IndexError
+                pos += count
+            elif tag == EVENT_SHUFFLE:
+                value = uvarint()
+            elif tag == EVENT_SOLUTION:
+                value = [move() for _ in range(uvarint())]
+            elif kind is None:
+                raise ValueError(f"Unknown event {tag:#x} at byte {pos - 1}")
+            events.append((elapsed_ms / 1000, kind, value))
+        except IndexError:
+            pos = start
+            break
+    return events, pos, elapsed_ms
+
+
+def replay(events, size, on_solve=None):
+    """
+    Re-apply logged events to a fresh cube with no animation. A log that
+    opens with a checkpoint (a saved broadcast, see broadcast.py) starts
+    from that state.
+
+    Args:
+        events: from read_session
+        size: cube size N
+        on_solve: optional callback(cube, index) at every solve request
+
+    Returns:
+        (cube, moves applied, list of event indices whose checkpoint
+        did not match the replayed state)
+    """
+    from rubiks_cube import RubiksCube
+
+    cube = RubiksCube(size=size, verbose=False)
+    moves = 0
+    mismatches = []
+    for i, (_, kind, value) in enumerate(events):
+        if kind == 'move':
+            cube.apply_move(value)
+            moves += 1
+        elif kind == 'reset':
+            cube.initialize_cube()
+        elif kind == 'checkpoint' and i == 0:
+            cube.set_facelets(value)
+        elif kind == 'checkpoint':
+            if cube.facelets() != value:
+                mismatches.append(i)
+        elif kind == 'solve' and on_solve is not None:
+            on_solve(cube, i)
+    return cube, moves, mismatches
+
+
+def trajectories(events, size):
+    """
+    Split a session into runs of outer face turns for solve_trajectory.
+
+    A run ends at a reset or at a move the solver cannot take (slice, wide
+    or inner layer turns); the next one starts from the state after it.
+    As in replay(), a log that opens with a checkpoint starts from it.
+
+    Args:
+        events: from read_session
+        size: cube size N (only 3 can be solved)
+
+    Returns:
+        list of (start Singmaster state, [(event index, move), ...])
+    """
+    from rubiks_cube import RubiksCube
+    from solver import move_indices
+
+    cube = RubiksCube(size=size, verbose=False)
+    runs = [(cube.to_singmaster(), [])]
+    for i, (_, kind, value) in enumerate(events):
+        if kind == 'checkpoint' and i == 0:
+            cube.set_facelets(value)
+            runs = [(cube.to_singmaster(), [])]
+        elif kind == 'reset':
+            cube.initialize_cube()
+            runs.append((cube.to_singmaster(), []))
+        elif kind == 'move':
+            cube.apply_move(value)
+            try:
+                move_indices([value])
+            except KeyError:
+                runs.append((cube.to_singmaster(), []))
+            else:
+                runs[-1][1].append((i, value))
+    return [run for run in runs if run[1]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect and replay session logs")
+    parser.add_argument('command', choices=('replay', 'list', 'trajectory'))
+    parser.add_argument('log', help="session log written by cub3D.py --record")
+    parser.add_argument('--states', metavar='FILE',
+                        help="write the Singmaster state at every solve request, one per line")
+    parser.add_argument('--records', metavar='FILE',
+                        help="write 20-byte cubepos records of those states (twophase --binary input)")
+    parser.add_argument('--budget', type=int,
+                        help="trajectory: phase 1 leaves searched per position (twophase --budget)")
+    parser.add_argument('--solutions', action='store_true',
+                        help="trajectory: print each position's solution too")
+    parser.add_argument('--twophase', help="trajectory: solver executable")
+    args = parser.parse_args()
+
+    with open(args.log, 'rb') as f:
+        data = f.read()
+    try:
+        size, start, events = read_session(data)
+    except ValueError as e:
+        print(f"Cannot read {args.log}: {e}")
+        return 1
+
+    if args.command == 'list':
+        print(f"{size}x{size}x{size} session started {time.ctime(start)}, "
+              f"{len(data)} bytes, {len(events)} events")
+        for i, (t, kind, value) in enumerate(events):
+            if kind == 'solution':
+                value = ' '.join(value)
+            elif kind == 'checkpoint':
+                value = f"{len(value)} stickers"
+            print(f"{i:7d} {t:10.2f}s  {kind:<10} {'' if value is None else value}")
+        return 0
+
+    if args.command == 'trajectory':
+        if size != 3:
+            print(f"The TwoPhase solver only handles 3x3x3 cubes, not {size}x{size}x{size}")
+            return 1
+        from solver import singmaster_to_cubepos, solve_trajectory
+        print(f"{'event':>7} {'move':<5} {'moves':>5}")
+        for start, run in trajectories(events, size):
+            solutions = solve_trajectory([move for _, move in run], singmaster_to_cubepos(start),
+                                         args.twophase, args.budget)
+            next(solutions)  # The start position
+            for (i, move), solution in zip(run, solutions):
+                if solution is None:
+                    # Slice and wide turns move the centers the solver assumes fixed
+                    print(f"{i:7d} {move:<5} not solvable until a reset")
+                    break
+                line = f"{i:7d} {move:<5} {len(solution):5d}"
+                if args.solutions:
+                    line += '  ' + ' '.join(solution)
+                print(line)
+        return 0
+
+    states = []
+
+    def on_solve(cube, index):
+        if size == 3:
+            states.append(cube.to_singmaster())
+
+    begin = time.perf_counter()
+    cube, moves, mismatches = replay(events, size, on_solve if args.states or args.records else None)
+    elapsed = time.perf_counter() - begin
+
+    checkpoints = sum(1 for _, kind, _ in events if kind == 'checkpoint')
+    print(f"Replayed {len(events)} events, {moves} moves in {elapsed:.2f}s "
+          f"({moves / elapsed if elapsed > 0 else 0:.0f} moves/s); "
+          f"{checkpoints - len(mismatches)}/{checkpoints} checkpoints match")
+    if mismatches:
+        print(f"First divergence at event {mismatches[0]}")
+    if args.states:
+        with open(args.states, 'w') as f:
+            f.writelines(state + '\n' for state in states)
+    if args.records:
+        from solver import singmaster_to_cubepos, encode_states
+        with open(args.records, 'wb') as f:
+            f.write(encode_states([singmaster_to_cubepos(state) for state in states]))
+    if args.states or args.records:
+        print(f"Wrote {len(states)} solve request states")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,580 @@
+"""
+Distributed batch solving.
+
+A coordinator splits a corpus of Singmaster states (one per line) into
+work units and hands them to workers over TCP. Each worker keeps a
+SolverPool of twophase --binary processes, so its pruning tables are
+loaded once, and solves one unit at a time with the next few buffered.
+
+Units a worker loses (its connection drops) go back to the front of the
+queue. Once the queue is empty, an idle worker steals the most recently
+sent unit from the worker with the most buffered, and when nothing is
+left to steal it gets a second copy of a unit that has been running much
+longer than units usually take; the first answer wins and the other copy
+is cancelled. Answers are aggregated in corpus order with per-unit stats.
+
+Every message is a MESSAGE_HEADER (type, payload length) and a payload:
+
+    MSG_HELLO   worker -> coordinator   worker name (UTF-8)
+    MSG_UNIT    coordinator -> worker   unit id, then 20-byte cubepos records
+    MSG_RESULT  worker -> coordinator   unit id, solve seconds, then
+                                        pack_solutions output for the unit
+    MSG_CANCEL  coordinator -> worker   unit id; dropped if not started yet
+    MSG_DONE    coordinator -> worker   everything is solved; exit
+
+Examples:
+    python3 solve_cluster.py coordinator corpus.txt --port 8643 --out solutions.txt
+    python3 solve_cluster.py worker --connect 10.0.0.5:8643 --processes 4
+    python3 solve_cluster.py local corpus.txt --workers 3 --stats units.json
+    python3 solve_cluster.py local --random 500 --workers 3 --crash-after 2
+"""
+
+import argparse
+import json
+import socket
+import struct
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+
+from solver import (SolverPool, is_twophase_available, pack_solutions, singmaster_to_cubepos,
+                    unpack_solutions, CUBEPOS_RECORD, TWOPHASE_PATH)
+
+MESSAGE_HEADER = struct.Struct('!BI')
+UNIT_HEADER = struct.Struct('!I')
+RESULT_HEADER = struct.Struct('!Id')
+MSG_HELLO, MSG_UNIT, MSG_RESULT, MSG_CANCEL, MSG_DONE = range(1, 6)
+
+DEFAULT_PORT = 8643
+
+
+def send_message(sock, kind, payload=b''):
+    sock.sendall(MESSAGE_HEADER.pack(kind, len(payload)) + payload)
+
+
+def _recv_exact(sock, size):
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("Connection closed")
+        data += chunk
+    return bytes(data)
+
+
+def recv_message(sock):
+    """
+    Read one message.
+
+    Returns:
+        (kind, payload)
+
+    Raises:
+        ConnectionError: if the peer went away
+    """
+    kind, size = MESSAGE_HEADER.unpack(_recv_exact(sock, MESSAGE_HEADER.size))
+    return kind, _recv_exact(sock, size)
+
+
+def read_corpus(lines):
+    """
+    Parse Singmaster states, one per line ('#' starts a comment).
+
+    Returns:
+        List of 20-byte cubepos records
+
+    Raises:
+        ValueError: naming the first line that is not a valid state
+    """
+    records = []
+    for number, line in enumerate(lines, 1):
+        line = line.split('#', 1)[0].strip()
+        if not line:
+            continue
+        try:
+            records.append(singmaster_to_cubepos(line))
+        except ValueError as e:
+            raise ValueError(f"line {number}: {e}") from None
+    return records
+
+
+class WorkUnit:
+    """A slice of the corpus and what became of it"""
+    def __init__(self, uid, first, records):
+        self.id = uid
+        self.first = first  # Corpus index of records[0]
+        self.records = records
+        self.holders = {}  # WorkerLink -> time it was sent there
+        self.dispatches = 0
+        self.solutions = None
+        self.stats = None
+
+
+class WorkerLink:
+    """The coordinator's side of one worker connection"""
+    def __init__(self, sock, address):
+        self.sock = sock
+        self.name = f"{address[0]}:{address[1]}"
+        self.outstanding = {}  # WorkUnit -> send time, oldest first
+        self.units = 0
+        self.states = 0
+        self.solve_s = 0.0
+        self.lost = False
+
+
+class Coordinator:
+    """
+    Hands work units to connected workers and collects their answers.
+
+    Each worker gets up to `prefetch` units at a time so it never waits
+    for the next one. A unit that has been out for `straggler_factor`
+    times the mean round trip is a straggler and may be run twice.
+    """
+    def __init__(self, records, unit_size=64, prefetch=2, straggler_factor=3.0):
+        self.units = [WorkUnit(uid, first, records[first:first + unit_size])
+                      for uid, first in enumerate(range(0, len(records), unit_size))]
+        self.size = len(records)
+        self.prefetch = prefetch
+        self.straggler_factor = straggler_factor
+        self.queue = deque(self.units)
+        self.links = []
+        self.links_seen = []  # Every worker that ever said hello, for the stats
+        self.remaining = len(self.units)
+        self.round_trip_s = 0.0
+        self.cond = threading.Condition()
+        self.counters = {'dispatched': 0, 'redispatched': 0, 'stolen': 0, 'speculative': 0,
+                         'wasted': 0, 'lost_workers': 0}
+        self.server = None
+        self.started = None
+        self.finished = None
+
+    def serve(self, host='0.0.0.0', port=DEFAULT_PORT):
+        """Start accepting workers in the background; returns the bound port"""
+        self.server = socket.create_server((host, port))
+        self.started = time.monotonic()
+        if not self.units:
+            self.finished = self.started
+        threading.Thread(target=self._accept, daemon=True).start()
+        threading.Thread(target=self._monitor, daemon=True).start()
+        return self.server.getsockname()[1]
+
+    def wait(self, timeout=None):
+        """Block until every unit is solved; returns False on timeout"""
+        with self.cond:
+            return self.cond.wait_for(lambda: self.remaining == 0, timeout)
+
+    def close(self):
+        with self.cond:
+            links = list(self.links)
+        for link in links:
+            try:
+                link.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        if self.server is not None:
+            self.server.close()
+
+    def solutions(self):
+        """Solutions in corpus order (move lists, None where unsolvable or unsolved)"""
+        result = []
+        for unit in self.units:
+            result.extend(unit.solutions or [None] * len(unit.records))
+        return result
+
+    def stats(self):
+        """Per-unit and per-worker statistics plus the totals"""
+        with self.cond:
+            units = [unit.stats for unit in self.units if unit.stats is not None]
+            workers = {}
+            for link in self.links_seen:
+                workers[link.name] = {'units': link.units, 'states': link.states,
+                                      'solve_s': round(link.solve_s, 3),
+                                      'lost': link.lost}
+            lengths = [len(s) for unit in self.units if unit.solutions for s in unit.solutions
+                       if s is not None]
+            end = self.finished if self.finished is not None else time.monotonic()
+            wall = end - self.started if self.started is not None else 0.0
+            return {
+                'states': self.size,
+                'solved': len(lengths),
+                'unsolvable': sum(u['unsolvable'] for u in units),
+                'units': len(self.units),
+                'units_done': len(units),
+                'mean_length': sum(lengths) / len(lengths) if lengths else None,
+                'max_length': max(lengths, default=None),
+                'wall_s': round(wall, 3),
+                'states_per_s': round(self.size / wall, 2) if wall > 0 and not self.remaining else None,
+                'counters': dict(self.counters),
+                'workers': workers,
+                'per_unit': units,
+            }
+
+    def _accept(self):
+        while True:
+            try:
+                sock, address = self.server.accept()
+            except OSError:
+                return
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            link = WorkerLink(sock, address)
+            threading.Thread(target=self._serve_link, args=(link,), daemon=True).start()
+
+    def _serve_link(self, link):
+        try:
+            kind, payload = recv_message(link.sock)
+            if kind != MSG_HELLO:
+                raise ConnectionError("Expected a hello")
+            link.name = payload.decode(errors='replace') or link.name
+            with self.cond:
+                self.links.append(link)
+                self.links_seen.append(link)
+                if self.remaining == 0:
+                    self._send(link, MSG_DONE)
+                self._fill(link)
+            while True:
+                kind, payload = recv_message(link.sock)
+                if kind == MSG_RESULT:
+                    self._result(link, payload)
+        except (ConnectionError, OSError, struct.error):
+            pass
+        finally:
+            self._lost(link)
+            link.sock.close()
+
+    def _send(self, link, kind, payload=b''):
+        """Send under self.cond; a failed send is noticed by the reader thread"""
+        try:
+            send_message(link.sock, kind, payload)
+        except OSError:
+            try:
+                link.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def _result(self, link, payload):
+        uid, solve_s = RESULT_HEADER.unpack_from(payload)
+        now = time.monotonic()
+        with self.cond:
+            unit = self.units[uid]
+            sent = unit.holders.pop(link, None)
+            link.outstanding.pop(unit, None)
+            if unit.solutions is not None:
+                self.counters['wasted'] += 1
+                self._fill(link)
+                return
+            solutions = unpack_solutions(payload[RESULT_HEADER.size:])
+            if len(solutions) != len(unit.records):
+                print(f"Worker {link.name} returned {len(solutions)} answers "
+                      f"for the {len(unit.records)} states of unit {uid}")
+                if not unit.holders:
+                    self.queue.appendleft(unit)
+                self._fill(link)
+                return
+            unit.solutions = solutions
+            lengths = [len(s) for s in solutions if s is not None]
+            round_trip = now - sent if sent is not None else solve_s
+            unit.stats = {
+                'unit': uid, 'first': unit.first, 'states': len(unit.records),
+                'solved': len(lengths), 'unsolvable': len(solutions) - len(lengths),
+                'moves': sum(lengths), 'max_length': max(lengths, default=None),
+                'worker': link.name, 'dispatches': unit.dispatches,
+                'solve_ms': round(solve_s * 1000, 1), 'round_trip_ms': round(round_trip * 1000, 1),
+            }
+            link.units += 1
+            link.states += len(unit.records)
+            link.solve_s += solve_s
+            done = len(self.units) - self.remaining
+            self.round_trip_s += (round_trip - self.round_trip_s) / (done + 1)
+            self.remaining -= 1
+            for other in list(unit.holders):
+                other.outstanding.pop(unit, None)
+                self._send(other, MSG_CANCEL, UNIT_HEADER.pack(uid))
+            unit.holders.clear()
+            if self.remaining == 0:
+                self.finished = now
+                for other in self.links:
+                    self._send(other, MSG_DONE)
+                self.cond.notify_all()
+                return
+            for other in self.links:
+                self._fill(other)
+
+    def _lost(self, link):
+        with self.cond:
+            if link not in self.links:
+                return
+            self.links.remove(link)
+            if self.remaining:
+                link.lost = True
+                self.counters['lost_workers'] += 1
+            # Oldest first, so the queue keeps corpus order
+            for unit in reversed(list(link.outstanding)):
+                del unit.holders[link]
+                if unit.solutions is None and not unit.holders:
+                    self.queue.appendleft(unit)
+                    self.counters['redispatched'] += 1
+            link.outstanding.clear()
+            for other in self.links:
+                self._fill(other)
+
+    def _monitor(self):
+        # Stragglers only show up with time, so look for them periodically
+        while True:
+            time.sleep(0.25)
+            with self.cond:
+                if self.remaining == 0:
+                    return
+                for link in self.links:
+                    self._fill(link)
+
+    def _fill(self, link):
+        """Top up one worker's buffer (called with self.cond held)"""
+        while len(link.outstanding) < self.prefetch:
+            unit = self._next_unit(link)
+            if unit is None:
+                return
+            now = time.monotonic()
+            unit.holders[link] = now
+            unit.dispatches += 1
+            link.outstanding[unit] = now
+            self.counters['dispatched'] += 1
+            self._send(link, MSG_UNIT, UNIT_HEADER.pack(unit.id) + b''.join(unit.records))
+
+    def _next_unit(self, link):
+        while self.queue:
+            unit = self.queue.popleft()
+            if unit.solutions is None and not unit.holders:
+                return unit
+        if link.outstanding:
+            return None
+
+        # Steal: the newest unit of the worker with the most buffered
+        victim = max((other for other in self.links if other is not link),
+                     key=lambda other: len(other.outstanding), default=None)
+        if victim is not None and len(victim.outstanding) > 1:
+            unit = next(reversed(victim.outstanding))
+            del victim.outstanding[unit]
+            del unit.holders[victim]
+            self._send(victim, MSG_CANCEL, UNIT_HEADER.pack(unit.id))
+            self.counters['stolen'] += 1
+            return unit
+
+        # Speculate: a second copy of the slowest straggler
+        if self.remaining == len(self.units):
+            return None
+        now = time.monotonic()
+        limit = self.straggler_factor * self.round_trip_s
+        stragglers = [(sent, unit) for other in self.links if other is not link
+                      for unit, sent in other.outstanding.items()
+                      if len(unit.holders) == 1 and now - sent > limit]
+        if not stragglers:
+            return None
+        self.counters['speculative'] += 1
+        return min(stragglers, key=lambda item: item[0])[1]
+
+
+class ClusterWorker:
+    """
+    Connects to a coordinator and solves the units it is sent.
+
+    Units are solved one at a time, every record of a unit spread over the
+    SolverPool; units that arrive meanwhile wait in a local queue, where a
+    cancel can still remove them.
+    """
+    def __init__(self, host, port, processes=1, twophase_path=None, args=(), name=None,
+                 crash_after=None):
+        self.address = (host, port)
+        self.pool_args = (processes, twophase_path, args)
+        self.name = name or f"{socket.gethostname()}/{id(self) & 0xffff:04x}"
+        self.crash_after = crash_after
+        self.cond = threading.Condition()
+        self.inbox = deque()
+        self.stopped = False
+        self.solved = 0
+
+    def run(self):
+        """Serve until the coordinator is done or goes away; returns an exit code"""
+        sock = socket.create_connection(self.address)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        pool = SolverPool(*self.pool_args)
+        send_message(sock, MSG_HELLO, self.name.encode())
+        solver = threading.Thread(target=self._solve_units, args=(sock, pool), daemon=True)
+        solver.start()
+        clean = False
+        try:
+            while True:
+                kind, payload = recv_message(sock)
+                if kind == MSG_DONE:
+                    clean = True
+                    break
+                with self.cond:
+                    if kind == MSG_UNIT:
+                        uid, = UNIT_HEADER.unpack_from(payload)
+                        body = payload[UNIT_HEADER.size:]
+                        records = [body[i:i + CUBEPOS_RECORD.size]
+                                   for i in range(0, len(body), CUBEPOS_RECORD.size)]
+                        self.inbox.append((uid, records))
+                    elif kind == MSG_CANCEL:
+                        uid, = UNIT_HEADER.unpack_from(payload)
+                        self.inbox = deque(unit for unit in self.inbox if unit[0] != uid)
+                    self.cond.notify_all()
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            with self.cond:
+                self.stopped = True
+                self.cond.notify_all()
+            sock.close()
+            pool.close()
+        return 0 if clean else 1
+
+    def _solve_units(self, sock, pool):
+        while True:
+            with self.cond:
+                self.cond.wait_for(lambda: self.stopped or self.inbox)
+                if self.stopped:
+                    return
+                uid, records = self.inbox.popleft()
+            start = time.perf_counter()
+            for i, record in enumerate(records):
+                pool.submit(record, i)
+            solutions = [None] * len(records)
+            answered = 0
+            while answered < len(records):
+                for i, solution in pool.wait(timeout=0.5):
+                    solutions[i] = solution
+                    answered += 1
+                if self.stopped:
+                    return
+            elapsed = time.perf_counter() - start
+            try:
+                send_message(sock, MSG_RESULT,
+                             RESULT_HEADER.pack(uid, elapsed) + pack_solutions(solutions))
+            except OSError:
+                return
+            self.solved += 1
+            if self.crash_after is not None and self.solved >= self.crash_after:
+                # Vanish without a goodbye, abandoning whatever is buffered
+                print(f"Worker {self.name} dropping out after {self.solved} units")
+                sock.shutdown(socket.SHUT_RDWR)
+                return
+
+
+def _parse_address(text):
+    host, _, port = text.rpartition(':')
+    return host or '127.0.0.1', int(port)
+
+
+def _print_summary(stats):
+    counters = stats['counters']
+    mean = f"{stats['mean_length']:.2f}" if stats['mean_length'] is not None else '-'
+    print(f"{stats['states']} states in {stats['units']} units, {stats['wall_s']:.2f}s "
+          f"({stats['states_per_s'] or 0:.1f} states/s); {stats['solved']} solved, "
+          f"{stats['unsolvable']} unsolvable, mean length {mean}, max {stats['max_length']}")
+    print(f"Dispatched {counters['dispatched']}: {counters['redispatched']} re-dispatched "
+          f"from {counters['lost_workers']} lost worker(s), {counters['stolen']} stolen, "
+          f"{counters['speculative']} speculative ({counters['wasted']} duplicate answers)")
+    for name, worker in stats['workers'].items():
+        print(f"  {name:<24} {worker['units']:5d} units {worker['states']:7d} states "
+              f"{worker['solve_s']:8.2f}s solving{'  (lost)' if worker['lost'] else ''}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Solve a corpus of states across TCP workers")
+    parser.add_argument('command', choices=('coordinator', 'worker', 'local'))
+    parser.add_argument('corpus', nargs='?', help="Singmaster states, one per line")
+    parser.add_argument('--random', type=int, metavar='N',
+                        help="solve N random 25-move shuffles instead of a corpus file")
+    parser.add_argument('--seed', type=int, help="seed for --random")
+    parser.add_argument('--host', default='0.0.0.0', help="coordinator listen address")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help="coordinator port")
+    parser.add_argument('--connect', default=f'127.0.0.1:{DEFAULT_PORT}', metavar='HOST:PORT',
+                        help="coordinator a worker connects to")
+    parser.add_argument('--unit-size', type=int, default=64, help="states per work unit")
+    parser.add_argument('--prefetch', type=int, default=2, help="units buffered per worker")
+    parser.add_argument('--workers', type=int, default=2, help="worker processes for local")
+    parser.add_argument('--processes', type=int, default=1, help="solver processes per worker")
+    parser.add_argument('--twophase', default=TWOPHASE_PATH, help="solver executable")
+    parser.add_argument('--compact', action='store_true', help="use the compact pruning tables")
+    parser.add_argument('--name', help="worker name shown in the stats")
+    parser.add_argument('--crash-after', type=int, metavar='N',
+                        help="worker drops its connection after N units (local: the first "
+                             "worker does), to exercise re-dispatch")
+    parser.add_argument('--out', metavar='FILE', help="write one solution per corpus line")
+    parser.add_argument('--stats', metavar='FILE', help="write per-unit and per-worker stats (JSON)")
+    args = parser.parse_args()
+
+    if args.command == 'worker':
+        if not is_twophase_available(args.twophase):
+            print(f"TwoPhase executable not found at: {args.twophase}")
+            return 1
+        host, port = _parse_address(args.connect)
+        worker = ClusterWorker(host, port, args.processes, args.twophase,
+                               ['--compact'] if args.compact else [], args.name, args.crash_after)
+        try:
+            return worker.run()
+        except OSError as e:
+            print(f"Cannot reach the coordinator at {args.connect}: {e}")
+            return 1
+
+    if args.random is not None:
+        from solve_loadgen import random_states
+        records = [singmaster_to_cubepos(state) for state in random_states(args.random, seed=args.seed)]
+    elif args.corpus:
+        try:
+            with open(args.corpus) as f:
+                records = read_corpus(f)
+        except ValueError as e:
+            print(f"Bad state in {args.corpus}, {e}")
+            return 1
+    else:
+        parser.error("give a corpus file or --random N")
+
+    coordinator = Coordinator(records, max(1, args.unit_size), max(1, args.prefetch))
+    host = '127.0.0.1' if args.command == 'local' else args.host
+    port = coordinator.serve(host, 0 if args.command == 'local' else args.port)
+    print(f"Coordinating {len(records)} states in {len(coordinator.units)} units on {host}:{port}")
+
+    workers = []
+    if args.command == 'local':
+        for i in range(args.workers):
+            command = [sys.executable, __file__, 'worker', '--connect', f'127.0.0.1:{port}',
+                       '--processes', str(args.processes), '--twophase', args.twophase,
+                       '--name', f'local-{i}']
+            if args.compact:
+                command.append('--compact')
+            if i == 0 and args.crash_after is not None:
+                command += ['--crash-after', str(args.crash_after)]
+            workers.append(subprocess.Popen(command))
+
+    try:
+        while not coordinator.wait(timeout=1.0):
+            if workers and all(w.poll() is not None for w in workers):
+                print("Every local worker exited before the corpus was solved")
+                break
+    except KeyboardInterrupt:
+        pass
+    finally:
+        coordinator.close()
+        for worker in workers:
+            try:
+                worker.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                worker.kill()
+
+    stats = coordinator.stats()
+    _print_summary(stats)
+    if args.out:
+        with open(args.out, 'w') as f:
+            f.writelines(('unsolvable' if s is None else ' '.join(s)) + '\n'
+                         for s in coordinator.solutions())
+    if args.stats:
+        with open(args.stats, 'w') as f:
+            json.dump(stats, f, indent=2)
+    return 0 if coordinator.remaining == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
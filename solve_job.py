@@ -0,0 +1,352 @@
+"""
+Resumable batch solve jobs.
+
+A job solves a corpus of Singmaster states (one per line, '#' starts a
+comment) into a job directory and can be killed at any point, even with
+kill -9 or a power cut, and rerun to carry on where it stopped:
+
+    job.json      the corpus it belongs to (path, state count, SHA-256)
+    journal.bin   completed positions, appended in checksummed frames
+    solutions.txt one line per state, in corpus order: the solving moves
+                  or 'unsolvable' (written once every state is solved)
+
+Solved positions are collected in memory and committed as one journal
+frame per batch (JOURNAL_FRAME, then per position its corpus index, a
+length byte and the move indices), fsynced before the job counts them as
+done. A rerun reads the journal up to the first torn or corrupt frame,
+cuts it off there and solves only what is missing, so each position is
+in the journal exactly once: a kill loses at most the uncommitted batch,
+which is solved again. The output is written to a temporary file, synced
+and renamed into place, so it is either complete or absent.
+
+Examples:
+    python3 solve_job.py run corpus.txt job/ --workers 2
+    python3 solve_job.py run corpus.txt job/      # after a crash: resumes
+    python3 solve_job.py status job/
+"""
+
+import argparse
+import fcntl
+import hashlib
+import json
+import os
+import queue
+import struct
+import subprocess
+import sys
+import threading
+import time
+import zlib
+
+from solver import (encode_states, is_twophase_available, moves_from_indices, read_answers,
+                    BINARY_BAD_STATE, TWOPHASE_PATH)
+from solve_cluster import read_corpus
+
+JOB_VERSION = 1
+# Frame: magic, payload bytes, CRC-32 of the payload
+JOURNAL_FRAME = struct.Struct('<4sII')
+JOURNAL_MAGIC = b'SJF1'
+ENTRY_HEADER = struct.Struct('<IB')  # corpus index, solution length
+UNSOLVABLE = BINARY_BAD_STATE
+
+
+def _fsync_dir(path):
+    """Make renames and new files in a directory durable"""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def write_atomic(path, data):
+    """Replace path with data so that a crash leaves the old or the new file"""
+    temp = f'{path}.tmp'
+    with open(temp, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp, path)
+    _fsync_dir(os.path.dirname(os.path.abspath(path)))
+
+
+def encode_frame(entries):
+    """
+    One journal frame.
+
+    Args:
+        entries: (corpus index, move index list or None if unsolvable)
+    """
+    payload = bytearray()
+    for index, indices in entries:
+        if indices is None:
+            payload += ENTRY_HEADER.pack(index, UNSOLVABLE)
+        else:
+            payload += ENTRY_HEADER.pack(index, len(indices))
+            payload += bytes(indices)
+    return JOURNAL_FRAME.pack(JOURNAL_MAGIC, len(payload), zlib.crc32(payload)) + payload
+
+
+def read_journal(data):
+    """
+    Decode journal frames up to the first incomplete or corrupt one.
+
+    Returns:
+        (entries, bytes of data that hold complete frames); entries maps
+        corpus index -> move index list, or None if unsolvable
+    """
+    entries = {}
+    pos = 0
+    while pos + JOURNAL_FRAME.size <= len(data):
+        magic, size, crc = JOURNAL_FRAME.unpack_from(data, pos)
+        payload = data[pos + JOURNAL_FRAME.size:pos + JOURNAL_FRAME.size + size]
+        if magic != JOURNAL_MAGIC or len(payload) != size or zlib.crc32(payload) != crc:
+            break
+        at = 0
+        while at < size:
+            index, length = ENTRY_HEADER.unpack_from(payload, at)
+            at += ENTRY_HEADER.size
+            if length == UNSOLVABLE:
+                entries[index] = None
+            else:
+                entries[index] = list(payload[at:at + length])
+                at += length
+        pos += JOURNAL_FRAME.size + size
+    return entries, pos
+
+
+class SolveJob:
+    """
+    One job directory: the journal of what is solved and the output.
+
+    Args:
+        path: job directory, created if missing
+        corpus: corpus file the job solves; a directory made for another
+            corpus (different contents) is refused
+
+    Raises:
+        ValueError: if the corpus has a bad state or does not match the
+            job, or another process is running the job
+    """
+    def __init__(self, path, corpus):
+        self.path = path
+        with open(corpus, 'rb') as f:
+            data = f.read()
+        self.records = read_corpus(data.decode().splitlines())
+        digest = hashlib.sha256(data).hexdigest()
+        os.makedirs(path, exist_ok=True)
+        # Held until close(): two runs appending to one journal would
+        # solve and record the same positions twice
+        self.lock = open(self._file('.lock'), 'a')
+        try:
+            fcntl.flock(self.lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self.lock.close()
+            raise ValueError(f"{path} is being run by another process") from None
+
+        info = {'version': JOB_VERSION, 'corpus': os.path.abspath(corpus),
+                'states': len(self.records), 'sha256': digest}
+        if os.path.exists(self._file('job.json')):
+            with open(self._file('job.json')) as f:
+                known = json.load(f)
+            if known.get('version') != JOB_VERSION or known.get('sha256') != digest:
+                self.lock.close()
+                raise ValueError(f"{path} belongs to another corpus ({known.get('corpus')})")
+        else:
+            write_atomic(self._file('job.json'), json.dumps(info).encode())
+
+        # Keep the complete frames; a torn tail from a crash is cut off
+        journal = self._file('journal.bin')
+        self.done = {}
+        if os.path.exists(journal):
+            with open(journal, 'rb') as f:
+                self.done, good = read_journal(f.read())
+            if good != os.path.getsize(journal):
+                with open(journal, 'r+b') as f:
+                    f.truncate(good)
+                    os.fsync(f.fileno())
+        self.journal = open(journal, 'ab')
+        _fsync_dir(path)
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def remaining(self):
+        """Corpus indices not in the journal yet, in order"""
+        return [i for i in range(len(self.records)) if i not in self.done]
+
+    def commit(self, entries):
+        """
+        Durably add solved positions to the journal.
+
+        Args:
+            entries: (corpus index, move index list or None)
+        """
+        if not entries:
+            return
+        self.journal.write(encode_frame(entries))
+        self.journal.flush()
+        os.fsync(self.journal.fileno())
+        self.done.update(entries)
+
+    def write_output(self, path=None):
+        """Write every solution in corpus order (all states must be done)"""
+        lines = []
+        for i in range(len(self.records)):
+            indices = self.done[i]
+            lines.append('unsolvable' if indices is None else ' '.join(moves_from_indices(indices)))
+        write_atomic(path or self._file('solutions.txt'), ''.join(l + '\n' for l in lines).encode())
+
+    def close(self):
+        self.journal.close()
+        self.lock.close()
+
+
+def _solve_shard(records, indices, twophase_path, args, results):
+    """
+    Solve records with one twophase --binary process, putting
+    (corpus index, move indices or None) on results as answers arrive and
+    None when the process ends.
+    """
+    proc = subprocess.Popen([twophase_path, '--binary'] + list(args),
+                            stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                            stderr=subprocess.DEVNULL, cwd=os.path.dirname(twophase_path))
+
+    def feed():
+        try:
+            proc.stdin.write(encode_states([records[i] for i in indices]))
+            proc.stdin.close()
+        except BrokenPipeError:
+            pass
+
+    threading.Thread(target=feed, daemon=True).start()
+    try:
+        # Answers come back in order; anything before EOF is a real answer
+        for index, answer in zip(indices, read_answers(proc.stdout)):
+            results.put((index, answer))
+    finally:
+        proc.kill()
+        proc.wait()
+        results.put(None)
+
+
+def run_job(job, twophase_path=None, args=(), workers=1, batch=1000, flush=5.0, progress=10.0):
+    """
+    Solve what the job is missing, committing a journal frame every
+    `batch` positions or `flush` seconds, and report progress every
+    `progress` seconds.
+
+    Returns:
+        True if every state is solved (the output can be written)
+    """
+    if twophase_path is None:
+        twophase_path = TWOPHASE_PATH
+    todo = job.remaining()
+    total = len(job.records)
+    print(f"{total - len(todo)} of {total} states already solved, {len(todo)} to go")
+    if not todo:
+        return True
+
+    workers = max(1, min(workers, len(todo)))
+    results = queue.Queue()
+    for w in range(workers):
+        # Interleaved shards keep the workers' progress through the corpus even
+        shard = todo[w::workers]
+        threading.Thread(target=_solve_shard, args=(job.records, shard, twophase_path, args, results),
+                         daemon=True).start()
+
+    running = workers
+    pending = []
+    start = last_flush = last_report = time.monotonic()
+    solved_now = 0
+    try:
+        while running:
+            try:
+                item = results.get(timeout=0.5)
+            except queue.Empty:
+                item = False
+            if item is None:
+                running -= 1
+            elif item:
+                pending.append(item)
+            now = time.monotonic()
+            if len(pending) >= batch or (pending and (now - last_flush >= flush or not running)):
+                job.commit(pending)
+                solved_now += len(pending)
+                pending = []
+                last_flush = now
+            if now - last_report >= progress:
+                rate = solved_now / (now - start)
+                left = total - len(job.done)
+                eta = f"{left / rate:.0f}s" if rate > 0 else "?"
+                print(f"{len(job.done)}/{total} solved ({len(job.done) / total:.1%}), "
+                      f"{rate:.1f}/s, ETA {eta}")
+                last_report = now
+    except KeyboardInterrupt:
+        # Keep what is already solved; a kill skips this and loses only
+        # the uncommitted batch
+        job.commit(pending)
+        raise
+    elapsed = time.monotonic() - start
+    print(f"Solved {solved_now} states in {elapsed:.1f}s "
+          f"({solved_now / elapsed if elapsed > 0 else 0:.1f}/s)")
+    if len(job.done) < total:
+        print(f"TwoPhase solver stopped with {total - len(job.done)} states left; rerun to resume")
+        return False
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Crash-safe, resumable batch solving")
+    parser.add_argument('command', choices=('run', 'status'))
+    parser.add_argument('paths', nargs='+', metavar='PATH',
+                        help="run: CORPUS JOB, status: JOB")
+    parser.add_argument('--out', metavar='FILE',
+                        help="run: where to write the solutions (default JOB/solutions.txt)")
+    parser.add_argument('--workers', type=int, default=1, help="solver processes")
+    parser.add_argument('--batch', type=int, default=1000, help="positions per journal frame")
+    parser.add_argument('--flush', type=float, default=5.0,
+                        help="commit solved positions at least this often (seconds)")
+    parser.add_argument('--progress', type=float, default=10.0,
+                        help="seconds between progress reports")
+    parser.add_argument('--twophase', default=TWOPHASE_PATH, help="solver executable")
+    parser.add_argument('--compact', action='store_true', help="use the compact pruning tables")
+    args = parser.parse_args()
+
+    if args.command == 'status':
+        with open(os.path.join(args.paths[0], 'job.json')) as f:
+            info = json.load(f)
+        journal = os.path.join(args.paths[0], 'journal.bin')
+        done = {}
+        if os.path.exists(journal):
+            with open(journal, 'rb') as f:
+                done, _ = read_journal(f.read())
+        unsolvable = sum(1 for indices in done.values() if indices is None)
+        print(f"{info['corpus']}: {len(done)} of {info['states']} states solved "
+              f"({unsolvable} unsolvable)")
+        return 0 if len(done) == info['states'] else 1
+
+    if len(args.paths) != 2:
+        parser.error("run needs a corpus file and a job directory")
+    if not is_twophase_available(args.twophase):
+        print(f"TwoPhase executable not found at: {args.twophase}")
+        return 1
+    try:
+        job = SolveJob(args.paths[1], args.paths[0])
+    except ValueError as e:
+        print(f"Cannot run the job: {e}")
+        return 1
+    try:
+        complete = run_job(job, args.twophase, ['--compact'] if args.compact else [],
+                           args.workers, max(1, args.batch), args.flush, args.progress)
+        if complete:
+            out = args.out or os.path.join(args.paths[1], 'solutions.txt')
+            job.write_output(out)
+            print(f"Wrote {len(job.records)} solutions to {out}")
+    finally:
+        job.close()
+    return 0 if complete else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
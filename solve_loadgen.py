@@ -0,0 +1,130 @@
+"""
+Load generator for the local solve service (solve_service.py).
+
+Closed-loop clients send solves as fast as answers come back, mixing
+interactive single solves with bulk batches, and report throughput and
+latency per priority class followed by the service's own /metrics.
+Positions are drawn from a fixed set of random shuffles, so a small
+--distinct exercises request coalescing.
+
+Examples:
+    python3 solve_loadgen.py --clients 8 --requests 400
+    python3 solve_loadgen.py --bulk-fraction 0.5 --batch 20 --distinct 50
+"""
+
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from rubiks_cube import RubiksCube
+from solve_service import LatencyHistogram
+
+
+def random_states(count, moves=25, seed=None):
+    """Singmaster strings of count random shuffles"""
+    rng = random.Random(seed)
+    cube = RubiksCube(verbose=False)
+    states = []
+    for _ in range(count):
+        cube.initialize_cube()
+        last = None
+        for _ in range(moves):
+            face = rng.choice([f for f in 'UDFBLR' if f != last])
+            cube.apply_move(face + rng.choice(['', "'", '2']))
+            last = face
+        states.append(cube.to_singmaster())
+    return states
+
+
+def post(url, body, timeout):
+    """POST JSON and return (status, decoded reply)"""
+    request = urllib.request.Request(url, json.dumps(body).encode(),
+                                     {'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as reply:
+            return reply.status, json.loads(reply.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read() or b'{}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive solve_service.py with concurrent clients")
+    parser.add_argument('--url', default='http://127.0.0.1:8642')
+    parser.add_argument('--clients', type=int, default=4, help="concurrent connections")
+    parser.add_argument('--requests', type=int, default=200, help="requests in total")
+    parser.add_argument('--bulk-fraction', type=float, default=0.25,
+                        help="share of requests sent as bulk batches")
+    parser.add_argument('--batch', type=int, default=10, help="positions per bulk batch")
+    parser.add_argument('--distinct', type=int, default=200, help="size of the position set")
+    parser.add_argument('--timeout', type=float, default=60.0)
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args()
+
+    print(f"Generating {args.distinct} positions...")
+    states = random_states(args.distinct, seed=args.seed)
+    rng = random.Random(args.seed)
+    plan = ['bulk' if rng.random() < args.bulk_fraction else 'interactive'
+            for _ in range(args.requests)]
+
+    lock = threading.Lock()
+    latency = {'interactive': LatencyHistogram(), 'bulk': LatencyHistogram()}
+    statuses = {}
+    solved = [0]
+
+    def client(seed):
+        local = random.Random(seed)
+        while True:
+            with lock:
+                if not plan:
+                    return
+                priority = plan.pop()
+            if priority == 'bulk':
+                body = {'states': local.sample(states, min(args.batch, len(states))),
+                        'priority': 'bulk'}
+                path = '/solve/batch'
+            else:
+                body = {'state': local.choice(states), 'priority': 'interactive'}
+                path = '/solve'
+            start = time.perf_counter()
+            try:
+                status, reply = post(args.url + path, body, args.timeout)
+            except OSError as e:
+                status, reply = type(e).__name__, {}
+            ms = (time.perf_counter() - start) * 1000
+            with lock:
+                statuses[status] = statuses.get(status, 0) + 1
+                if status == 200:
+                    latency[priority].observe(ms)
+                    solved[0] += len(reply['solutions']) if 'solutions' in reply else 1
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(args.clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    print(f"{args.requests} requests, {solved[0]} positions in {elapsed:.1f}s "
+          f"({args.requests / elapsed:.1f} req/s, {solved[0] / elapsed:.1f} positions/s)")
+    print("Status counts:", ', '.join(f"{k}: {v}" for k, v in sorted(statuses.items(), key=str)))
+    for priority, histogram in latency.items():
+        snap = histogram.snapshot()
+        if snap['count']:
+            print(f"{priority:>11}: n={snap['count']} mean={snap['mean_ms']:.0f}ms "
+                  f"p50<={snap['p50_ms']}ms p90<={snap['p90_ms']}ms p99<={snap['p99_ms']}ms")
+    try:
+        with urllib.request.urlopen(args.url + '/metrics', timeout=10) as reply:
+            print(json.dumps(json.loads(reply.read()), indent=2))
+    except OSError as e:
+        print(f"Cannot read metrics: {e}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,379 @@
+"""
+Local solve service.
+
+Keeps a SolverPool of warm twophase --binary processes and serves them
+over HTTP/JSON, so tools share the loaded pruning tables instead of
+starting a solver per request. Requests wait in one bounded queue where
+interactive solves go ahead of bulk ones, and a position that is already
+queued or being solved is not solved twice: later requests for it wait
+on the same job.
+
+Endpoints:
+    POST /solve         {"state": "UF UR ...", "priority": "interactive", "timeout": 30}
+                        -> {"solution": ["R", "U2", ...], "length": 19, "ms": 12.5}
+    POST /solve/batch   {"states": ["UF UR ...", ...], "priority": "bulk"}
+                        -> {"solutions": [[...], null, ...], "ms": 840.1}
+    GET  /metrics       queue depth, latency histograms, worker utilization
+    GET  /health        "ok", "degraded" if some solver processes exited,
+                        or 503 "down" if none is left
+
+A solution of null means the position cannot be solved (or the solver
+failed). A full queue answers 503, an expired timeout 504; a position
+nobody waits for any more is dropped from the queue.
+
+Examples:
+    python3 solve_service.py --port 8642 --workers 2
+    curl -d '{"state": "UF UR UB UL DF DR DB DL FR FL BR BL UFR URB UBL ULF DRF DFL DLB DBR"}' \\
+        localhost:8642/solve
+    python3 solve_loadgen.py --url http://localhost:8642 --clients 8
+"""
+
+import argparse
+import bisect
+import heapq
+import itertools
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from solver import SolverPool, is_twophase_available, singmaster_to_cubepos, TWOPHASE_PATH
+
+# Lower value is served first
+PRIORITIES = {'interactive': 0, 'bulk': 1}
+
+# Upper bounds of the latency histogram buckets, in milliseconds
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000)
+
+
+class QueueFull(Exception):
+    """Raised when a request would not fit in the bounded queue"""
+
+
+class LatencyHistogram:
+    """Counts of observed latencies per bucket, Prometheus style"""
+    def __init__(self, bounds=LATENCY_BUCKETS_MS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0.0
+
+    def observe(self, ms):
+        self.counts[bisect.bisect_left(self.bounds, ms)] += 1
+        self.total += ms
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th quantile (None if empty)"""
+        count = sum(self.counts)
+        if not count:
+            return None
+        rank = q * count
+        seen = 0
+        for bound, n in zip(self.bounds, self.counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+    def snapshot(self):
+        count = sum(self.counts)
+        buckets = {}
+        seen = 0
+        for bound, n in zip(self.bounds + ('+Inf',), self.counts):
+            seen += n
+            buckets[str(bound)] = seen
+        return {
+            'count': count,
+            'mean_ms': self.total / count if count else None,
+            'p50_ms': self.quantile(0.5),
+            'p90_ms': self.quantile(0.9),
+            'p99_ms': self.quantile(0.99),
+            'buckets': buckets,
+        }
+
+
+class SolveJob:
+    """One position being solved, shared by every request that asked for it"""
+    def __init__(self, record, priority):
+        self.record = record
+        self.priority = priority
+        self.waiters = 1
+        self.abandoned = False  # Every waiter timed out before it was dispatched
+        self.dispatched = None
+        self.solution = None
+        self.done = threading.Event()
+
+
+class SolveScheduler:
+    """
+    Bounded priority queue in front of a SolverPool.
+
+    Only a few solves per worker are handed to the pool at a time (one
+    being solved, one buffered so the worker never idles); the rest wait
+    here, where an interactive request can still overtake queued bulk
+    work. Identical positions are coalesced into one SolveJob, and an
+    interactive request for a queued bulk position promotes it.
+    """
+    def __init__(self, pool, max_queue=1024, per_worker=2):
+        self.pool = pool
+        self.max_queue = max_queue
+        self.max_in_flight = per_worker * len(pool.workers)
+        self.cond = threading.Condition()
+        self.heap = []
+        self.order = itertools.count()
+        self.jobs = {}
+        self.queued = {name: 0 for name in PRIORITIES}
+        self.in_flight = 0
+        self.closed = False
+
+        self.started = time.monotonic()
+        self.counters = {'requests': 0, 'solved': 0, 'unsolvable': 0, 'coalesced': 0,
+                         'promoted': 0, 'rejected': 0, 'timeouts': 0, 'abandoned': 0}
+        self.latency = {name: LatencyHistogram() for name in PRIORITIES}
+        self.solve_time = LatencyHistogram()
+
+        self.threads = [threading.Thread(target=self._dispatch, daemon=True),
+                        threading.Thread(target=self._collect, daemon=True)]
+        for thread in self.threads:
+            thread.start()
+
+    def submit(self, records, priority='interactive'):
+        """
+        Queue positions for solving.
+
+        Args:
+            records: list of 20-byte cubepos records
+            priority: a key of PRIORITIES
+
+        Returns:
+            List of SolveJob, one per record; wait on job.done
+
+        Raises:
+            QueueFull: if the new positions do not fit (nothing is queued)
+        """
+        level = PRIORITIES[priority]
+        with self.cond:
+            self.counters['requests'] += len(records)
+            fresh = len({r for r in records if r not in self.jobs})
+            if sum(self.queued.values()) + fresh > self.max_queue:
+                self.counters['rejected'] += len(records)
+                raise QueueFull(f"{fresh} new positions do not fit in the queue")
+            jobs = []
+            for record in records:
+                job = self.jobs.get(record)
+                if job is None:
+                    job = self.jobs[record] = SolveJob(record, level)
+                    self._push(job)
+                else:
+                    job.waiters += 1
+                    self.counters['coalesced'] += 1
+                    if job.dispatched is None and level < job.priority:
+                        # The old heap entry goes stale and is skipped
+                        self.queued[self._name(job.priority)] -= 1
+                        job.priority = level
+                        self._push(job)
+                        self.counters['promoted'] += 1
+                jobs.append(job)
+            self.cond.notify_all()
+        return jobs
+
+    def abandon(self, jobs):
+        """
+        Give up waiting on jobs (a request timed out). A job still queued
+        with nobody else waiting is dropped; one being solved runs to the end.
+        """
+        with self.cond:
+            for job in jobs:
+                job.waiters -= 1
+                if job.waiters == 0 and job.dispatched is None and not job.done.is_set():
+                    # The heap entry goes stale and is skipped
+                    job.abandoned = True
+                    self.queued[self._name(job.priority)] -= 1
+                    del self.jobs[job.record]
+                    self.counters['abandoned'] += 1
+
+    def observe(self, priority, ms, timed_out=False):
+        """Record one request's end-to-end latency"""
+        with self.cond:
+            self.latency[priority].observe(ms)
+            if timed_out:
+                self.counters['timeouts'] += 1
+
+    def _name(self, level):
+        return next(name for name, value in PRIORITIES.items() if value == level)
+
+    def _push(self, job):
+        heapq.heappush(self.heap, (job.priority, next(self.order), job))
+        self.queued[self._name(job.priority)] += 1
+
+    def _dispatch(self):
+        while True:
+            with self.cond:
+                while not self.closed and (not self.heap or self.in_flight >= self.max_in_flight):
+                    self.cond.wait()
+                if self.closed:
+                    return
+                level, _, job = heapq.heappop(self.heap)
+                if job.dispatched is not None or level != job.priority or job.abandoned:
+                    continue
+                self.queued[self._name(level)] -= 1
+                self.in_flight += 1
+                job.dispatched = time.monotonic()
+            self.pool.submit(job.record, job)
+
+    def _collect(self):
+        while not self.closed:
+            for job, solution in self.pool.wait(timeout=0.5):
+                with self.cond:
+                    del self.jobs[job.record]
+                    self.in_flight -= 1
+                    self.counters['solved' if solution is not None else 'unsolvable'] += 1
+                    self.solve_time.observe((time.monotonic() - job.dispatched) * 1000)
+                    self.cond.notify_all()
+                job.solution = solution
+                job.done.set()
+
+    def metrics(self):
+        """Snapshot of queue, latency and worker statistics"""
+        with self.cond:
+            return {
+                'uptime_s': time.monotonic() - self.started,
+                'queue': {'depth': sum(self.queued.values()), 'capacity': self.max_queue,
+                          'by_priority': dict(self.queued)},
+                'in_flight': self.in_flight,
+                'counters': dict(self.counters),
+                'latency_ms': {name: h.snapshot() for name, h in self.latency.items()},
+                'solve_ms': self.solve_time.snapshot(),
+                'workers': {'count': len(self.pool.workers), 'alive': self.pool.alive(),
+                            'utilization': [round(u, 4) for u in self.pool.utilization()]},
+            }
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+        self.pool.close()
+
+
+class SolveHandler(BaseHTTPRequestHandler):
+    """JSON endpoints; the scheduler is attached to the server"""
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def send_json(self, status, body, headers=()):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == '/metrics':
+            self.send_json(200, self.server.scheduler.metrics())
+        elif self.path == '/health':
+            pool = self.server.scheduler.pool
+            alive = pool.alive()
+            status = 'ok' if alive == len(pool.workers) else ('degraded' if alive else 'down')
+            self.send_json(503 if status == 'down' else 200,
+                           {'status': status, 'workers': len(pool.workers), 'alive': alive})
+        else:
+            self.send_json(404, {'error': f"No such endpoint: {self.path}"})
+
+    def do_POST(self):
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            request = json.loads(self.rfile.read(length) or b'{}')
+            if not isinstance(request, dict):
+                raise ValueError("Request body must be a JSON object")
+        except ValueError as e:
+            self.send_json(400, {'error': f"Bad JSON: {e}"})
+            return
+
+        if self.path == '/solve':
+            self.solve(request, [request.get('state')], 'interactive', batch=False)
+        elif self.path == '/solve/batch':
+            states = request.get('states')
+            if not isinstance(states, list):
+                self.send_json(400, {'error': "'states' must be a list of Singmaster strings"})
+                return
+            self.solve(request, states, 'bulk', batch=True)
+        else:
+            self.send_json(404, {'error': f"No such endpoint: {self.path}"})
+
+    def solve(self, request, states, default_priority, batch):
+        start = time.monotonic()
+        scheduler = self.server.scheduler
+        priority = request.get('priority', default_priority)
+        if priority not in PRIORITIES:
+            self.send_json(400, {'error': f"priority must be one of {', '.join(PRIORITIES)}"})
+            return
+        try:
+            timeout = float(request.get('timeout', self.server.request_timeout))
+            records = [singmaster_to_cubepos(state) for state in states]
+        except (TypeError, ValueError, AttributeError) as e:
+            self.send_json(400, {'error': f"Bad request: {e}"})
+            return
+
+        try:
+            jobs = scheduler.submit(records, priority)
+        except QueueFull as e:
+            self.send_json(503, {'error': str(e)}, [('Retry-After', '1')])
+            return
+
+        deadline = start + timeout
+        timed_out = not all(job.done.wait(max(0.0, deadline - time.monotonic())) for job in jobs)
+        ms = (time.monotonic() - start) * 1000
+        scheduler.observe(priority, ms, timed_out)
+        if timed_out:
+            scheduler.abandon(jobs)
+            self.send_json(504, {'error': f"Not solved within {timeout:g}s"})
+        elif batch:
+            self.send_json(200, {'solutions': [job.solution for job in jobs], 'ms': ms})
+        else:
+            solution = jobs[0].solution
+            self.send_json(200, {'solution': solution,
+                                 'length': None if solution is None else len(solution),
+                                 'ms': ms})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the TwoPhase solver over HTTP/JSON")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8642)
+    parser.add_argument('--workers', type=int, default=1, help="solver processes")
+    parser.add_argument('--queue', type=int, default=1024, help="most positions waiting at once")
+    parser.add_argument('--timeout', type=float, default=30.0,
+                        help="default seconds a request waits for its solution")
+    parser.add_argument('--twophase', default=TWOPHASE_PATH, help="solver executable")
+    parser.add_argument('--compact', action='store_true', help="use the compact pruning tables")
+    parser.add_argument('--verbose', action='store_true', help="log every request")
+    args = parser.parse_args()
+
+    if not is_twophase_available(args.twophase):
+        print(f"TwoPhase executable not found at: {args.twophase}")
+        return 1
+    pool = SolverPool(args.workers, args.twophase, ['--compact'] if args.compact else [])
+    server = ThreadingHTTPServer((args.host, args.port), SolveHandler)
+    server.daemon_threads = True
+    server.scheduler = SolveScheduler(pool, max_queue=args.queue)
+    server.request_timeout = args.timeout
+    server.verbose = args.verbose
+    print(f"Solving on http://{args.host}:{server.server_port} with {args.workers} worker(s)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.scheduler.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
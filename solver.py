@@ -4,57 +4,122 @@ Bridges Python Rubik's cube visualizer with the C++ twophase solver.
 """
 
 import subprocess
+import struct
 import os
+import queue
+import re
+import threading
+import time
+from collections import deque
 
 # Path to twophase executable
 TWOPHASE_PATH = os.path.join(os.path.dirname(__file__), 'solver', 'twophase')
 
+# Default seconds solve_state waits. A random state is usually 17 or 18
+# moves from solved, which the optimal search can take minutes (or, at 18+,
+# far longer) to prove on one core, so it gets a bound of its own
+SOLVE_TIMEOUT = 30
+OPTIMAL_TIMEOUT = 300
+
+# Binary protocol (twophase --binary): 20-byte cubepos records in,
+# length-prefixed move index bytes out. Move index = face * 3 + twist - 1
+# with faces in the solver's U F R D B L order.
+CUBEPOS_RECORD = struct.Struct('20B')
+BINARY_BAD_STATE = 255
+TWOPHASE_FACES = 'UFRDBL'
+
+# Singmaster names in cubie-value order, as in cubepos.cpp:
+# edge value = perm * 2 + ori, corner value = ori * 8 + perm.
+_SM_EDGES = (
+    "UB", "BU", "UL", "LU", "UR", "RU", "UF", "FU",
+    "LB", "BL", "RB", "BR", "LF", "FL", "RF", "FR",
+    "DB", "BD", "DL", "LD", "DR", "RD", "DF", "FD",
+)
+_SM_CORNERS = (
+    "UBL", "URB", "ULF", "UFR", "DLB", "DBR", "DFL", "DRF",
+    "LUB", "BUR", "FUL", "RUF", "BDL", "RDB", "LDF", "FDR",
+    "BLU", "RBU", "LFU", "FRU", "LBD", "BRD", "FLD", "RFD",
+)
+_SM_SOLVED = "UF UR UB UL DF DR DB DL FR FL BR BL UFR URB UBL ULF DRF DFL DLB DBR".split()
+_EDGE_VALUE = {name: i for i, name in enumerate(_SM_EDGES)}
+_CORNER_VALUE = {name: i for i, name in enumerate(_SM_CORNERS)}
+_SM_EDGE_SOLVED = [_EDGE_VALUE[name] for name in _SM_SOLVED[:12]]
+_SM_CORNER_ORDER = [_CORNER_VALUE[name] & 7 for name in _SM_SOLVED[12:]]
+
+# Move indices (face * 3 + twist - 1, faces in TWOPHASE_FACES order) and
+# their standard names. Opposite faces share face % 3: U/D, F/B, R/L.
+_MOVE_NAMES = [f + suffix for f in TWOPHASE_FACES for suffix in ('', '2', "'")]
+_MOVE_INDEX = {name: i for i, name in enumerate(_MOVE_NAMES)}
+
+
+def canonicalize_indices(indices):
+    """
+    Cancel and merge moves in one pass over integer move indices.
+
+    A stack holds the reduced sequence. Each move merges with the top of
+    the stack when it turns the same face, or with the move under the top
+    when the top turns the opposite face (opposite faces commute), so
+    R L R' gives L and U D U gives U2 D. Quarter turns are added mod 4
+    and a move that adds up to nothing is dropped. Opposite-face pairs
+    are kept in face order (U before D, F before B, R before L). Each
+    move does O(1) work.
+
+    Args:
+        indices: move indices, face * 3 + twist - 1
+
+    Returns:
+        The reduced list of move indices
+    """
+    faces = []
+    turns = []  # Clockwise quarter turns (1-3) of each stacked move
+    for index in indices:
+        face, twist = divmod(index, 3)
+        k = len(faces) - 1
+        if k >= 0 and faces[k] != face and faces[k] % 3 == face % 3:
+            k -= 1
+        if k >= 0 and faces[k] == face:
+            total = (turns[k] + twist + 1) % 4
+            if total:
+                turns[k] = total
+            else:
+                del faces[k]
+                del turns[k]
+        elif faces and faces[-1] % 3 == face % 3 and faces[-1] > face:
+            faces.insert(len(faces) - 1, face)
+            turns.insert(len(turns) - 1, twist + 1)
+        else:
+            faces.append(face)
+            turns.append(twist + 1)
+    return [face * 3 + twist - 1 for face, twist in zip(faces, turns)]
+
+
+def invert_indices(indices):
+    """Inverse of a move index sequence: reversed, each twist undone."""
+    return [index - index % 3 + 2 - index % 3 for index in reversed(indices)]
+
 
 def simplify_moves(moves):
-    """Simplify move sequence by cancelling redundant moves."""
+    """
+    Canonicalize a move sequence (see canonicalize_indices).
+
+    Outer face turns (R, U', F2, ...) are converted to indices and reduced;
+    any other move (slices, wide or inner-layer turns) is kept in place and
+    nothing is merged across it.
+    """
     if not moves:
         return moves
-    
-    def parse_move(m):
-        face = m[0]
-        if len(m) == 1:
-            return (face, 1)
-        elif m.endswith("'"):
-            return (face, 3)
-        elif m.endswith("2"):
-            return (face, 2)
-        return (face, 1)
-    
-    def to_move(face, count):
-        count = count % 4
-        if count == 0:
-            return None
-        elif count == 1:
-            return face
-        elif count == 2:
-            return face + "2"
-        elif count == 3:
-            return face + "'"
-        return None
-    
-    simplified = []
+    result = []
+    run = []
     for move in moves:
-        face, count = parse_move(move)
-        if simplified:
-            last_face, last_count = parse_move(simplified[-1])
-            if last_face == face:
-                simplified.pop()
-                new_count = (last_count + count) % 4
-                if new_count != 0:
-                    new_move = to_move(face, new_count)
-                    if new_move:
-                        simplified.append(new_move)
-                continue
-        simplified.append(move)
-    
-    if len(simplified) < len(moves):
-        return simplify_moves(simplified)
-    return simplified
+        index = _MOVE_INDEX.get(move)
+        if index is not None:
+            run.append(index)
+            continue
+        result.extend(_MOVE_NAMES[i] for i in canonicalize_indices(run))
+        result.append(move)
+        run = []
+    result.extend(_MOVE_NAMES[i] for i in canonicalize_indices(run))
+    return result
 
 
 def convert_from_twophase_notation(moves):
@@ -96,27 +161,43 @@ def parse_twophase_solution(solution_str):
     return moves
 
 
-def solve_state(cube_state_singmaster, twophase_path=None):
+def solve_state(cube_state_singmaster, twophase_path=None, target=None, optimal=False,
+                timeout=None):
     """
     Solve cube from its current state using Singmaster notation.
     
     Args:
         cube_state_singmaster: Singmaster notation string
+        target: optional length bound; the solver returns its first
+            solution no longer than this
+        optimal: find a shortest solution (twophase --optimal) instead;
+            needs data3.dat (see build_tables) and can take minutes for
+            positions 17 or more moves from solved
+        timeout: seconds to wait; defaults to SOLVE_TIMEOUT, or
+            OPTIMAL_TIMEOUT with optimal. Interactive callers of the
+            optimal search should pass a shorter one
     
     Returns:
-        List of solution moves or None
+        List of solution moves or None (also when the timeout expires)
     """
     if twophase_path is None:
         twophase_path = TWOPHASE_PATH
+    args = [twophase_path]
+    if optimal:
+        args.append('--optimal')
+    elif target is not None:
+        args += ['--target', str(target)]
+    if timeout is None:
+        timeout = OPTIMAL_TIMEOUT if optimal else SOLVE_TIMEOUT
     
     try:
         solver_dir = os.path.dirname(twophase_path)
         result = subprocess.run(
-            [twophase_path],
+            args,
             input=cube_state_singmaster + '\n',
             capture_output=True,
             text=True,
-            timeout=30,
+            timeout=timeout,
             cwd=solver_dir
         )
         
@@ -141,8 +222,582 @@ def solve_state(cube_state_singmaster, twophase_path=None):
         return None
 
 
+def singmaster_to_cubepos(cube_state_singmaster):
+    """
+    Encode a Singmaster string as a 20-byte cubepos record.
+
+    Mirrors cubepos::parse_Singmaster so the binary protocol sees exactly
+    the position the text protocol would.
+
+    Args:
+        cube_state_singmaster: Singmaster notation string
+
+    Returns:
+        bytes of length 20 (corners c[8] then edges e[12])
+
+    Raises:
+        ValueError: if a cubie name is unknown or a cubie is missing
+    """
+    names = cube_state_singmaster.upper().split()
+    if len(names) != 20:
+        raise ValueError("Singmaster string must name 20 cubies")
+    record = bytearray(20)
+    seen = 0
+    for i, name in enumerate(names[:12]):
+        value = _EDGE_VALUE.get(name)
+        if value is None:
+            raise ValueError(f"No such edge: {name}")
+        value ^= _SM_EDGE_SOLVED[i] & 1
+        record[8 + (value >> 1)] = (_SM_EDGE_SOLVED[i] & ~1) | (value & 1)
+        seen |= 1 << (value >> 1)
+    for i, name in enumerate(names[12:]):
+        value = _CORNER_VALUE.get(name)
+        if value is None:
+            raise ValueError(f"No such corner: {name}")
+        record[value & 7] = _SM_CORNER_ORDER[i] + 8 * ((3 - (value >> 3)) % 3)
+        seen |= 1 << (12 + (value & 7))
+    if seen != (1 << 20) - 1:
+        raise ValueError("Missing at least one cubie")
+    return bytes(record)
+
+
+def encode_states(records):
+    """Concatenate 20-byte cubepos records into one --binary request."""
+    buf = bytearray(CUBEPOS_RECORD.size * len(records))
+    view = memoryview(buf)
+    for i, record in enumerate(records):
+        view[i * CUBEPOS_RECORD.size:(i + 1) * CUBEPOS_RECORD.size] = record
+    return bytes(buf)
+
+
+def decode_solutions(data):
+    """
+    Split --binary output into per-state move index lists.
+
+    Args:
+        data: bytes written by twophase --binary
+
+    Returns:
+        List with one entry per answered record: a list of move indices,
+        or None if the solver rejected the record
+    """
+    view = memoryview(data)
+    solutions = []
+    i = 0
+    while i < len(view):
+        length = view[i]
+        if length == BINARY_BAD_STATE:
+            solutions.append(None)
+            i += 1
+            continue
+        if i + 1 + length > len(view):
+            raise ValueError("Truncated solver output")
+        solutions.append(view[i + 1:i + 1 + length].tolist())
+        i += 1 + length
+    return solutions
+
+
+def read_answers(stream):
+    """
+    Yield --binary answers from a stream as the solver writes them.
+
+    Args:
+        stream: binary file, e.g. a twophase --binary process's stdout
+
+    Yields:
+        A list of move indices per answered record, or None if the solver
+        rejected the record; stops at EOF or at an answer cut short
+    """
+    while True:
+        head = stream.read(1)
+        if not head:
+            return
+        if head[0] == BINARY_BAD_STATE:
+            yield None
+            continue
+        body = stream.read(head[0])
+        if len(body) != head[0]:
+            return
+        yield list(body)
+
+
+def moves_from_indices(indices):
+    """Turn a solver move index sequence into simplified solving moves."""
+    return [_MOVE_NAMES[i] for i in canonicalize_indices(invert_indices(indices))]
+
+
+def move_indices(moves):
+    """Move indices of outer face turns like ['R', "U'", 'F2'], as they are."""
+    return [_MOVE_INDEX[move] for move in moves]
+
+
+def move_names(indices):
+    """Names of move indices, as they are (move_indices reversed)."""
+    return [_MOVE_NAMES[i] for i in indices]
+
+
+def pack_solutions(solutions):
+    """
+    Encode solved moves in the --binary output layout.
+
+    Args:
+        solutions: move lists as solve_states returns them, or None
+
+    Returns:
+        bytes: per solution a length byte and the move indices, or
+        BINARY_BAD_STATE for None (see unpack_solutions)
+    """
+    buf = bytearray()
+    for moves in solutions:
+        if moves is None:
+            buf.append(BINARY_BAD_STATE)
+            continue
+        buf.append(len(moves))
+        buf.extend(move_indices(moves))
+    return bytes(buf)
+
+
+def unpack_solutions(data):
+    """Decode pack_solutions output back into move lists (None where unsolvable)."""
+    return [None if s is None else move_names(s) for s in decode_solutions(data)]
+
+
+def solve_states(records, twophase_path=None, timeout=None):
+    """
+    Solve many positions with one solver process over the binary protocol.
+
+    Args:
+        records: iterable of 20-byte cubepos records (see singmaster_to_cubepos)
+        timeout: optional limit in seconds for the whole batch
+
+    Returns:
+        List of solutions in the same order (each a list of moves like
+        solve_state returns, or None for rejected records), or None on error
+    """
+    if twophase_path is None:
+        twophase_path = TWOPHASE_PATH
+    records = list(records)
+
+    try:
+        result = subprocess.run(
+            [twophase_path, '--binary'],
+            input=encode_states(records),
+            capture_output=True,
+            timeout=timeout,
+            cwd=os.path.dirname(twophase_path)
+        )
+        solutions = decode_solutions(result.stdout)
+        if len(solutions) != len(records):
+            print("TwoPhase solver returned an incomplete batch")
+            return None
+        return [None if s is None else moves_from_indices(s) for s in solutions]
+
+    except subprocess.TimeoutExpired:
+        print("TwoPhase solver timed out")
+        return None
+    except FileNotFoundError:
+        print(f"TwoPhase executable not found at: {twophase_path}")
+        return None
+    except Exception as e:
+        print(f"Error running TwoPhase solver: {e}")
+        return None
+
+
+# Verification protocol (twophase --verify): per record the 20-byte cubepos,
+# a length byte and that many solving move indices; one result byte back.
+VERIFY_WRONG = 0
+VERIFY_OK = 1
+
+
+def encode_verify(records, solutions):
+    """
+    Build a --verify request.
+
+    Args:
+        records: 20-byte cubepos records
+        solutions: solving move lists, as solve_states returns them
+
+    Returns:
+        bytes to send to twophase --verify
+    """
+    buf = bytearray()
+    for record, moves in zip(records, solutions):
+        buf += record
+        buf.append(len(moves))
+        # Anything but an outer face turn makes the record malformed
+        buf.extend(_MOVE_INDEX.get(move, BINARY_BAD_STATE) for move in moves)
+    return bytes(buf)
+
+
+def verify_encoded(data, count, twophase_path=None, timeout=None, threads=0):
+    """
+    Run an already encoded --verify request (see encode_verify).
+
+    Args:
+        count: number of records in data
+        threads: checking threads; 0 uses one per CPU
+
+    Returns:
+        bytes with one VERIFY_OK, VERIFY_WRONG or BINARY_BAD_STATE (malformed
+        record) per record, or None on error
+    """
+    if twophase_path is None:
+        twophase_path = TWOPHASE_PATH
+    args = [twophase_path, '--verify']
+    if threads:
+        args += ['--threads', str(threads)]
+    try:
+        result = subprocess.run(args, input=data, capture_output=True, timeout=timeout,
+                                cwd=os.path.dirname(twophase_path))
+        if len(result.stdout) != count:
+            print("TwoPhase verifier returned an incomplete batch")
+            return None
+        return result.stdout
+    except subprocess.TimeoutExpired:
+        print("TwoPhase verifier timed out")
+        return None
+    except FileNotFoundError:
+        print(f"TwoPhase executable not found at: {twophase_path}")
+        return None
+    except Exception as e:
+        print(f"Error running TwoPhase verifier: {e}")
+        return None
+
+
+def verify_solutions(records, solutions, twophase_path=None, timeout=None, threads=0):
+    """
+    Check that each solution solves its position, natively and in bulk.
+
+    Args:
+        records: 20-byte cubepos records (see singmaster_to_cubepos)
+        solutions: solving move lists, one per record
+
+    Returns:
+        List of True/False per record (None for a malformed record or a
+        move that is not an outer face turn), or None on error
+    """
+    records = list(records)
+    solutions = list(solutions)
+    if len(records) != len(solutions):
+        raise ValueError("One solution per record is needed")
+    results = verify_encoded(encode_verify(records, solutions), len(records),
+                             twophase_path, timeout, threads)
+    if results is None:
+        return None
+    return [None if r == BINARY_BAD_STATE else r == VERIFY_OK for r in results]
+
+
+# Trajectory protocol (twophase --trajectory): per sequence the 20-byte
+# cubepos it starts from, a little-endian 2-byte move count and that many
+# move indices; one --binary answer back per prefix, starting with none.
+TRAJECTORY_HEADER = struct.Struct('<H')
+SOLVED_RECORD = singmaster_to_cubepos(' '.join(_SM_SOLVED))
+
+
+def solve_trajectory(moves, start=None, twophase_path=None, budget=None):
+    """
+    Solve the position after every prefix of a move sequence in one solver
+    session, streaming the answers as they arrive.
+
+    Neighbouring positions are one move apart, so each answer seeds the
+    next search (see --trajectory in solver_main.cpp); that is far cheaper
+    than solving every prefix on its own.
+
+    Args:
+        moves: outer face turns like ['R', "U'", 'F2'] (a recorded solve,
+            RubiksCube.move_history)
+        start: 20-byte cubepos record the moves start from; solved if None
+        budget: phase 1 leaves searched per position (twophase --budget);
+            more gives shorter solutions, slower
+
+    Yields:
+        len(moves) + 1 solutions (solving moves like solve_states returns
+        them, None if start is not a solvable position): for start, then
+        for the position after each move
+
+    Raises:
+        ValueError: if a move is not an outer face turn
+        RuntimeError: if the solver stops answering
+    """
+    if twophase_path is None:
+        twophase_path = TWOPHASE_PATH
+    try:
+        indices = move_indices(moves)
+    except KeyError as e:
+        raise ValueError(f"Not an outer face turn: {e.args[0]}") from None
+    if len(indices) >= 1 << 16:
+        raise ValueError("At most 65535 moves per trajectory")
+    args = [twophase_path, '--trajectory']
+    if budget is not None:
+        args += ['--budget', str(budget)]
+
+    process = subprocess.Popen(args, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                               stderr=subprocess.DEVNULL, cwd=os.path.dirname(twophase_path))
+    try:
+        # The solver reads the whole request before it answers, so it cannot
+        # block on a full pipe while this writes
+        process.stdin.write((start or SOLVED_RECORD) + TRAJECTORY_HEADER.pack(len(indices)) +
+                            bytes(indices))
+        process.stdin.close()
+        for _ in range(len(indices) + 1):
+            length = process.stdout.read(1)
+            if not length:
+                raise RuntimeError("TwoPhase solver stopped answering")
+            if length[0] == BINARY_BAD_STATE:
+                yield None
+                continue
+            solution = process.stdout.read(length[0])
+            if len(solution) != length[0]:
+                raise RuntimeError("Truncated solver output")
+            yield moves_from_indices(solution)
+    finally:
+        process.kill()
+        process.wait()
+        process.stdout.close()
+
+
+class SolverPool:
+    """
+    Persistent twophase --binary processes that solve positions in the background.
+
+    submit() hands a record to the least busy worker and returns at once;
+    each worker has a writer thread feeding its stdin and a reader thread
+    collecting answers, which come back in submission order per worker.
+    poll() returns whatever has been solved since the last call, wait()
+    blocks until something is. The pruning tables are loaded once per
+    worker, not once per solve. A worker whose process exits is not used
+    again; once none is left, submit() fails positions at once.
+    """
+    def __init__(self, workers=1, twophase_path=None, args=()):
+        if twophase_path is None:
+            twophase_path = TWOPHASE_PATH
+        self.results = queue.Queue()
+        self.started = time.monotonic()
+        # Guards the pending deques and the busy time bookkeeping
+        self.lock = threading.Lock()
+        self.workers = []
+        for _ in range(max(1, workers)):
+            proc = subprocess.Popen(
+                [twophase_path, '--binary'] + list(args),
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                cwd=os.path.dirname(twophase_path)
+            )
+            worker = {'proc': proc, 'inbox': queue.Queue(), 'pending': deque(),
+                      'busy': 0.0, 'busy_since': None, 'alive': True}
+            for target in (self._writer, self._reader):
+                threading.Thread(target=target, args=(worker,), daemon=True).start()
+            self.workers.append(worker)
+
+    def _writer(self, worker):
+        stdin = worker['proc'].stdin
+        try:
+            while True:
+                record = worker['inbox'].get()
+                if record is None:
+                    break
+                stdin.write(record)
+                stdin.flush()
+        except (BrokenPipeError, ValueError):
+            pass
+        finally:
+            try:
+                stdin.close()
+            except OSError:
+                pass
+
+    def _reader(self, worker):
+        for answer in read_answers(worker['proc'].stdout):
+            tag = self._answered(worker)
+            self.results.put((tag, None if answer is None else moves_from_indices(answer)))
+        # The solver exited: route nothing more to it and fail anything
+        # still waiting on it
+        with self.lock:
+            worker['alive'] = False
+            failed = list(worker['pending'])
+            worker['pending'].clear()
+            if worker['busy_since'] is not None:
+                worker['busy'] += time.monotonic() - worker['busy_since']
+                worker['busy_since'] = None
+        if failed:
+            print("TwoPhase solver worker exited with solves pending")
+        for tag in failed:
+            self.results.put((tag, None))
+
+    def _answered(self, worker):
+        """Pop the oldest pending tag, closing the busy period if it was the last"""
+        with self.lock:
+            tag = worker['pending'].popleft()
+            if not worker['pending']:
+                worker['busy'] += time.monotonic() - worker['busy_since']
+                worker['busy_since'] = None
+        return tag
+
+    def submit(self, record, tag):
+        """
+        Queue a 20-byte cubepos record for solving without blocking.
+
+        Args:
+            record: bytes from singmaster_to_cubepos
+            tag: any value; poll() returns it with the solution (None at
+                once if every worker has exited)
+        """
+        with self.lock:
+            alive = [w for w in self.workers if w['alive']]
+            if not alive:
+                self.results.put((tag, None))
+                return
+            worker = min(alive, key=lambda w: len(w['pending']))
+            if not worker['pending']:
+                worker['busy_since'] = time.monotonic()
+            worker['pending'].append(tag)
+        worker['inbox'].put(record)
+
+    def poll(self):
+        """Return a list of (tag, solution or None) for every finished solve"""
+        done = []
+        while True:
+            try:
+                done.append(self.results.get_nowait())
+            except queue.Empty:
+                return done
+
+    def wait(self, timeout=None):
+        """Like poll(), but block up to timeout seconds for the first result"""
+        try:
+            first = self.results.get(timeout=timeout)
+        except queue.Empty:
+            return []
+        return [first] + self.poll()
+
+    def alive(self):
+        """Number of workers whose process is still running"""
+        with self.lock:
+            return sum(1 for w in self.workers if w['alive'])
+
+    def pending(self):
+        """Number of submitted positions not yet answered"""
+        return sum(len(w['pending']) for w in self.workers)
+
+    def utilization(self):
+        """Fraction of the time since start each worker has had a solve pending"""
+        now = time.monotonic()
+        elapsed = max(now - self.started, 1e-9)
+        with self.lock:
+            return [(w['busy'] + (now - w['busy_since'] if w['busy_since'] is not None else 0))
+                    / elapsed for w in self.workers]
+
+    def close(self):
+        """Stop feeding the workers and wait for them to exit"""
+        for worker in self.workers:
+            worker['inbox'].put(None)
+        for worker in self.workers:
+            try:
+                worker['proc'].wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                worker['proc'].kill()
+
+
 def is_twophase_available(twophase_path=None):
     """Check if twophase executable exists and is runnable."""
     if twophase_path is None:
         twophase_path = TWOPHASE_PATH
     return os.path.isfile(twophase_path) and os.access(twophase_path, os.X_OK)
+
+
+# Pruning table files per mode, as phase1/phase2 look for them; either the
+# raw table or the zlib artifact will do
+TABLE_FILES = {
+    'full': (('data1.dat', 'data1z.dat'), ('data2.dat', 'data2z.dat')),
+    'compact': (('data1c.dat', 'data1.dat', 'data1z.dat'), ('data2c.dat', 'data2.dat', 'data2z.dat')),
+    'optimal': (('data3.dat',),),
+}
+
+# Progress line printed by twophase --build-tables while generating
+_BUILD_PROGRESS = re.compile(r'\[(phase[12]|optimal):(\d+)/(\d+) entries, ETA (\?|\d+)s?\]')
+
+_TABLE_MODE_FLAGS = {'full': '--full', 'compact': '--compact', 'optimal': '--optimal'}
+
+
+def _table_mode(compact, optimal):
+    return 'optimal' if optimal else 'compact' if compact else 'full'
+
+
+def tables_present(twophase_path=None, compact=False, optimal=False):
+    """
+    Check that a pruning table file exists for each phase (or the optimal
+    solver's table), without loading it. Use check_tables to verify the
+    contents.
+    """
+    if twophase_path is None:
+        twophase_path = TWOPHASE_PATH
+    solver_dir = os.path.dirname(twophase_path)
+    return all(any(os.path.isfile(os.path.join(solver_dir, name)) for name in names)
+               for names in TABLE_FILES[_table_mode(compact, optimal)])
+
+
+def check_tables(twophase_path=None, compact=False, optimal=False, timeout=120):
+    """
+    Load the pruning tables once (twophase --check-tables), verifying their
+    checksums. Nothing is generated or written.
+
+    Returns:
+        True if both tables (or the optimal table) load
+    """
+    if twophase_path is None:
+        twophase_path = TWOPHASE_PATH
+    try:
+        result = subprocess.run(
+            [twophase_path, '--check-tables', _TABLE_MODE_FLAGS[_table_mode(compact, optimal)]],
+            capture_output=True,
+            text=True,
+            timeout=timeout,
+            cwd=os.path.dirname(twophase_path)
+        )
+    except (OSError, subprocess.TimeoutExpired) as e:
+        print(f"Cannot check pruning tables: {e}")
+        return False
+    return result.returncode == 0
+
+
+def build_tables(twophase_path=None, compact=False, progress=None, optimal=False):
+    """
+    Build (or just load, if present) the pruning tables with twophase
+    --build-tables. An interrupted build resumes from its last checkpoint
+    the next time this runs.
+
+    Args:
+        compact: build the 2-bit tables instead of the full ones
+        progress: optional callback(phase, done, total, eta) for every
+            progress line; phase is 'phase1', 'phase2' or 'optimal', eta
+            is seconds left or None while unknown
+        optimal: build the optimal solver's table (data3.dat) instead;
+            packed from data1.dat in seconds when that is present
+
+    Returns:
+        True if the tables are ready
+    """
+    if twophase_path is None:
+        twophase_path = TWOPHASE_PATH
+    try:
+        process = subprocess.Popen(
+            [twophase_path, '--build-tables', _TABLE_MODE_FLAGS[_table_mode(compact, optimal)]],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            bufsize=1,
+            cwd=os.path.dirname(twophase_path)
+        )
+    except OSError as e:
+        print(f"Cannot run TwoPhase solver: {e}")
+        return False
+    for line in process.stdout:
+        match = _BUILD_PROGRESS.search(line)
+        if match is None:
+            if line.strip():
+                print(line.rstrip())
+        elif progress is not None:
+            phase, done, total, eta = match.groups()
+            progress(phase, int(done), int(total), None if eta == '?' else int(eta))
+    return process.wait() == 0
@@ -19,7 +19,9 @@ KEY FUNCTIONS:
     - init(): Builds all lookup tables for fast move application and symmetry reduction
 
 NOTES:
-    - All static tables are initialized at startup for efficient search
+    - The init() functions only compute the tables when built with
+      TWOPHASE_RUNTIME_TABLES (tablegen); the solver links the generated
+      static_tables.cpp instead and its init() does nothing
     - Used by phase1 and phase2 for pruning and equivalence checking
 */
 
@@ -29,6 +31,9 @@ using namespace std;
 // Static Data Initialization for CubeSymmetry
 // ============================================================================
 
+// Only tablegen computes the tables at run time; every other build gets the
+// generated const arrays from static_tables.cpp (see TABLE_CONST in cubepos.h)
+#ifdef TWOPHASE_RUNTIME_TABLES
 lookup_type CubeSymmetry::cornermove[CORNERSYMM][NMOVES];
 lookup_type CubeSymmetry::edgeomove[EDGEOSYMM][NMOVES];
 lookup_type CubeSymmetry::edgepmove[EDGEPERM][NMOVES];
@@ -50,11 +55,13 @@ unsigned char permcube::c12_8[EDGEPERM];
 lookup_type permcube::c8_12[C8_4];
 unsigned short permcube::eperm_move[EDGEPERM][NMOVES];
 int permcube::cperm_move[C8_4][NMOVES];
+#endif
 
 // ============================================================================
 // Helper Functions
 // ============================================================================
 
+#ifdef TWOPHASE_RUNTIME_TABLES
 // Bit count (population count)
 static int bc(int v) {
     int r = 0;
@@ -73,6 +80,7 @@ static int muls4(int a, int b) {
     r += (3 & (b >> (2 * ((a >> 6) & 3)))) << 6;
     return r;
 }
+#endif
 
 // ============================================================================
 // CubeSymmetry Implementation
@@ -131,7 +139,7 @@ void CubeSymmetry::set_coset(cubepos& cp) {
 }
 
 void CubeSymmetry::canon_into(CubeSymmetry& kc) const {
-    corner_mapinfo& cm = cornersymm[csymm];
+    const corner_mapinfo& cm = cornersymm[csymm];
     kc.csymm = cornersymm_expand[cm.csymm];
     kc.eosymm = edgeomap[edgepxor[epsymm][cm.minmap >> 3] ^ eosymm][cm.minmap];
     kc.epsymm = edgepmap[epsymm][cm.minmap];
@@ -154,6 +162,7 @@ void CubeSymmetry::canon_into(CubeSymmetry& kc) const {
 // ============================================================================
 
 void CubeSymmetry::init() {
+#ifdef TWOPHASE_RUNTIME_TABLES
     static int initialized = 0;
     if (initialized)
         return;
@@ -242,6 +251,7 @@ void CubeSymmetry::init() {
     }
 
     permcube::init();
+#endif
 }
 
 // ============================================================================
@@ -368,6 +378,7 @@ void permcube::set_perm(cubepos& cp) const {
 // ============================================================================
 
 void permcube::init() {
+#ifdef TWOPHASE_RUNTIME_TABLES
     // Initialize S4 (symmetric group of 4 elements) tables
     int cc = 0;
     for (int a = 0; a < 4; a++)
@@ -451,4 +462,5 @@ void permcube::init() {
             cperm_move[i][mv] = (pc2.c8_4 << 10) + (pc2.ctp << 5) + pc2.cbp;
         }
     }
+#endif
 }
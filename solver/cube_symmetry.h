@@ -25,7 +25,8 @@ CLASS OVERVIEW:
     CubeSymmetry:
         - csymm, eosymm, epsymm: Coordinates for corners, edge orientation, edge permutation
         - move(): Applies a move to the symmetry coordinates
-        - init(): Initializes all static lookup tables
+        - init(): Computes all static lookup tables (tablegen builds only;
+                  see TABLE_CONST in cubepos.h)
         - in_Kociemba_group(): Checks if a move is valid in G1
 
     permcube:
@@ -137,16 +138,16 @@ public:
     // Static Lookup Tables
     // --------------------------------------------------------------------
 
-    static lookup_type cornermove[CORNERSYMM][NMOVES];
-    static lookup_type edgeomove[EDGEOSYMM][NMOVES];
-    static lookup_type edgepmove[EDGEPERM][NMOVES];
-    static lookup_type epsymm_compress[1 << 12];
-    static lookup_type epsymm_expand[EDGEOSYMM];
-    static lookup_type cornersymm_expand[CORNERRSYMM];
-    static corner_mapinfo cornersymm[CORNERSYMM];
-    static lookup_type edgeomap[EDGEOSYMM][CUBE_SYMM];
-    static lookup_type edgepmap[EDGEPERM][CUBE_SYMM];
-    static lookup_type edgepxor[EDGEPERM][2];
+    static TABLE_CONST lookup_type cornermove[CORNERSYMM][NMOVES];
+    static TABLE_CONST lookup_type edgeomove[EDGEOSYMM][NMOVES];
+    static TABLE_CONST lookup_type edgepmove[EDGEPERM][NMOVES];
+    static TABLE_CONST lookup_type epsymm_compress[1 << 12];
+    static TABLE_CONST lookup_type epsymm_expand[EDGEOSYMM];
+    static TABLE_CONST lookup_type cornersymm_expand[CORNERRSYMM];
+    static TABLE_CONST corner_mapinfo cornersymm[CORNERSYMM];
+    static TABLE_CONST lookup_type edgeomap[EDGEOSYMM][CUBE_SYMM];
+    static TABLE_CONST lookup_type edgepmap[EDGEPERM][CUBE_SYMM];
+    static TABLE_CONST lookup_type edgepxor[EDGEPERM][2];
 };
 
 // Identity CubeSymmetry state
@@ -204,16 +205,16 @@ public:
 
     static void init();
 
-    static unsigned char s4mul[FACT4][FACT4];
-    static unsigned char s4compress[256];
-    static unsigned char s4expand[FACT4];
-    static unsigned char c8_4_compact[256];
-    static unsigned char c8_4_expand[C8_4];
-    static unsigned char c8_4_parity[C8_4];
-    static unsigned char c12_8[EDGEPERM];
-    static lookup_type c8_12[C8_4];
-    static unsigned short eperm_move[EDGEPERM][NMOVES];
-    static int cperm_move[C8_4][NMOVES];
+    static TABLE_CONST unsigned char s4mul[FACT4][FACT4];
+    static TABLE_CONST unsigned char s4compress[256];
+    static TABLE_CONST unsigned char s4expand[FACT4];
+    static TABLE_CONST unsigned char c8_4_compact[256];
+    static TABLE_CONST unsigned char c8_4_expand[C8_4];
+    static TABLE_CONST unsigned char c8_4_parity[C8_4];
+    static TABLE_CONST unsigned char c12_8[EDGEPERM];
+    static TABLE_CONST lookup_type c8_12[C8_4];
+    static TABLE_CONST unsigned short eperm_move[EDGEPERM][NMOVES];
+    static TABLE_CONST int cperm_move[C8_4][NMOVES];
 };
 
 // Identity permcube state
@@ -17,7 +17,9 @@ KEY FUNCTIONS:
     - invert_into(), invert_sequence(): Cube state inversion operations
 
 NOTES:
-    - All move tables are initialized at startup for fast application
+    - The move and symmetry tables are compiled in (static_tables.cpp);
+      init() computes them only in tablegen builds, and otherwise just
+      sets up the Singmaster parsing tables
     - Used by TwophaseSolver and symmetry modules for all cube manipulations
 */
 
@@ -29,13 +31,15 @@ using namespace std;
 
 const cubepos identity_cube(0, 0, 0);
 
+char cubepos::faces[FACES] = {'U', 'F', 'R', 'D', 'B', 'L'};
+
+// Generated into static_tables.cpp unless computed at run time (tablegen)
+#ifdef TWOPHASE_RUNTIME_TABLES
 unsigned char cubepos::corner_ori_inc[CUBIES],
               cubepos::corner_ori_dec[CUBIES],
               cubepos::corner_ori_neg_strip[CUBIES],
               cubepos::mod24[2 * CUBIES];
 
-char cubepos::faces[FACES] = {'U', 'F', 'R', 'D', 'B', 'L'};
-
 unsigned char cubepos::edge_trans[NMOVES][CUBIES],
               cubepos::corner_trans[NMOVES][CUBIES];
 
@@ -47,6 +51,7 @@ unsigned char cubepos::rot_edge[M][CUBIES], cubepos::rot_corner[M][CUBIES];
 
 unsigned char cubepos::canon_seq[CANONSEQSTATES][NMOVES];
 int cubepos::canon_seq_mask[CANONSEQSTATES];
+#endif
 
 static char static_buf[200];
 
@@ -161,6 +166,7 @@ static int parse_corner(const char*& p) {
     return c;
 }
 
+#ifdef TWOPHASE_RUNTIME_TABLES
 static void parse_corner_to_facemap(const char* p, unsigned char* a) {
     for (int i = 0; i < 3; i++) {
         int f = cubepos::parse_face(p[i]);
@@ -173,6 +179,7 @@ static void face_map_multiply(unsigned char* a, unsigned char* b, unsigned char*
     for (int i = 0; i < 6; i++)
         c[i] = b[a[i]];
 }
+#endif
 
 // ============================================================================
 // Initialization
@@ -184,6 +191,7 @@ void cubepos::init() {
         return;
     initialized = 1;
 
+#ifdef TWOPHASE_RUNTIME_TABLES
     // Initialize corner orientation lookup tables
     for (int i = 0; i < CUBIES; i++) {
         int perm = corner_perm(i);
@@ -231,6 +239,7 @@ void cubepos::init() {
     // Initialize inverse move table
     for (int i = 0; i < NMOVES; i++)
         inv_move[i] = TWISTS * (i / TWISTS) + (NMOVES - i - 1) % TWISTS;
+#endif
 
     // Initialize Singmaster notation lookup tables
     memset(lookup_edge_cubie, INVALID, sizeof(lookup_edge_cubie));
@@ -250,6 +259,7 @@ void cubepos::init() {
     for (int i = 0; i < 8; i++)
         sm_corner_order[i] = corner_perm(parse_corner(p));
 
+#ifdef TWOPHASE_RUNTIME_TABLES
     // Initialize face maps for symmetry operations
     unsigned char face_to_m[FACES * FACES * FACES];
     for (int i = 0; i < 6; i++)
@@ -314,6 +324,7 @@ void cubepos::init() {
             }
         }
     }
+#endif
 }
 
 // ============================================================================
@@ -54,6 +54,17 @@ const int CANONSEQSTART = 0;
 // I/O chunk size for reading/writing pruning tables
 const int TABLE_CHUNKSIZE = 65536;
 
+// Lookup tables (the static arrays of cubepos, CubeSymmetry, permcube and
+// phase2) are generated at build time: tablegen, built with
+// -DTWOPHASE_RUNTIME_TABLES, runs the init() code below and writes them to
+// static_tables.cpp as const arrays, which land in read-only pages shared
+// by every solver process. Without the define, init() computes nothing.
+#ifdef TWOPHASE_RUNTIME_TABLES
+#define TABLE_CONST
+#else
+#define TABLE_CONST const
+#endif
+
 // ============================================================================
 // Utility Functions
 // ============================================================================
@@ -176,16 +187,16 @@ public:
     // Static Lookup Tables
     // ========================================================================
     
-    static unsigned char corner_ori_inc[CUBIES], corner_ori_dec[CUBIES],
-                         corner_ori_neg_strip[CUBIES], mod24[2 * CUBIES];
+    static TABLE_CONST unsigned char corner_ori_inc[CUBIES], corner_ori_dec[CUBIES],
+                                     corner_ori_neg_strip[CUBIES], mod24[2 * CUBIES];
     static char faces[FACES];
-    static unsigned char edge_trans[NMOVES][CUBIES], corner_trans[NMOVES][CUBIES];
-    static unsigned char inv_move[NMOVES];
-    static unsigned char face_map[M][FACES], move_map[M][NMOVES];
-    static unsigned char invm[M], mm[M][M];
-    static unsigned char rot_edge[M][CUBIES], rot_corner[M][CUBIES];
-    static unsigned char canon_seq[CANONSEQSTATES][NMOVES];
-    static int canon_seq_mask[CANONSEQSTATES];
+    static TABLE_CONST unsigned char edge_trans[NMOVES][CUBIES], corner_trans[NMOVES][CUBIES];
+    static TABLE_CONST unsigned char inv_move[NMOVES];
+    static TABLE_CONST unsigned char face_map[M][FACES], move_map[M][NMOVES];
+    static TABLE_CONST unsigned char invm[M], mm[M][M];
+    static TABLE_CONST unsigned char rot_edge[M][CUBIES], rot_corner[M][CUBIES];
+    static TABLE_CONST unsigned char canon_seq[CANONSEQSTATES][NMOVES];
+    static TABLE_CONST int canon_seq_mask[CANONSEQSTATES];
 };
 
 // Force initialization at startup
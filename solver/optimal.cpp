@@ -0,0 +1,358 @@
+#include "optimal.h"
+#include "table_build.h"
+#include <iostream>
+#include <cstdio>
+#include <strings.h>
+#include <thread>
+
+/*
+===============================================================================
+ OPTIMAL.CPP - OPTIMAL SOLVER TABLE AND SEARCH
+===============================================================================
+
+PURPOSE:
+    Builds and maps the optimal solver's pruning table (data3.dat) and runs
+    the multi-threaded IDA* described in optimal.h.
+
+KEY FUNCTIONS:
+    - optimal::init(): maps data3.dat, generating and writing it if needed
+    - optimal::gen_table(): packs data1.dat, or runs the BFS
+    - OptimalSolver::solve(): iterative deepening from the largest axis
+      bound, one search_depth() per depth
+    - descend(): the per-thread depth-first search below one first move
+
+AXES:
+    Axis a sees the position conjugated by symmetry CUBE_SYMM * a, as
+    TwophaseSolver's orientations do; a move mv of the position is move
+    cubepos::move_map[CUBE_SYMM * a][mv] on that axis. The three sets of
+    coordinates are moved along with the cubepos (by movepc(), the move the
+    coordinate tables follow), which is only compared with the solved cube
+    at the leaves.
+
+NOTES:
+    - The table value 15 marks an unreached entry during generation; all
+      entries are reached, the largest distance is 12
+    - Solutions are returned like TwophaseSolver's: applying them to the
+      solved cube gives the position
+*/
+
+using namespace std;
+
+unsigned int optimal::memsize;
+const unsigned char* optimal::mem;
+int optimal::file_checksum;
+const char* const optimal::filename = "data3.dat";
+
+const int UNSEEN = 15;   // Entry not reached yet during generation
+
+static table_header exact_header() {
+    const unsigned int entries = CORNERRSYMM * EDGEOSYMM * EDGEPERM;
+    return make_table_header(TABLE_EXACT, 4, CORNERRSYMM, EDGEOSYMM, EDGEPERM, (entries + 1) / 2);
+}
+
+// Stream the distance bytes of data1.dat into buf. Returns 0 if the file
+// is missing or damaged.
+static int pack_phase1_table(unsigned char* buf) {
+    const unsigned int entries = CORNERRSYMM * EDGEOSYMM * EDGEPERM;
+    FILE* f = fopen(phase1::filename, "rb");
+    if (f == 0)
+        return 0;
+
+    cout << "Packing " << phase1::filename << " into " << optimal::filename << endl << flush;
+    unsigned char* chunk = new unsigned char[TABLE_CHUNKSIZE];
+    unsigned int at = 0;
+    int seed = 0, checksum = 0;
+    int ok = 1;
+    while (ok && at < entries) {
+        unsigned int n = entries - at;
+        if (n > TABLE_CHUNKSIZE / BYTES_PER_ENTRY)
+            n = TABLE_CHUNKSIZE / BYTES_PER_ENTRY;
+        unsigned int siz = n * BYTES_PER_ENTRY;
+        if (fread(chunk, 1, siz, f) != siz) {
+            ok = 0;
+            break;
+        }
+        seed = datahash((unsigned int*)chunk, siz, seed);
+        for (unsigned int i = 0; i < n; i++, at++) {
+            int d = chunk[i * BYTES_PER_ENTRY];
+            set_4bit(buf, at, d > UNSEEN ? UNSEEN : d);
+        }
+    }
+    if (ok && fread(&checksum, sizeof(int), 1, f) != 1)
+        ok = 0;
+    fclose(f);
+    delete[] chunk;
+    if (ok && checksum == seed)
+        return 1;
+    cerr << "Could not convert " << phase1::filename << "; regenerating" << endl;
+    return 0;
+}
+
+void optimal::gen_table(unsigned char* buf) {
+    const unsigned int entries = CORNERRSYMM * EDGEOSYMM * EDGEPERM;
+    // Converting data1.dat writes a table too, which --check-tables must not
+    if (!generate_tables)
+        error("! optimal table missing or invalid");
+    if (pack_phase1_table(buf))
+        return;
+
+    unsigned int seen = 1, expanded = 0;
+    int d = 1;
+    if (build_checkpoint::load(filename, buf, memsize, d, seen, expanded)) {
+        d++;
+    } else {
+        memset(buf, 255, memsize);
+        set_4bit(buf, 0, 0);
+    }
+
+    cout << "Gen optimal" << endl << flush;
+    build_progress progress("optimal", entries, expanded);
+
+    for (; seen < entries; d++) {
+        int seek = d - 1;
+        unsigned int at = 0;
+        unsigned int before = seen;
+
+        for (int cs = 0; cs < CORNERRSYMM; cs++) {
+            progress.update(expanded);
+            int csymm = CubeSymmetry::cornersymm_expand[cs];
+            for (int eosymm = 0; eosymm < EDGEOSYMM; eosymm++)
+                for (int epsymm = 0; epsymm < EDGEPERM; epsymm++, at++)
+                    if (get_4bit(buf, at) == seek) {
+                        expanded++;
+                        for (int mv = 0; mv < NMOVES; mv++) {
+                            CubeSymmetry kc(csymm, eosymm, epsymm);
+                            kc.move(mv);
+                            const corner_mapinfo& cm = CubeSymmetry::cornersymm[kc.csymm];
+                            for (int m = cm.minmap; cm.minbits >> m; m++)
+                                if ((cm.minbits >> m) & 1) {
+                                    int deosymm = CubeSymmetry::edgeomap[CubeSymmetry::edgepxor[kc.epsymm][m >> 3] ^ kc.eosymm][m];
+                                    int depsymm = CubeSymmetry::edgepmap[kc.epsymm][m];
+                                    int dat = (cm.csymm * EDGEOSYMM + deosymm) * EDGEPERM + depsymm;
+                                    if (get_4bit(buf, dat) == UNSEEN) {
+                                        set_4bit(buf, dat, d);
+                                        seen++;
+                                    }
+                                }
+                        }
+                    }
+        }
+
+        if (seen == before)
+            break;
+        build_checkpoint::save(filename, buf, memsize, d, seen, expanded);
+    }
+
+    progress.finish();
+}
+
+void optimal::init(int suppress_writing) {
+    static int initialized = 0;
+    if (initialized)
+        return;
+    initialized = 1;
+
+    CubeSymmetry::init();
+
+    table_header hdr = exact_header();
+    memsize = hdr.bytes;
+    mem = map_table_file(filename, hdr, memsize, file_checksum);
+    if (mem != 0)
+        return;
+
+    unsigned char* buf = new unsigned char[memsize];
+    gen_table(buf);
+    file_checksum = datahash((unsigned int*)buf, memsize, 0);
+    if (!suppress_writing) {
+        write_table_file(filename, hdr, buf, memsize, file_checksum);
+        build_checkpoint::remove(filename);
+        mem = map_table_file(filename, hdr, memsize, file_checksum);
+    }
+    // Keep the generated buffer only if the table could not be mapped
+    if (mem != 0)
+        delete[] buf;
+    else
+        mem = buf;
+}
+
+// ============================================================================
+// Search
+// ============================================================================
+
+// Per-thread state of the search below one subtree.
+struct search_context {
+    const atomic<int>& found;
+    int subtree;
+    long long nodes;
+    unsigned char moves[OPTIMAL_MAXLEN];
+
+    search_context(const atomic<int>& found) : found(found), subtree(0), nodes(0) {}
+};
+
+// Depth-first search for a sequence of exactly togo moves solving cp; the
+// moves land in s.moves from sofar on. Like TwophaseSolver::solve_phase1,
+// children are expanded in two passes so their table lookups are all in
+// flight before the first is decoded.
+static int descend(search_context& s, const CubeSymmetry* kc, const cubepos& cp,
+                   int togo, int sofar, int canon) {
+    s.nodes++;
+    if (togo == 0)
+        return cp == identity_cube;
+    if (s.found.load(memory_order_relaxed) < s.subtree)
+        return 0;
+
+    --togo;
+
+    CubeSymmetry kc2[NMOVES][3];
+    int offs[NMOVES][3];
+    unsigned char mvs[NMOVES];
+    int nchildren = 0;
+    int movemask = cubepos::cs_mask(canon);
+
+    // First pass: the UD axis of every child.
+    while (movemask) {
+        int mv = ffs(movemask) - 1;
+        movemask &= movemask - 1;
+
+        CubeSymmetry& child = kc2[nchildren][0];
+        child = kc[0];
+        child.move(mv);
+        offs[nchildren][0] = optimal::index(child);
+        optimal::prefetch(offs[nchildren][0]);
+        mvs[nchildren++] = static_cast<unsigned char>(mv);
+    }
+
+    // Second pass: the other two axes, only for children the first bound
+    // does not already rule out.
+    int survivors = 0;
+    for (int i = 0; i < nchildren; i++) {
+        if (get_4bit(optimal::mem, offs[i][0]) > togo)
+            continue;
+        int mv = mvs[i];
+        for (int a = 1; a < 3; a++) {
+            CubeSymmetry& child = kc2[survivors][a];
+            child = kc[a];
+            child.move(cubepos::move_map[CUBE_SYMM * a][mv]);
+            offs[survivors][a] = optimal::index(child);
+            optimal::prefetch(offs[survivors][a]);
+        }
+        kc2[survivors][0] = kc2[i][0];
+        mvs[survivors++] = static_cast<unsigned char>(mv);
+    }
+
+    for (int i = 0; i < survivors; i++) {
+        if (get_4bit(optimal::mem, offs[i][1]) > togo ||
+            get_4bit(optimal::mem, offs[i][2]) > togo)
+            continue;
+
+        int mv = mvs[i];
+        cubepos cp2 = cp;
+        cp2.movepc(mv);
+        s.moves[sofar] = static_cast<unsigned char>(mv);
+        if (descend(s, kc2[i], cp2, togo, sofar + 1, cubepos::next_cs(canon, mv)))
+            return 1;
+    }
+    return 0;
+}
+
+OptimalSolver::OptimalSolver(int threads)
+    : threads(threads > 0 ? threads : (int)thread::hardware_concurrency()),
+      next_subtree(0),
+      found(0),
+      visited(0) {
+    if (this->threads < 1)
+        this->threads = 1;
+}
+
+// Thread body: take subtrees in order until they run out or one before
+// the next has been solved.
+void OptimalSolver::run_subtrees(int depth) {
+    search_context s(found);
+    for (;;) {
+        int i = next_subtree++;
+        if (i >= (int)subtrees.size() || i > found.load())
+            break;
+        const subtree& st = subtrees[i];
+        if (st.dist > depth - 1)
+            continue;
+        s.subtree = i;
+        s.moves[0] = static_cast<unsigned char>(st.mv);
+        if (descend(s, st.kc, st.cp, depth - 1, 1, cubepos::next_cs(CANONSEQSTART, st.mv))) {
+            lock_guard<mutex> hold(solution_lock);
+            if (i < found.load()) {
+                found = i;
+                memcpy(solution, s.moves, depth);
+            }
+        }
+    }
+    visited += s.nodes;
+}
+
+void OptimalSolver::search_depth(int depth) {
+    next_subtree = 0;
+    found = (int)subtrees.size();
+
+    int n = min(threads, (int)subtrees.size());
+    if (n <= 1) {
+        run_subtrees(depth);
+        return;
+    }
+    vector<thread> workers;
+    for (int t = 0; t < n; t++)
+        workers.push_back(thread(&OptimalSolver::run_subtrees, this, depth));
+    for (int t = 0; t < n; t++)
+        workers[t].join();
+}
+
+moveseq OptimalSolver::solve(const cubepos& cp) {
+    visited = 0;
+    moveseq sol;
+    if (cp == identity_cube)
+        return sol;
+
+    // Start at the largest axis bound; children of the root are the
+    // subtrees handed to the threads.
+    CubeSymmetry kc[3];
+    int depth = 1;
+    for (int a = 0; a < 3; a++) {
+        cubepos t;
+        cp.remap_into(CUBE_SYMM * a, t);
+        kc[a] = CubeSymmetry(t);
+        depth = max(depth, optimal::lookup(kc[a]));
+    }
+
+    subtrees.clear();
+    for (int mv = 0; mv < NMOVES; mv++) {
+        subtree st;
+        st.mv = mv;
+        st.cp = cp;
+        st.cp.movepc(mv);
+        st.dist = 0;
+        for (int a = 0; a < 3; a++) {
+            st.kc[a] = kc[a];
+            st.kc[a].move(cubepos::move_map[CUBE_SYMM * a][mv]);
+            st.dist = max(st.dist, optimal::lookup(st.kc[a]));
+        }
+        subtrees.push_back(st);
+    }
+
+    for (; depth <= OPTIMAL_MAXLEN; depth++) {
+        search_depth(depth);
+        if (found < (int)subtrees.size())
+            break;
+    }
+    if (depth > OPTIMAL_MAXLEN)
+        error("! no solution within OPTIMAL_MAXLEN moves");
+
+    for (int i = 0; i < depth; i++)
+        sol.push_back(solution[i]);
+
+    // Sanity check, as in TwophaseSolver::solve(): the moves must produce
+    // cp from the solved cube
+    cubepos cpt;
+    for (size_t i = 0; i < sol.size(); ++i)
+        cpt.move(sol[i]);
+    if (cpt != cp)
+        error("! move sequence doesn't work");
+    return sol;
+}
@@ -0,0 +1,100 @@
+#ifndef OPTIMAL_H
+#define OPTIMAL_H
+
+#include "phase1.h"
+#include <atomic>
+#include <mutex>
+
+// ============================================================================
+// OPTIMAL SOLVER - SHORTEST SOLUTIONS BY MULTI-THREADED IDA*
+// ============================================================================
+//
+// PURPOSE:
+//   TwophaseSolver stops at the first solution within target_length, which
+//   is short but not provably shortest. OptimalSolver runs IDA* on the
+//   whole cube and returns a solution of minimal length (at most 20 moves,
+//   God's number in the half-turn metric).
+//
+// PRUNING TABLE:
+//   - Exact distance to the Kociemba subgroup over the phase 1 coordinates
+//     (corner orientation reduced by the 16 symmetries, edge orientation,
+//     UD slice edges): 170M entries at 4 bits, ~85MB in data3.dat
+//   - Looked up along all three axes by conjugating the position with the
+//     symmetries that turn UD into RL and FB; the largest of the three is
+//     a lower bound on the distance to solved
+//   - Memory-mapped read-only rather than loaded, so start-up costs one
+//     checksum pass and every solver process shares the same pages
+//   - Packed from data1.dat when that table is on disk (seconds), built
+//     by BFS otherwise (minutes; --build-tables shows progress and
+//     checkpoints like the phase tables)
+//
+// SEARCH:
+//   - Moves follow the canonical sequences (cubepos::next_cs/cs_mask), so
+//     no face is turned twice in a row and commuting opposite faces are
+//     taken in one order only
+//   - Each depth iteration splits the first move's subtrees among the
+//     threads. A thread that finds a solution records its subtree, and
+//     threads working on later subtrees abandon them; earlier subtrees
+//     are still searched, so the answer does not depend on timing
+//
+// ============================================================================
+
+const int OPTIMAL_MAXLEN = 20;    // Longest optimal solution (God's number)
+
+// Optimal solver pruning table manager - singleton pattern with static methods
+class optimal {
+public:
+    // Map the table (generating and writing it first if missing)
+    static void init(int suppress_writing = 0);
+
+    // Lower bound on the distance of one axis's coordinates to solved
+    static inline int lookup(const CubeSymmetry& kc) { return get_4bit(mem, index(kc)); }
+    // Same coordinate space, and so the same index, as the phase 1 table
+    static inline int index(const CubeSymmetry& kc) { return phase1::index(kc); }
+    static inline void prefetch(int idx) { PHASE1_PREFETCH(mem + (idx >> 1)); }
+
+    // Table generation: packs data1.dat if present, BFS otherwise
+    static void gen_table(unsigned char* buf);
+
+    // Static data
+    static unsigned int memsize;             // Table bytes
+    static const unsigned char* mem;         // Mapped table payload
+    static int file_checksum;                // For integrity verification
+    static const char* const filename;       // "data3.dat"
+};
+
+// Multi-threaded IDA* for minimal-length solutions (see above).
+class OptimalSolver {
+public:
+    // threads: worker threads per search; 0 uses one per hardware thread
+    OptimalSolver(int threads = 0);
+
+    // Returns a shortest solution, checked against cp.
+    moveseq solve(const cubepos& cp);
+
+    // Nodes visited during the last solve().
+    long long nodes() const { return visited; }
+
+    int threads;
+
+private:
+    // One first move to search below at the current depth.
+    struct subtree {
+        CubeSymmetry kc[3];
+        cubepos cp;
+        int mv;
+        int dist;                    // Largest axis bound after mv
+    };
+
+    void search_depth(int depth);
+    void run_subtrees(int depth);
+
+    std::vector<subtree> subtrees;
+    std::atomic<int> next_subtree;   // Next subtree a thread takes
+    std::atomic<int> found;          // Lowest subtree with a solution
+    std::atomic<long long> visited;
+    std::mutex solution_lock;        // Held while lowering found and filling solution
+    unsigned char solution[OPTIMAL_MAXLEN];
+};
+
+#endif
@@ -1,6 +1,11 @@
 #include "phase1.h"
+#include "table_build.h"
 #include <iostream>
 #include <cstdio>
+#include <cstdlib>
+#ifdef __linux__
+#include <sys/mman.h>
+#endif
 
 /*
 ===============================================================================
@@ -14,7 +19,13 @@ PURPOSE:
 KEY FUNCTIONS:
     - gen_table(): Builds pruning table via breadth-first search over all coordinates
     - lookup(): Returns minimum distance to subgroup for a given CubeSymmetry
+    - index()/prefetch()/lookup_at(): the same lookup split in stages so the
+      search can issue all child loads before decoding any of them
+    - gen_compact_table()/read_compact_table(): 2-bit mod 3 variant
     - read_table()/write_table(): Loads/saves table from disk with checksum
+    - read_artifact()/write_artifact(): zlib-compressed headered tables
+    - Both BFS variants report entries settled with an ETA and, under
+      --build-tables, checkpoint each completed depth (see table_build.h)
 
 ALGORITHM OVERVIEW:
     - Table is generated by BFS from solved state, marking minimal move counts
@@ -31,31 +42,76 @@ using namespace std;
 unsigned int phase1::memsize;
 unsigned char* phase1::mem;
 int phase1::file_checksum;
+int phase1::use_hugepages = 0;
+int phase1::compact = TWOPHASE_COMPACT;
 const char* const phase1::filename = "data1.dat";
+const char* const phase1::compact_filename = "data1c.dat";
+const char* const phase1::artifact_filename = "data1z.dat";
+
+static const size_t HUGEPAGE_SIZE = 2 * 1024 * 1024;
+
+// Allocate the table, optionally on huge pages. Explicit hugetlbfs pages are
+// tried first, then a 2MB-aligned block with a transparent huge page hint.
+// The table lives for the whole process, so it is never freed.
+static unsigned char* alloc_table(size_t size, int hugepages) {
+#ifdef __linux__
+    if (hugepages) {
+        size_t rounded = (size + HUGEPAGE_SIZE - 1) & ~(HUGEPAGE_SIZE - 1);
+#ifdef MAP_HUGETLB
+        void* p = mmap(0, rounded, PROT_READ | PROT_WRITE,
+                       MAP_PRIVATE | MAP_ANONYMOUS | MAP_HUGETLB, -1, 0);
+        if (p != MAP_FAILED)
+            return (unsigned char*)p;
+#endif
+        void* q = 0;
+        if (posix_memalign(&q, HUGEPAGE_SIZE, rounded) == 0) {
+#ifdef MADV_HUGEPAGE
+            madvise(q, rounded, MADV_HUGEPAGE);
+#endif
+            return (unsigned char*)q;
+        }
+    }
+#else
+    (void)hugepages;
+#endif
+    return new unsigned char[size];
+}
 
 void phase1::gen_table() {
-    memset(mem, -1, memsize);
-    mem[0] = 0;
-    int seen = 1;
+    const unsigned int entries = CORNERRSYMM * EDGEOSYMM * EDGEPERM;
+    unsigned int seen = 1, expanded = 0;
+    int d = 1;
+
+    if (!generate_tables)
+        error("! phase1 table missing or invalid");
+    if (build_checkpoint::load(filename, mem, memsize, d, seen, expanded)) {
+        d++;
+    } else {
+        memset(mem, -1, memsize);
+        mem[0] = 0;
+    }
 
-    cout << "Gen phase1" << flush;
+    cout << "Gen phase1" << endl << flush;
+    build_progress progress("phase1", entries, expanded);
 
-    for (int d = 1; ; d++) {
-        int lastiter = (seen == CORNERRSYMM * EDGEOSYMM * EDGEPERM);
+    for (; ; d++) {
+        int lastiter = (seen == entries);
         int seek = d - 1;
         int at = 0;
 
         for (int cs = 0; cs < CORNERRSYMM; cs++) {
+            progress.update(expanded);
             int csymm = CubeSymmetry::cornersymm_expand[cs];
             for (int eosymm = 0; eosymm < EDGEOSYMM; eosymm++)
                 for (int epsymm = 0; epsymm < EDGEPERM; epsymm++, at += BYTES_PER_ENTRY)
                     if (mem[at] == seek) {
+                        expanded++;
                         int deltadist[NMOVES];
                         for (int mv = 0; mv < NMOVES; mv++) {
                             int rd = 0;
                             CubeSymmetry kc(csymm, eosymm, epsymm);
                             kc.move(mv);
-                            corner_mapinfo& cm = CubeSymmetry::cornersymm[kc.csymm];
+                            const corner_mapinfo& cm = CubeSymmetry::cornersymm[kc.csymm];
                             for (int m = cm.minmap; cm.minbits >> m; m++)
                                 if ((cm.minbits >> m) & 1) {
                                     int deosymm = CubeSymmetry::edgeomap[CubeSymmetry::edgepxor[kc.epsymm][m >> 3] ^ kc.eosymm][m];
@@ -95,12 +151,12 @@ void phase1::gen_table() {
                     }
         }
 
-        cout << "[phase1:" << (d * 100 / 14) << "%]" << endl << flush;
         if (lastiter)
             break;
+        build_checkpoint::save(filename, mem, memsize, d, seen, expanded);
     }
 
-    cout << "[phase1:100%]" << endl << flush;
+    progress.finish();
 }
 
 int phase1::read_table() {
@@ -139,80 +195,267 @@ int phase1::read_table() {
 }
 
 void phase1::write_table() {
-    FILE* f = fopen(filename, "wb");
+    string temp = table_temp_name(filename);
+    FILE* f = fopen(temp.c_str(), "wb");
     if (f == 0)
         error("! cannot write pruning file to current directory");
     if (fwrite(mem, 1, memsize, f) != memsize)
         error("! error writing pruning table");
-    if (fwrite(&file_checksum, sizeof(int), 1, f) != 1)
+    if (fwrite(&file_checksum, sizeof(int), 1, f) != 1 || fclose(f) != 0)
         error("! error writing pruning table");
-    fclose(f);
+    commit_table_file(temp, filename);
 }
 
-int phase1::lookup(const CubeSymmetry& kc) {
-    corner_mapinfo& cm = CubeSymmetry::cornersymm[kc.csymm];
+int phase1::index(const CubeSymmetry& kc) {
+    const corner_mapinfo& cm = CubeSymmetry::cornersymm[kc.csymm];
     int m = cm.minmap;
-    int r = mem[BYTES_PER_ENTRY * (((cm.csymm * EDGEOSYMM) +
-            CubeSymmetry::edgeomap[CubeSymmetry::edgepxor[kc.epsymm][m >> 3] ^ kc.eosymm][m]) * 495 +
-            CubeSymmetry::edgepmap[kc.epsymm][m])];
-    return r;
+    return ((cm.csymm * EDGEOSYMM) +
+            CubeSymmetry::edgeomap[CubeSymmetry::edgepxor[kc.epsymm][m >> 3] ^ kc.eosymm][m]) * EDGEPERM +
+           CubeSymmetry::edgepmap[kc.epsymm][m];
 }
 
-int phase1::lookup(const CubeSymmetry& kc, int togo, int& nextmovemask) {
-    corner_mapinfo& cm = CubeSymmetry::cornersymm[kc.csymm];
-    int m = cm.minmap;
-    int off = BYTES_PER_ENTRY * (((cm.csymm * EDGEOSYMM) +
-              CubeSymmetry::edgeomap[CubeSymmetry::edgepxor[kc.epsymm][m >> 3] ^ kc.eosymm][m]) * EDGEPERM +
-              CubeSymmetry::edgepmap[kc.epsymm][m]);
-    int r = mem[off];
-
-    if (togo > 0) {
-        nextmovemask = 0;
-        for (int b = 0; b < 3; b++) {
-            int v = mem[off + 1 + b];
-            for (int c = 0; c < 2; c++) {
-                int vv = v & 15;
-                v >>= 4;
-                int inc = vv >= 8;
-                vv = (vv - 8) & 7;
-                for (int t = 0; t < 3; t++) {
-                    int thisv = (inc ? 1 : -1) * (vv & 1);
-                    vv >>= 1;
-                    if (r + thisv <= togo)
-                        nextmovemask |= 1 << (3 * b + 9 * c + t);
-                }
+// Exact distance from a compact table: walk towards G1, each step taking a
+// move whose entry is one less mod 3, and count the steps.
+static int compact_distance(CubeSymmetry kc) {
+    int d = 0;
+    while (kc != identity_kc) {
+        int want = (get_2bit(phase1::mem, phase1::index(kc)) + 2) % 3;
+        int mv = 0;
+        for (; mv < NMOVES; mv++) {
+            CubeSymmetry kc2 = kc;
+            kc2.move(mv);
+            if (get_2bit(phase1::mem, phase1::index(kc2)) == want) {
+                kc = kc2;
+                break;
             }
         }
+        if (mv == NMOVES)
+            error("! inconsistent compact phase1 table");
+        d++;
     }
-    return r;
+    return d;
 }
 
-int phase1::lookup(const CubeSymmetry& kc, int& mask) {
-    corner_mapinfo& cm = CubeSymmetry::cornersymm[kc.csymm];
-    int m = cm.minmap;
-    int off = BYTES_PER_ENTRY * (((cm.csymm * EDGEOSYMM) +
-              CubeSymmetry::edgeomap[CubeSymmetry::edgepxor[kc.epsymm][m >> 3] ^ kc.eosymm][m]) * EDGEPERM +
-              CubeSymmetry::edgepmap[kc.epsymm][m]);
-
+// Distance of every child of kc, for compact lookups that need masks.
+static void compact_child_masks(const CubeSymmetry& kc, int d, int limit, int& mask) {
     mask = 0;
+    for (int mv = 0; mv < NMOVES; mv++) {
+        CubeSymmetry kc2 = kc;
+        kc2.move(mv);
+        if (mod3_step(d, get_2bit(phase1::mem, phase1::index(kc2))) <= limit)
+            mask |= 1 << mv;
+    }
+}
+
+// Moves that do not increase the distance, decoded from the three mask
+// bytes of a full entry. Each nibble covers the three twists of one face:
+// values >= 8 hold +1 flags, values < 8 hold the deltas plus one.
+// The entry describes the symmetry representative, so the mask is in the
+// representative's frame; remap_mask() brings it back to the caller's.
+static int stored_mask(int off) {
+    int mask = 0;
     for (int b = 0; b < 3; b++) {
-        int v = mem[off + 1 + b];
+        int v = phase1::mem[off + 1 + b];
         for (int c = 0; c < 2; c++) {
             int vv = v & 15;
             v >>= 4;
             int inc = vv >= 8;
             vv = (vv - 8) & 7;
             for (int t = 0; t < 3; t++) {
-                int thisv = (inc ? 1 : -1) * (vv & 1);
+                int thisv = inc ? (vv & 1) : (vv & 1) - 1;
                 vv >>= 1;
                 if (thisv <= 0)
                     mask |= 1 << (3 * b + 9 * c + t);
             }
         }
     }
+    return mask;
+}
+
+static int remap_mask(int mask, int m) {
+    if (m == 0)
+        return mask;
+    int r = 0;
+    for (int mv = 0; mv < NMOVES; mv++)
+        if ((mask >> cubepos::move_map[m][mv]) & 1)
+            r |= 1 << mv;
+    return r;
+}
+
+int phase1::lookup(const CubeSymmetry& kc) {
+    if (compact)
+        return compact_distance(kc);
+    return mem[BYTES_PER_ENTRY * index(kc)];
+}
+
+int phase1::lookup(const CubeSymmetry& kc, int togo, int& nextmovemask) {
+    if (compact) {
+        int d = compact_distance(kc);
+        if (togo > 0)
+            compact_child_masks(kc, d, togo, nextmovemask);
+        return d;
+    }
+    return lookup_at(kc, index(kc), 0, togo, nextmovemask);
+}
+
+int phase1::lookup_at(const CubeSymmetry& kc, int idx, int dist, int togo, int& nextmovemask) {
+    if (compact) {
+        if (togo > 0)
+            nextmovemask = ALLMOVEMASK;
+        return mod3_step(dist, get_2bit(mem, idx));
+    }
+
+    int off = BYTES_PER_ENTRY * idx;
+    int r = mem[off];
+
+    // Children are within one move of r, so the stored mask only matters
+    // when togo == r; above that every move fits, below it none does.
+    if (togo > 0) {
+        if (togo > r)
+            nextmovemask = ALLMOVEMASK;
+        else if (togo < r)
+            nextmovemask = 0;
+        else
+            nextmovemask = remap_mask(stored_mask(off), CubeSymmetry::cornersymm[kc.csymm].minmap);
+    }
+    return r;
+}
+
+int phase1::lookup(const CubeSymmetry& kc, int& mask) {
+    if (compact) {
+        int d = compact_distance(kc);
+        compact_child_masks(kc, d, d, mask);
+        return d;
+    }
+
+    int off = BYTES_PER_ENTRY * index(kc);
+    mask = remap_mask(stored_mask(off), CubeSymmetry::cornersymm[kc.csymm].minmap);
     return mem[off];
 }
 
+// Pack distances mod 3 into mem, streaming them out of data1.dat when that
+// table is on disk (a few seconds of I/O, no 680MB buffer), otherwise by
+// running the BFS over a temporary one-byte-per-entry table.
+void phase1::gen_compact_table() {
+    const unsigned int entries = CORNERRSYMM * EDGEOSYMM * EDGEPERM;
+    memset(mem, 255, memsize);
+
+    FILE* f = fopen(filename, "rb");
+    if (f != 0) {
+        cout << "Packing " << filename << " into " << compact_filename << endl << flush;
+        unsigned char* buf = new unsigned char[TABLE_CHUNKSIZE];
+        unsigned int at = 0;
+        int seed = 0, checksum = 0;
+        int ok = 1;
+        while (ok && at < entries) {
+            unsigned int n = entries - at;
+            if (n > TABLE_CHUNKSIZE / BYTES_PER_ENTRY)
+                n = TABLE_CHUNKSIZE / BYTES_PER_ENTRY;
+            unsigned int siz = n * BYTES_PER_ENTRY;
+            if (fread(buf, 1, siz, f) != siz) {
+                ok = 0;
+                break;
+            }
+            seed = datahash((unsigned int*)buf, siz, seed);
+            for (unsigned int i = 0; i < n; i++, at++)
+                set_2bit(mem, at, buf[i * BYTES_PER_ENTRY] == 255 ? 3 : buf[i * BYTES_PER_ENTRY] % 3);
+        }
+        if (ok && fread(&checksum, sizeof(int), 1, f) != 1)
+            ok = 0;
+        fclose(f);
+        delete[] buf;
+        if (ok && checksum == seed)
+            return;
+        cerr << "Could not convert " << filename << "; regenerating" << endl;
+        memset(mem, 255, memsize);
+    }
+
+    if (!generate_tables)
+        error("! phase1 table missing or invalid");
+    unsigned char* dist = new unsigned char[entries];
+    unsigned int seen = 1, expanded = 0;
+    int d = 1;
+    if (build_checkpoint::load(compact_filename, dist, entries, d, seen, expanded)) {
+        d++;
+    } else {
+        memset(dist, 255, entries);
+        dist[0] = 0;
+    }
+
+    cout << "Gen phase1" << endl << flush;
+    build_progress progress("phase1", entries, expanded);
+
+    for (; seen < entries; d++) {
+        int seek = d - 1;
+        unsigned int at = 0;
+        unsigned int before = seen;
+
+        for (int cs = 0; cs < CORNERRSYMM; cs++) {
+            progress.update(expanded);
+            int csymm = CubeSymmetry::cornersymm_expand[cs];
+            for (int eosymm = 0; eosymm < EDGEOSYMM; eosymm++)
+                for (int epsymm = 0; epsymm < EDGEPERM; epsymm++, at++)
+                    if (dist[at] == seek) {
+                        expanded++;
+                        for (int mv = 0; mv < NMOVES; mv++) {
+                            CubeSymmetry kc(csymm, eosymm, epsymm);
+                            kc.move(mv);
+                            const corner_mapinfo& cm = CubeSymmetry::cornersymm[kc.csymm];
+                            for (int m = cm.minmap; cm.minbits >> m; m++)
+                                if ((cm.minbits >> m) & 1) {
+                                    int deosymm = CubeSymmetry::edgeomap[CubeSymmetry::edgepxor[kc.epsymm][m >> 3] ^ kc.eosymm][m];
+                                    int depsymm = CubeSymmetry::edgepmap[kc.epsymm][m];
+                                    int dat = (cm.csymm * EDGEOSYMM + deosymm) * EDGEPERM + depsymm;
+                                    if (dist[dat] == 255) {
+                                        dist[dat] = d;
+                                        seen++;
+                                    }
+                                }
+                        }
+                    }
+        }
+
+        if (seen == before)
+            break;
+        build_checkpoint::save(compact_filename, dist, entries, d, seen, expanded);
+    }
+
+    for (unsigned int i = 0; i < entries; i++)
+        set_2bit(mem, i, dist[i] == 255 ? 3 : dist[i] % 3);
+    delete[] dist;
+
+    progress.finish();
+}
+
+static table_header compact_header() {
+    const unsigned int entries = CORNERRSYMM * EDGEOSYMM * EDGEPERM;
+    return make_table_header(TABLE_COMPACT, 2, CORNERRSYMM, EDGEOSYMM, EDGEPERM,
+                             (entries + 3) / 4);
+}
+
+static table_header full_header() {
+    return make_table_header(TABLE_FULL, 8 * BYTES_PER_ENTRY, CORNERRSYMM, EDGEOSYMM, EDGEPERM,
+                             BYTES_PER_ENTRY * CORNERRSYMM * EDGEOSYMM * EDGEPERM);
+}
+
+int phase1::read_compact_table() {
+    return read_table_file(compact_filename, compact_header(), mem, memsize, file_checksum);
+}
+
+void phase1::write_compact_table() {
+    write_table_file(compact_filename, compact_header(), mem, memsize, file_checksum);
+}
+
+int phase1::read_artifact() {
+    return read_table_file(artifact_filename, full_header(), mem, memsize, file_checksum);
+}
+
+void phase1::write_artifact() {
+    table_header hdr = compact ? compact_header() : full_header();
+    hdr.compression = TABLE_ZLIB;
+    write_table_file(compact ? compact_filename : artifact_filename, hdr, mem, memsize,
+                     file_checksum);
+}
 
 void phase1::init(int suppress_writing) {
     static int initialized = 0;
@@ -222,13 +465,27 @@ void phase1::init(int suppress_writing) {
 
     CubeSymmetry::init();
 
+    if (compact) {
+        memsize = compact_header().bytes;
+        mem = alloc_table(memsize, use_hugepages);
+        if (!read_compact_table()) {
+            gen_compact_table();
+            file_checksum = datahash((unsigned int*)mem, memsize, 0);
+            if (!suppress_writing)
+                write_compact_table();
+            build_checkpoint::remove(compact_filename);
+        }
+        return;
+    }
+
     memsize = BYTES_PER_ENTRY * CORNERRSYMM * EDGEOSYMM * EDGEPERM;
-    mem = new unsigned char[memsize];
+    mem = alloc_table(memsize, use_hugepages);
 
-    if (!read_table()) {
+    if (!read_artifact() && !read_table()) {
         gen_table();
         file_checksum = datahash((unsigned int*)mem, memsize, 0);
         if (!suppress_writing)
             write_table();
+        build_checkpoint::remove(filename);
     }
 }
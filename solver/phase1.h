@@ -2,6 +2,7 @@
 #define PHASE1_H
 
 #include "cube_symmetry.h"
+#include "table_io.h"
 
 // ============================================================================
 // PHASE 1 PRUNING TABLE - KOCIEMBA SUBGROUP REDUCTION
@@ -21,11 +22,28 @@
 //   - Filename: data1.dat (generated on first run, ~10MB)
 //   - Includes checksum for integrity verification
 //   - Uses 65KB chunks for efficient I/O
+//   - data1z.dat, if present, is a prebuilt zlib artifact of the same table
+//     and is preferred over data1.dat (see table_io.h)
+//
+// MEMORY:
+//   - Lookups are random accesses into a table of hundreds of MB, so the
+//     search is bound by cache and TLB misses. Set use_hugepages before
+//     init() to back the table with 2MB pages where the OS supports it.
+//   - With compact set, entries are 2 bits (distance mod 3) in data1c.dat:
+//     ~43MB instead of ~680MB. Move masks are not stored; callers pass the
+//     parent's distance so lookup_at() can decode the child exactly.
 //
 // ============================================================================
 
 const int BYTES_PER_ENTRY = 4;      // 4 bytes per pruning table entry
 
+// Software prefetch hint; a no-op on compilers without the builtin.
+#if defined(__GNUC__)
+#define PHASE1_PREFETCH(p) __builtin_prefetch(p)
+#else
+#define PHASE1_PREFETCH(p) ((void)(p))
+#endif
+
 // Phase 1 pruning table manager - singleton pattern with static methods
 class phase1 {
 public:
@@ -40,6 +58,16 @@ public:
     static int lookup(const CubeSymmetry& kc);
     static int lookup(const CubeSymmetry& kc, int togo, int& nextmovemask);
 
+    // Split lookup for batched callers: compute the entry index, prefetch
+    // it, and decode it later with lookup_at() once the line has arrived.
+    // dist is the distance of the parent position; only the compact format
+    // needs it, and there nextmovemask is left as ALLMOVEMASK.
+    static int index(const CubeSymmetry& kc);
+    static inline void prefetch(int idx) {
+        PHASE1_PREFETCH(mem + (compact ? idx >> 2 : idx * BYTES_PER_ENTRY));
+    }
+    static int lookup_at(const CubeSymmetry& kc, int idx, int dist, int togo, int& nextmovemask);
+
     // Greedy solver (rarely used, kept for reference)
     static moveseq solve(CubeSymmetry kc);
 
@@ -48,11 +76,26 @@ public:
     static int read_table();   // Loads from disk, returns 1 if successful
     static void write_table(); // Saves table to disk
 
+    // Compact (2 bits per entry) table generation and I/O
+    static void gen_compact_table();  // From data1.dat if present, else BFS
+    static int read_compact_table();
+    static void write_compact_table();
+
+    // Compressed artifacts (zlib, headered) as produced by --make-tables.
+    // read_artifact() loads data1z.dat in the full format; compact tables
+    // are read from data1c.dat whether compressed or not.
+    static int read_artifact();
+    static void write_artifact();  // Writes the table for the current mode
+
     // Static data (shared across all calls)
     static unsigned int memsize;              // Total bytes allocated
     static unsigned char* mem;                // Pruning table data
     static int file_checksum;                 // For integrity verification
+    static int use_hugepages;                 // Back mem with huge pages (set before init)
+    static int compact;                       // Use the 2-bit table (set before init)
     static const char* const filename;        // "data1.dat"
+    static const char* const compact_filename; // "data1c.dat"
+    static const char* const artifact_filename; // "data1z.dat"
 };
 
 #endif
@@ -1,6 +1,8 @@
 #include "phase2.h"
+#include "table_build.h"
 #include <iostream>
 #include <cstdio>
+#include <strings.h>
 
 /*
 ===============================================================================
@@ -14,8 +16,15 @@ PURPOSE:
 KEY FUNCTIONS:
     - lookup(): Returns minimum distance to solved state for a given permcube
     - solve(): IDA* solver returning move sequence for Phase 2
+    - solve(pc, maxlen, out): same search writing into a caller buffer, with
+      per-depth permcube storage on the stack (no heap traffic per probe)
     - gen_table(): Builds pruning table via iterative deepening BFS
     - read_table()/write_table(): Loads/saves table from disk with checksum
+    - read_artifact()/write_artifact(): zlib-compressed headered tables
+    - init_symmetry(): corner symmetry reduction, run by tablegen only; the
+      solver links its output (static_tables.cpp)
+    - gen_table() reports entries settled with an ETA and, under
+      --build-tables, checkpoints each completed depth (see table_build.h)
 
 ALGORITHM OVERVIEW:
     - Table is generated by iterative deepening from solved state
@@ -29,19 +38,20 @@ NOTES:
 
 using namespace std;
 
-struct corner_reduce {
-    unsigned char m, parity;
-    lookup_type c, minbits;
-};
-
-static corner_reduce corner_reduction[FACT8];
-static lookup_type edgeud_remap[CUBE_SYMM][FACT8];
+static int kociemba_movemask;   // Moves that stay inside G1
 
+#ifdef TWOPHASE_RUNTIME_TABLES
 int phase2::cornermax;
+corner_reduce phase2::corner_reduction[FACT8];
+lookup_type phase2::edgeud_remap[CUBE_SYMM][FACT8];
+#endif
 unsigned int phase2::memsize;
 unsigned int* phase2::mem;
 const char* const phase2::filename = "data2.dat";
+const char* const phase2::compact_filename = "data2c.dat";
+const char* const phase2::artifact_filename = "data2z.dat";
 int phase2::file_checksum;
+int phase2::compact = TWOPHASE_COMPACT;
 
 inline int corner_coordinate(const permcube& pc) {
     return (pc.c8_4 * FACT4 + pc.ctp) * FACT4 + pc.cbp;
@@ -56,10 +66,49 @@ int phase2::lookup(const cubepos& cp) {
     return lookup(pc);
 }
 
+static inline int table_index(const permcube& pc) {
+    const corner_reduce& cr = phase2::corner_reduction[corner_coordinate(pc)];
+    return cr.c * FACT8 + phase2::edgeud_remap[cr.m][edge_coordinate(pc)];
+}
+
+// Compact entries hold the distance of the (corner, UD edge) projection
+// mod 3; entry 0 is the projected identity.
+static inline int compact_entry(const permcube& pc) {
+    int off = table_index(pc);
+    return (phase2::mem[off >> 4] >> (2 * (off & 15))) & 3;
+}
+
+// Projected distance from a compact table, found by walking down to entry 0.
+static int compact_distance(permcube pc) {
+    int d = 0;
+    while (table_index(pc) != 0) {
+        int want = (compact_entry(pc) + 2) % 3;
+        int mv = 0;
+        for (; mv < NMOVES; mv++) {
+            if (!((kociemba_movemask >> mv) & 1))
+                continue;
+            permcube pc2 = pc;
+            pc2.move(mv);
+            if (compact_entry(pc2) == want) {
+                pc = pc2;
+                break;
+            }
+        }
+        // Only entries the BFS never reached (capped at 16, as in the
+        // nibble table) have no neighbour one step closer.
+        if (mv == NMOVES)
+            return d + 16;
+        d++;
+    }
+    return d;
+}
+
 int phase2::lookup(const permcube& pc) {
-    int cc = corner_coordinate(pc);
-    corner_reduce& cr = corner_reduction[cc];
-    int off = cr.c * FACT8 + edgeud_remap[cr.m][edge_coordinate(pc)];
+    if (compact) {
+        int d = compact_distance(pc);
+        return (d == 0 && pc != identity_pc) ? 1 : d;
+    }
+    int off = table_index(pc);
     int r = (mem[off >> 3] >> (4 * (off & 7))) & 0xf;
     if (r == 0 && pc == identity_pc)
         return 0;
@@ -67,17 +116,35 @@ int phase2::lookup(const permcube& pc) {
         return r + 1;
 }
 
+int phase2::lookup(const permcube& pc, int parentdist) {
+    if (!compact)
+        return lookup(pc);
+    int d = mod3_step(parentdist, compact_entry(pc));
+    return (d == 0 && pc != identity_pc) ? 1 : d;
+}
+
 void phase2::gen_table() {
-    memset(mem, 255, memsize);
-    cout << "Gen phase2" << flush;
-    mem[0] &= ~14;
-    int seen = 1;
+    unsigned int seen = 1;
+    int d = 0;
+
+    if (!generate_tables)
+        error("! phase2 table missing or invalid");
+    if (build_checkpoint::load(filename, mem, memsize, d, seen, seen)) {
+        d++;
+    } else {
+        memset(mem, 255, memsize);
+        mem[0] &= ~14;
+    }
+
+    cout << "Gen phase2" << endl << flush;
+    build_progress progress("phase2", (unsigned long long)cornermax * FACT8, seen);
 
-    for (int d = 0; d < 15; d++) {
+    for (; d < 15; d++) {
         unsigned int seek = (d ? d - 1 : 1);
         int newval = d;
 
-        for (int c8_4 = 0; c8_4 < C8_4; c8_4++)
+        for (int c8_4 = 0; c8_4 < C8_4; c8_4++) {
+            progress.update(seen);
             for (int ctp = 0; ctp < FACT4; ctp++)
                 for (int cbp = 0; cbp < FACT4; cbp++) {
                     permcube pc;
@@ -85,7 +152,7 @@ void phase2::gen_table() {
                     pc.ctp = ctp;
                     pc.cbp = cbp;
                     int oc = corner_coordinate(pc);
-                    corner_reduce& cr = corner_reduction[oc];
+                    const corner_reduce& cr = corner_reduction[oc];
 
                     if (cr.minbits & 1) {
                         permcube pc2, pc3, pc4;
@@ -98,7 +165,7 @@ void phase2::gen_table() {
                             pc2 = pc;
                             pc2.move(mv);
                             int dest_off = corner_coordinate(pc2);
-                            corner_reduce& cr2 = corner_reduction[dest_off];
+                            const corner_reduce& cr2 = corner_reduction[dest_off];
                             int destat = cr2.c * (FACT8 / 8);
 
                             for (int m = cr2.m; (1 << m) <= cr2.minbits; m++)
@@ -133,13 +200,14 @@ void phase2::gen_table() {
                         }
                     }
                 }
+        }
 
         if (d == 0)
             mem[0] &= ~15;
-        cout << "[phase2:" << ((d + 1) * 100 / 15) << "%]" << endl << flush;
+        build_checkpoint::save(filename, mem, memsize, d, seen, seen);
     }
 
-    cout << "[phase2:100%]" << endl << flush;
+    progress.finish();
 }
 
 int phase2::read_table() {
@@ -179,14 +247,15 @@ int phase2::read_table() {
 }
 
 void phase2::write_table() {
-    FILE* f = fopen(filename, "wb");
+    string temp = table_temp_name(filename);
+    FILE* f = fopen(temp.c_str(), "wb");
     if (f == 0)
         error("! cannot write pruning file to current directory");
     if (fwrite(mem, 1, memsize, f) != memsize)
         error("! error writing pruning table");
-    if (fwrite(&file_checksum, sizeof(int), 1, f) != 1)
+    if (fwrite(&file_checksum, sizeof(int), 1, f) != 1 || fclose(f) != 0)
         error("! error writing pruning table");
-    fclose(f);
+    commit_table_file(temp, filename);
 }
 
 int phase2::solve(const permcube& pc, int togo, int canonstate, moveseq& seq) {
@@ -217,23 +286,110 @@ int phase2::solve(const permcube& pc, int togo, int canonstate, moveseq& seq) {
     return -1;
 }
 
+// Depth-first probe for the buffer solver. pcs[depth] holds the position at
+// this depth (d is its lookup value) and children are built in place in
+// pcs[depth + 1], so a probe never allocates. Moves are written forwards
+// into out[]; returns the solution length or -1.
+static int search(permcube* pcs, int depth, int d, int togo, int canonstate, unsigned char* out) {
+    const permcube& pc = pcs[depth];
+    if (d > togo + 1)
+        return -1;
+    if (pc == identity_pc)
+        return depth;
+    if (togo < 1)
+        return -1;
+
+    togo--;
+    permcube& pc2 = pcs[depth + 1];
+    int mask = cubepos::cs_mask(canonstate) & kociemba_movemask;
+
+    while (mask) {
+        int mv = ffs(mask) - 1;
+        mask &= mask - 1;
+        pc2 = pc;
+        pc2.move(mv);
+        int len = search(pcs, depth + 1, phase2::lookup(pc2, d), togo,
+                         cubepos::next_cs(canonstate, mv), out);
+        if (len >= 0) {
+            out[depth] = static_cast<unsigned char>(mv);
+            return len;
+        }
+    }
+    return -1;
+}
+
+int phase2::solve(const permcube& pc, int maxlen, unsigned char* out, int dist) {
+    permcube pcs[PHASE2_MAXLEN + 1];
+    if (maxlen > PHASE2_MAXLEN)
+        maxlen = PHASE2_MAXLEN;
+    if (dist < 0)
+        dist = lookup(pc);
+    pcs[0] = pc;
+    for (int d = dist; d <= maxlen; d++) {
+        int len = search(pcs, 0, dist, d, CANONSEQSTART, out);
+        if (len >= 0)
+            return len;
+    }
+    return -1;
+}
+
 moveseq phase2::solve(const permcube& pc, int maxlen) {
-    moveseq r;
-    for (int d = lookup(pc); d <= maxlen; d++)
-        if (solve(pc, d, CANONSEQSTART, r) >= 0)
-            break;
-    reverse(r.begin(), r.end());
-    return r;
+    unsigned char buf[PHASE2_MAXLEN];
+    int len = solve(pc, maxlen, buf);
+    return moveseq(buf, buf + (len > 0 ? len : 0));
 }
 
-void phase2::init(int suppress_writing) {
-    static int initialized = 0;
-    if (initialized)
-        return;
-    initialized = 1;
+// Replace the nibble table in mem with the 2-bit form: the projected
+// distance mod 3. Entries the BFS never reached read as 16 in the nibble
+// table and are stored as 16 mod 3, which keeps neighbours within one.
+void phase2::pack_compact_table() {
+    unsigned int entries = cornermax * FACT8;
+    unsigned int* packed = new unsigned int[entries / 16];
+    memset(packed, 255, entries / 4);
+    for (unsigned int i = 0; i < entries; i++) {
+        int r = (mem[i >> 3] >> (4 * (i & 7))) & 0xf;
+        int v = (i == 0) ? 0 : (r + 1) % 3;
+        packed[i >> 4] &= ~(3u << (2 * (i & 15)));
+        packed[i >> 4] |= (unsigned int)v << (2 * (i & 15));
+    }
+    delete[] mem;
+    mem = packed;
+    memsize = entries / 4;
+}
 
-    CubeSymmetry::init();
+static table_header compact_header() {
+    unsigned int entries = phase2::cornermax * FACT8;
+    return make_table_header(TABLE_COMPACT, 2, phase2::cornermax, FACT8, 1, entries / 4);
+}
+
+static table_header full_header() {
+    unsigned int entries = phase2::cornermax * FACT8;
+    return make_table_header(TABLE_FULL, 4, phase2::cornermax, FACT8, 1, entries / 2);
+}
+
+int phase2::read_compact_table() {
+    return read_table_file(compact_filename, compact_header(), mem, memsize, file_checksum);
+}
+
+void phase2::write_compact_table() {
+    write_table_file(compact_filename, compact_header(), mem, memsize, file_checksum);
+}
+
+int phase2::read_artifact() {
+    return read_table_file(artifact_filename, full_header(), mem, memsize, file_checksum);
+}
+
+void phase2::write_artifact() {
+    table_header hdr = compact ? compact_header() : full_header();
+    hdr.compression = TABLE_ZLIB;
+    write_table_file(compact ? compact_filename : artifact_filename, hdr, mem, memsize,
+                     file_checksum);
+}
 
+// Corner permutations are reduced by the 16 symmetries that keep the UD
+// axis; edgeud_remap carries the UD edge coordinate along with them.
+void phase2::init_symmetry() {
+#ifdef TWOPHASE_RUNTIME_TABLES
     cubepos cp, cp2;
     int cornercount = 0;
 
@@ -308,14 +464,47 @@ void phase2::init(int suppress_writing) {
                     edgeud_remap[m][e8_4 * FACT4 * FACT4 + etp * FACT4 + ebp] = dat;
                 }
     }
+#endif
+}
+
+void phase2::init(int suppress_writing) {
+    static int initialized = 0;
+    if (initialized)
+        return;
+    initialized = 1;
+
+    CubeSymmetry::init();
+
+    kociemba_movemask = 0;
+    for (int mv = 0; mv < NMOVES; mv++)
+        if (CubeSymmetry::in_Kociemba_group(mv))
+            kociemba_movemask |= 1 << mv;
+
+    init_symmetry();
+
+    if (compact) {
+        memsize = cornermax * FACT8 / 4;
+        mem = new unsigned int[memsize / 4];
+        if (read_compact_table())
+            return;
+        delete[] mem;
+    }
 
     memsize = cornermax * FACT8 / 2;
     mem = new unsigned int[(memsize + 3) / 4];
 
-    if (!read_table()) {
+    if (!read_artifact() && !read_table()) {
         gen_table();
         file_checksum = datahash(mem, memsize, 0);
-        if (!suppress_writing)
+        if (!suppress_writing && !compact)
             write_table();
+        build_checkpoint::remove(filename);
+    }
+
+    if (compact) {
+        pack_compact_table();
+        file_checksum = datahash(mem, memsize, 0);
+        if (!suppress_writing)
+            write_compact_table();
     }
 }
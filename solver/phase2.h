@@ -2,6 +2,7 @@
 #define PHASE2_H
 
 #include "cube_symmetry.h"
+#include "table_io.h"
 
 // ============================================================================
 // PHASE 2 PRUNING TABLE - PERMUTATION SOLVER
@@ -26,19 +27,38 @@
 //   - Filename: data2.dat (generated on first run, ~20MB)
 //   - Uses 65KB chunks for efficient reading
 //   - Includes checksum for corruption detection
+//   - With compact set, data2c.dat holds 2 bits per entry (distance mod 3),
+//     half the size; searches thread the parent distance through
+//     lookup(pc, parentdist) to decode children exactly
+//   - data2z.dat, if present, is a prebuilt zlib artifact of data2.dat and
+//     is preferred over it (see table_io.h)
 //
 // ============================================================================
 
 const int FACT8 = 40320;    // 8! - Maximum corner permutations
+const int PHASE2_MAXLEN = 30; // Longest phase 2 sequence the buffer search accepts
+
+// Symmetry reduction of one corner permutation: the symmetry m that maps it
+// to its class representative, the class index c, and every symmetry that
+// does (minbits)
+struct corner_reduce {
+    unsigned char m, parity;
+    lookup_type c, minbits;
+};
 
 // Phase 2 pruning table manager - singleton pattern with static methods
 class phase2 {
 public:
     static void init(int suppress_writing = 0);
 
+    // Fills corner_reduction, edgeud_remap and cornermax in tablegen builds;
+    // elsewhere they come from static_tables.cpp and this does nothing.
+    static void init_symmetry();
+
     // Lookup functions
     static int lookup(const cubepos& cp);                    // From cubepos
     static int lookup(const permcube& pc);                  // From permcube
+    static int lookup(const permcube& pc, int parentdist);  // Child of a position at parentdist
 
     // Solving functions using IDA* with pruning table
     // Returns move sequence or empty if unsolvable within maxlen
@@ -49,17 +69,37 @@ public:
     }
     // Core IDA* solver: recurses with depth limit, building solution backwards
     static int solve(const permcube& pc, int togo, int canonstate, moveseq& seq);
+    // Allocation-free IDA*: writes at most maxlen moves into out[] and returns
+    // the solution length, or -1 if none fits. Used on the TwophaseSolver hot path.
+    // dist is lookup(pc) if the caller already has it, or -1.
+    static int solve(const permcube& pc, int maxlen, unsigned char* out, int dist = -1);
 
     // Table generation and I/O
     static void gen_table();   // Builds table from scratch using iterative deepening
     static int read_table();   // Loads from disk with checksum verification
     static void write_table(); // Saves table and checksum to disk
 
+    // Compact (2 bits per entry) table I/O
+    static void pack_compact_table();  // Repack the nibble table in mem
+    static int read_compact_table();
+    static void write_compact_table();
+
+    // Compressed artifacts (zlib, headered) as produced by --make-tables.
+    // read_artifact() loads data2z.dat in the full format; compact tables
+    // are read from data2c.dat whether compressed or not.
+    static int read_artifact();
+    static void write_artifact();  // Writes the table for the current mode
+
     // Static data
-    static int cornermax;                         // Number of reduced corner states
+    static TABLE_CONST int cornermax;             // Number of reduced corner states
+    static TABLE_CONST corner_reduce corner_reduction[FACT8];
+    static TABLE_CONST lookup_type edgeud_remap[CUBE_SYMM][FACT8];  // UD edge coordinate under each symmetry
     static unsigned int memsize;                  // Total bytes allocated
     static unsigned int* mem;                     // Pruning table data
     static const char* const filename;            // "data2.dat"
+    static const char* const compact_filename;    // "data2c.dat"
+    static const char* const artifact_filename;   // "data2z.dat"
+    static int compact;                           // Use the 2-bit table (set before init)
     static int file_checksum;                     // Checksum for verification
 };
 
@@ -1,9 +1,16 @@
 #include "twophase_solver.h"
 #include "phase1.h"
 #include "phase2.h"
+#include "optimal.h"
+#include "verify.h"
+#include "table_build.h"
 
+#include <chrono>
+#include <cstdlib>
+#include <cstring>
 #include <iostream>
 #include <string>
+#include <unistd.h>
 
 using namespace std;
 
@@ -40,24 +47,483 @@ using namespace std;
 //   4. Create solver and call solve()
 //   5. Output the move sequence to stdout
 //
+// OPTIONS:
+//   --target N   Stop at the first solution of at most N moves (default 45)
+//   --bench N    Solve N random positions and report phase 1 leaves/second
+//                instead of reading stdin. Use with a tight --target so the
+//                search actually has to work.
+//   --hugepages  Back the phase 1 table with huge pages (fewer TLB misses)
+//   --compact    Use 2-bit mod 3 pruning tables (data1c.dat/data2c.dat);
+//                about 15x less memory, more work per lookup
+//   --full       Use the original tables (default unless built COMPACT=1)
+//   --binary     Binary protocol for batch use: read 20-byte records (the
+//                cubepos c[8] then e[12] cubie values) from stdin until EOF;
+//                for each, write one length byte followed by that many move
+//                indices (face * 3 + twist - 1). A length of 255 means the
+//                record was not a solvable position. Output is flushed
+//                after every answer.
+//   --make-tables  Load or generate the tables for the selected mode, write
+//                them as zlib artifacts (data1z.dat/data2z.dat, or the
+//                compact files with --compact) and exit. Used by make tables.
+//   --build-tables  Load or generate the tables for the selected mode and
+//                exit. Generation prints "[phaseN:done/total entries, ETA Ts]"
+//                lines and checkpoints completed BFS depths to <table>.part,
+//                so an interrupted build resumes where it stopped. Tables
+//                are always written to a temporary file and renamed.
+//   --check-tables  Load the tables for the selected mode, verifying their
+//                checksums, and exit; status 10 if one is missing or bad
+//                (nothing is generated or written).
+//   --optimal    Find a shortest solution with OptimalSolver (optimal.h)
+//                instead of the two-phase search; uses data3.dat only, and
+//                applies to stdin, --binary, --bench and the table options.
+//                Random states (mostly 17-18 moves) take minutes each.
+//   --threads N  Worker threads for --optimal and --verify (default: one
+//                per CPU)
+//   --verify     Check solutions instead of solving: read records of a
+//                20-byte cubepos, a length byte and that many solving move
+//                indices from stdin until EOF, and write one byte per record
+//                (1 solved, 0 not, 255 malformed; see verify.h). Needs no
+//                pruning tables. With --bench N, checks N generated records
+//                with the SIMD and the scalar kernel and reports records/s.
+//   --trajectory Solve every prefix of move sequences: read records of a
+//                20-byte cubepos, a 2-byte little-endian move count n and n
+//                move indices turned on it in order from stdin until EOF,
+//                and for each write
+//                n + 1 answers in the --binary format (the start position,
+//                then the position after each move), flushed one by one.
+//                Each answer seeds the next: the previous solution with the
+//                move appended is a solution one move longer at most, so
+//                the search only looks for shorter ones and stops once it
+//                finds one a move shorter than the previous answer (the
+//                distance cannot drop by more) or after the --budget. An
+//                unsolvable start or a bad move index answers n + 1 times
+//                255. --target is not used. With --bench N, solves every
+//                prefix of an N-move random walk cold and as a trajectory.
+//   --budget N   Phase 1 leaves handed to phase 2 per --trajectory answer
+//                (default 2000); more finds shorter solutions, slower
+//
 // ============================================================================
 
-int main() {
+static void usage() {
+    cerr << "Usage: twophase [--target N] [--bench N] [--hugepages] [--compact|--full]"
+         << " [--binary] [--make-tables] [--build-tables] [--check-tables]"
+         << " [--optimal] [--threads N] [--verify] [--trajectory] [--budget N]" << endl;
+}
+
+// Solve `count` pseudo-random positions (fixed seed, so runs are comparable)
+// and print throughput of the phase 1 -> phase 2 hand-off.
+static void run_benchmark(int count) {
+    srand(1);
+    TwophaseSolver solver;
+    long long leaves = 0;
+    int total_len = 0;
+    auto start = chrono::steady_clock::now();
+
+    for (int i = 0; i < count; i++) {
+        cubepos cp;
+        for (int j = 0; j < 100; j++)
+            cp.move(rand() % NMOVES);
+        total_len += solver.solve(1, cp).size();
+        leaves += solver.probes();
+    }
+
+    double secs = chrono::duration<double>(chrono::steady_clock::now() - start).count();
+    cout << "positions: " << count << endl;
+    cout << "target: " << target_length << endl;
+    cout << "avg length: " << (count ? (double)total_len / count : 0.0) << endl;
+    cout << "seconds: " << secs << endl;
+    cout << "phase1 leaves: " << leaves << endl;
+    cout << "leaves/s: " << (secs > 0 ? leaves / secs : 0.0) << endl;
+}
+
+// Optimal benchmark corpus: random states, each made by OPTIMAL_BENCH_MOVES
+// random moves (fixed seed, so runs are comparable). Like random states in
+// general they are mostly 17 or 18 moves from solved, the slow case for the
+// optimal search; on one core each takes minutes.
+const int OPTIMAL_BENCH_MOVES = 100;
+
+// Solve the optimal corpus and print one line per position plus totals.
+static void run_optimal_benchmark(int count, int threads) {
+    srand(1);
+    OptimalSolver solver(threads);
+    long long nodes = 0;
+    int total_len = 0;
+    auto start = chrono::steady_clock::now();
+
+    for (int i = 0; i < count; i++) {
+        cubepos cp;
+        for (int j = 0; j < OPTIMAL_BENCH_MOVES; j++)
+            cp.move(rand() % NMOVES);
+        auto t0 = chrono::steady_clock::now();
+        int len = solver.solve(cp).size();
+        double secs = chrono::duration<double>(chrono::steady_clock::now() - t0).count();
+        cout << "position " << i + 1 << ": optimal " << len << " in " << secs
+             << "s, " << solver.nodes() << " nodes" << endl;
+        total_len += len;
+        nodes += solver.nodes();
+    }
+
+    double secs = chrono::duration<double>(chrono::steady_clock::now() - start).count();
+    cout << "positions: " << count << endl;
+    cout << "threads: " << solver.threads << endl;
+    cout << "avg length: " << (count ? (double)total_len / count : 0.0) << endl;
+    cout << "seconds: " << secs << endl;
+    cout << "nodes: " << nodes << endl;
+    cout << "nodes/s: " << (secs > 0 ? nodes / secs : 0.0) << endl;
+}
+
+// Random scramble length of the --verify --bench records
+const int VERIFY_BENCH_MOVES = 25;
+
+// Time one kernel over a --verify buffer and print its line of results.
+static void time_verify(const vector<unsigned char>& data, int threads) {
+    vector<unsigned char> out;
+    auto start = chrono::steady_clock::now();
+    bulk_verify::check_batch(data.data(), data.size(), out, threads);
+    double secs = chrono::duration<double>(chrono::steady_clock::now() - start).count();
+    size_t ok = 0;
+    for (unsigned char r : out)
+        ok += r == VERIFY_OK;
+    cout << bulk_verify::kernel() << ": " << out.size() << " records in " << secs << "s, "
+         << (secs > 0 ? out.size() / secs : 0.0) << " records/s, " << ok << " ok, "
+         << out.size() - ok << " not" << endl;
+}
+
+// Check `count` random scrambles against their inverses (every 1000th with
+// its last move dropped, so it must fail) with the SIMD kernel, if any, and
+// the scalar one.
+static void run_verify_benchmark(int count, int threads) {
+    srand(1);
+    vector<unsigned char> data;
+    for (int i = 0; i < count; i++) {
+        cubepos cp;
+        moveseq scramble;
+        for (int j = 0; j < VERIFY_BENCH_MOVES; j++) {
+            scramble.push_back(rand() % NMOVES);
+            cp.move(scramble.back());
+        }
+        moveseq solution = cubepos::invert_sequence(scramble);
+        if (i % 1000 == 999)
+            solution.pop_back();
+        data.insert(data.end(), cp.c, cp.c + 8);
+        data.insert(data.end(), cp.e, cp.e + 12);
+        data.push_back((unsigned char)solution.size());
+        for (int mv : solution)
+            data.push_back((unsigned char)mv);
+    }
+    cout << "expected: " << count - count / 1000 << " ok, " << count / 1000 << " not" << endl;
+    bulk_verify::init();
+    if (strcmp(bulk_verify::kernel(), "scalar") != 0)
+        time_verify(data, threads);
+    bulk_verify::allow_simd = 0;
+    bulk_verify::init();
+    time_verify(data, threads);
+}
+
+// Answer --verify records from stdin until EOF. Whatever has arrived is
+// checked and answered at once, so the answers stream back.
+static void run_verify(int threads) {
+    const size_t CHUNK = 1 << 22;
+    vector<unsigned char> buf(CHUNK), out;
+    size_t have = 0;
+    while (true) {
+        ssize_t got = read(0, &buf[have], CHUNK - have);
+        if (got <= 0)
+            break;
+        have += got;
+        out.clear();
+        size_t used = bulk_verify::check_batch(buf.data(), have, out, threads);
+        cout.write((const char*)out.data(), out.size());
+        memmove(&buf[0], &buf[used], have - used);
+        have -= used;
+    }
+}
+
+const unsigned char BINARY_BAD_STATE = 255;   // Length byte for rejected records
+
+// Check a raw cubepos for legal cubie values, a permutation of each kind,
+// zero total twist and flip, and matching corner/edge permutation parity.
+static int is_solvable(const cubepos& cp) {
+    int seen = 0, twist = 0, flip = 0, parity = 0;
+    for (int i = 0; i < 8; i++) {
+        if (cp.c[i] >= CUBIES || (seen & (1 << cubepos::corner_perm(cp.c[i]))))
+            return 0;
+        seen |= 1 << cubepos::corner_perm(cp.c[i]);
+        twist += cubepos::corner_ori(cp.c[i]);
+        for (int j = 0; j < i; j++)
+            parity ^= cubepos::corner_perm(cp.c[j]) > cubepos::corner_perm(cp.c[i]);
+    }
+    seen = 0;
+    for (int i = 0; i < 12; i++) {
+        if (cp.e[i] >= CUBIES || (seen & (1 << cubepos::edge_perm(cp.e[i]))))
+            return 0;
+        seen |= 1 << cubepos::edge_perm(cp.e[i]);
+        flip += cubepos::edge_ori(cp.e[i]);
+        for (int j = 0; j < i; j++)
+            parity ^= cubepos::edge_perm(cp.e[j]) > cubepos::edge_perm(cp.e[i]);
+    }
+    return twist % 3 == 0 && flip % 2 == 0 && parity == 0;
+}
+
+// Answer binary records from stdin until EOF (see --binary above).
+static void run_binary(int optimal_mode, int threads) {
+    TwophaseSolver solver;
+    OptimalSolver optimal_solver(threads);
+    cubepos cp;
+    unsigned char out[256];
+
+    while (cin.read((char*)cp.c, sizeof(cp.c)) && cin.read((char*)cp.e, sizeof(cp.e))) {
+        int len = 0;
+        if (is_solvable(cp)) {
+            moveseq sol = optimal_mode ? optimal_solver.solve(cp) : solver.solve(1, cp);
+            for (unsigned int i = 0; i < sol.size(); i++)
+                out[1 + len++] = (unsigned char)sol[i];
+            out[0] = (unsigned char)len;
+        } else {
+            out[0] = BINARY_BAD_STATE;
+        }
+        cout.write((const char*)out, 1 + len);
+    }
+}
+
+// Phase 1 leaves per --trajectory answer unless --budget is given
+const long long TRAJECTORY_BUDGET = 2000;
+
+// Append mv to a move sequence, merging it into an earlier turn of the same
+// face (past a turn of the opposite face, which commutes with it)
+static void append_move(moveseq& seq, int mv) {
+    int face = mv / TWISTS;
+    int k = (int)seq.size() - 1;
+    if (k >= 0 && seq[k] / TWISTS == (face + 3) % FACES)
+        k--;
+    if (k < 0 || seq[k] / TWISTS != face) {
+        seq.push_back(mv);
+        return;
+    }
+    int quarters = (seq[k] % TWISTS + mv % TWISTS + 2) % 4;
+    if (quarters == 0)
+        seq.erase(seq.begin() + k);
+    else
+        seq[k] = face * TWISTS + quarters - 1;
+}
+
+// Answer every prefix of moves[0..count) turned on cp, calling emit with
+// each solution in order; returns the phase 1 leaves searched. The start
+// position's first solution is improved for the whole budget, every later
+// position is seeded with its predecessor's answer.
+template <class Emit>
+static long long solve_trajectory(TwophaseSolver& solver, cubepos cp, const unsigned char* moves,
+                                  int count, long long budget, Emit emit) {
+    moveseq sol = solver.solve(1, cp);
+    long long leaves = solver.probes();
+    sol = solver.solve_seeded(cp, sol, 0, budget);
+    leaves += solver.probes();
+    for (int i = 0; ; i++) {
+        emit(sol);
+        if (i == count)
+            break;
+        int previous = (int)sol.size();
+        cp.move(moves[i]);
+        append_move(sol, moves[i]);
+        sol = solver.solve_seeded(cp, sol, previous - 1, budget);
+        leaves += solver.probes();
+    }
+    return leaves;
+}
+
+// Answer --trajectory records from stdin until EOF (see --trajectory above).
+static void run_trajectory(long long budget) {
+    TwophaseSolver solver;
+    cubepos cp;
+    unsigned char header[2], out[256];
+    vector<unsigned char> moves;
+    auto emit = [&](const moveseq& sol) {
+        out[0] = (unsigned char)sol.size();
+        for (unsigned int i = 0; i < sol.size(); i++)
+            out[1 + i] = (unsigned char)sol[i];
+        cout.write((const char*)out, 1 + sol.size());
+    };
+    while (cin.read((char*)cp.c, sizeof(cp.c)) && cin.read((char*)cp.e, sizeof(cp.e)) &&
+           cin.read((char*)header, 2)) {
+        int count = header[0] | header[1] << 8;
+        moves.resize(count);
+        if (!cin.read((char*)moves.data(), count))
+            break;
+        int valid = is_solvable(cp);
+        for (int i = 0; i < count; i++)
+            valid = valid && moves[i] < NMOVES;
+        if (valid) {
+            solve_trajectory(solver, cp, moves.data(), count, budget, emit);
+        } else {
+            for (int i = 0; i <= count; i++)
+                cout.put((char)BINARY_BAD_STATE);
+        }
+    }
+}
+
+// Answer every prefix of a `count`-move random walk (fixed seed) cold, as
+// --binary would, cold with the budget, and as one trajectory, and print
+// the work and average length of each.
+static void run_trajectory_benchmark(int count, long long budget) {
+    srand(1);
+    cubepos start;
+    for (int j = 0; j < 100; j++)
+        start.move(rand() % NMOVES);
+    vector<unsigned char> walk;
+    for (int i = 0; i < count; i++)
+        walk.push_back((unsigned char)(rand() % NMOVES));
+
+    TwophaseSolver solver;
+    for (int mode = 0; mode < 3; mode++) {
+        long long leaves = 0;
+        long long total_len = 0;
+        auto t0 = chrono::steady_clock::now();
+        if (mode < 2) {
+            cubepos cp = start;
+            for (int i = 0; i <= count; i++) {
+                if (i > 0)
+                    cp.move(walk[i - 1]);
+                moveseq sol = solver.solve(1, cp);
+                leaves += solver.probes();
+                if (mode == 1) {
+                    sol = solver.solve_seeded(cp, sol, 0, budget);
+                    leaves += solver.probes();
+                }
+                total_len += sol.size();
+            }
+        } else {
+            leaves = solve_trajectory(solver, start, walk.data(), count, budget,
+                                      [&](const moveseq& sol) { total_len += sol.size(); });
+        }
+        double secs = chrono::duration<double>(chrono::steady_clock::now() - t0).count();
+        const char* names[] = {"cold", "cold+budget", "trajectory"};
+        cout << names[mode] << ": " << count + 1 << " positions in " << secs << "s, "
+             << leaves << " phase1 leaves, avg length "
+             << (double)total_len / (count + 1) << endl;
+    }
+}
+
+int main(int argc, char* argv[]) {
     // Optimization: Disable C++ stdio synchronization with C stdio for faster I/O
     // Since we use only C++ streams, this avoids unnecessary flushing overhead
     ios::sync_with_stdio(false);
     cout.setf(ios::unitbuf);  // Enable unbuffered output for immediate results
+
+    int bench_count = 0;
+    int make_tables = 0;
+    int binary = 0;
+    int optimal_mode = 0;
+    int threads = 0;
+    int verify = 0;
+    int trajectory = 0;
+    long long budget = TRAJECTORY_BUDGET;
+    for (int i = 1; i < argc; i++) {
+        if (strcmp(argv[i], "--target") == 0 && i + 1 < argc) {
+            target_length = atoi(argv[++i]);
+        } else if (strcmp(argv[i], "--bench") == 0 && i + 1 < argc) {
+            bench_count = atoi(argv[++i]);
+        } else if (strcmp(argv[i], "--hugepages") == 0) {
+            phase1::use_hugepages = 1;
+        } else if (strcmp(argv[i], "--compact") == 0) {
+            phase1::compact = phase2::compact = 1;
+        } else if (strcmp(argv[i], "--full") == 0) {
+            phase1::compact = phase2::compact = 0;
+        } else if (strcmp(argv[i], "--binary") == 0) {
+            binary = 1;
+        } else if (strcmp(argv[i], "--make-tables") == 0) {
+            make_tables = 1;
+        } else if (strcmp(argv[i], "--build-tables") == 0) {
+            build_checkpoint::enabled = 1;
+        } else if (strcmp(argv[i], "--check-tables") == 0) {
+            generate_tables = 0;
+        } else if (strcmp(argv[i], "--optimal") == 0) {
+            optimal_mode = 1;
+        } else if (strcmp(argv[i], "--threads") == 0 && i + 1 < argc) {
+            threads = atoi(argv[++i]);
+        } else if (strcmp(argv[i], "--verify") == 0) {
+            verify = 1;
+        } else if (strcmp(argv[i], "--trajectory") == 0) {
+            trajectory = 1;
+        } else if (strcmp(argv[i], "--budget") == 0 && i + 1 < argc) {
+            budget = atoll(argv[++i]);
+        } else {
+            usage();
+            return 1;
+        }
+    }
     
+    // Trajectories use the two-phase search and its tables
+    if (trajectory && optimal_mode) {
+        usage();
+        return 1;
+    }
+
+    // Verification only turns moves, so it needs none of the tables
+    if (verify) {
+        if (bench_count > 0)
+            run_verify_benchmark(bench_count, threads);
+        else
+            run_verify(threads);
+        return 0;
+    }
+
     // STEP 1: Initialize all pruning tables
+    // The optimal solver needs only data3.dat. It stays raw so it can be
+    // mapped, so --make-tables just builds it like --build-tables.
+    if (optimal_mode) {
+        optimal::init(skipwrite || !generate_tables);
+        if (make_tables || build_checkpoint::enabled || !generate_tables) {
+            cout << "Tables ready (optimal)" << endl;
+            return 0;
+        }
+    }
+
     // phase1::init() builds or loads the Phase 1 pruning table (data1.dat)
     // This table stores minimum distances for G1 (Kociemba subgroup) positions
     // Takes ~30 seconds first time, then loads from disk in <1 second
-    phase1::init(skipwrite);
+    // With --make-tables only the compressed artifacts are written.
+    if (!optimal_mode)
+        phase1::init(skipwrite || make_tables || !generate_tables);
     
     // phase2::init() builds or loads the Phase 2 pruning table (data2.dat)
     // This table stores minimum distances for G0 (permutation) coordinates
     // Takes ~60 seconds first time, then loads from disk in ~2 seconds
-    phase2::init(skipwrite);
+    if (!optimal_mode)
+        phase2::init(skipwrite || make_tables || !generate_tables);
+
+    if (make_tables) {
+        phase1::write_artifact();
+        phase2::write_artifact();
+        cout << "Wrote " << (phase1::compact ? phase1::compact_filename : phase1::artifact_filename)
+             << " and " << (phase2::compact ? phase2::compact_filename : phase2::artifact_filename)
+             << endl;
+        return 0;
+    }
+
+    if (build_checkpoint::enabled || !generate_tables) {
+        cout << "Tables ready (" << (phase1::compact ? "compact" : "full") << ")" << endl;
+        return 0;
+    }
+
+    if (bench_count > 0) {
+        if (trajectory)
+            run_trajectory_benchmark(bench_count, budget);
+        else if (optimal_mode)
+            run_optimal_benchmark(bench_count, threads);
+        else
+            run_benchmark(bench_count);
+        return 0;
+    }
+
+    if (trajectory) {
+        run_trajectory(budget);
+        return 0;
+    }
+
+    if (binary) {
+        run_binary(optimal_mode, threads);
+        return 0;
+    }
 
     // STEP 2: Read the cube state from standard input
     // Expected format: Singmaster notation with 20 cubie positions
@@ -76,9 +542,21 @@ int main() {
         return 1;
     }
 
+    if (optimal_mode) {
+        // An unsolvable position would make the search run through every
+        // depth up to OPTIMAL_MAXLEN before failing
+        if (!is_solvable(cube_state)) {
+            cerr << "Error: position is not solvable" << endl;
+            return 1;
+        }
+        OptimalSolver solver(threads);
+        display_solution(solver.solve(cube_state));
+        return 0;
+    }
+
     // Create a solver instance and solve the cube
     TwophaseSolver solver;
-    solver.solve(1, cube_state);
+    display_solution(solver.solve(1, cube_state));
 
     return 0;
 }
@@ -0,0 +1,130 @@
+#include "table_build.h"
+#include "table_io.h"
+#include <iostream>
+#include <cstdio>
+#include <string>
+
+/*
+===============================================================================
+ TABLE_BUILD.CPP - PROGRESS AND CHECKPOINTS FOR PRUNING TABLE GENERATION
+===============================================================================
+
+CHECKPOINT FILE:
+    A checkpoint_header followed by the raw table buffer. The checksum is
+    the datahash of the buffer, as for the tables themselves; a checkpoint
+    for another buffer size (another table mode) or with a bad checksum is
+    ignored and the build starts from scratch.
+*/
+
+using namespace std;
+using namespace std::chrono;
+
+const int CHECKPOINT_MAGIC = 0x4b435054;   // "TPCK" when read as little-endian bytes
+
+struct checkpoint_header {
+    int magic;             // CHECKPOINT_MAGIC
+    int version;           // TABLE_VERSION
+    unsigned int bytes;    // Buffer size
+    int depth;             // Last completed BFS depth
+    unsigned int seen;     // Entries with a known distance
+    unsigned int done;     // Progress count (see build_progress)
+    int checksum;          // datahash of the buffer
+};
+
+int generate_tables = 1;
+int build_checkpoint::enabled = 0;
+
+static steady_clock::time_point last_save = steady_clock::now();
+
+static string checkpoint_name(const char* table) {
+    return string(table) + ".part";
+}
+
+build_progress::build_progress(const char* name, unsigned long long total,
+                               unsigned long long done)
+    : name(name), total(total), start_done(done),
+      start(steady_clock::now()), last_print(start) {
+    print(done, -1);
+}
+
+void build_progress::update(unsigned long long done) {
+    steady_clock::time_point now = steady_clock::now();
+    if (now - last_print < seconds(1))
+        return;
+    last_print = now;
+    double elapsed = duration<double>(now - start).count();
+    double rate = (done - start_done) / elapsed;
+    print(done, rate > 0 ? (total - done) / rate : -1);
+}
+
+void build_progress::finish() {
+    print(total, 0);
+}
+
+// An ETA of -1 is not known yet (nothing measured since the start).
+void build_progress::print(unsigned long long done, double eta) {
+    cout << "[" << name << ":" << done << "/" << total << " entries, ETA ";
+    if (eta < 0)
+        cout << "?";
+    else
+        cout << (long long)(eta + 0.5) << "s";
+    cout << "]" << endl << flush;
+}
+
+int build_checkpoint::load(const char* table, void* mem, unsigned int memsize,
+                           int& depth, unsigned int& seen, unsigned int& done) {
+    string name = checkpoint_name(table);
+    FILE* f = fopen(name.c_str(), "rb");
+    if (f == 0)
+        return 0;
+
+    checkpoint_header hdr;
+    int ok = fread(&hdr, sizeof(hdr), 1, f) == 1 && hdr.magic == CHECKPOINT_MAGIC &&
+             hdr.version == TABLE_VERSION && hdr.bytes == memsize &&
+             fread(mem, 1, memsize, f) == memsize;
+    fclose(f);
+    if (!ok || hdr.checksum != datahash((unsigned int*)mem, memsize, 0)) {
+        cerr << "Ignoring unusable checkpoint " << name << endl;
+        return 0;
+    }
+    depth = hdr.depth;
+    seen = hdr.seen;
+    done = hdr.done;
+    cout << "Resuming " << table << " after depth " << depth << endl << flush;
+    return 1;
+}
+
+void build_checkpoint::save(const char* table, const void* mem, unsigned int memsize,
+                            int depth, unsigned int seen, unsigned int done) {
+    if (!enabled || steady_clock::now() - last_save < duration<double>(CHECKPOINT_INTERVAL))
+        return;
+
+    checkpoint_header hdr;
+    hdr.magic = CHECKPOINT_MAGIC;
+    hdr.version = TABLE_VERSION;
+    hdr.bytes = memsize;
+    hdr.depth = depth;
+    hdr.seen = seen;
+    hdr.done = done;
+    hdr.checksum = datahash((unsigned int*)mem, memsize, 0);
+
+    string name = checkpoint_name(table);
+    string temp = table_temp_name(name.c_str());
+    FILE* f = fopen(temp.c_str(), "wb");
+    int ok = f != 0 && fwrite(&hdr, sizeof(hdr), 1, f) == 1 &&
+             fwrite(mem, 1, memsize, f) == memsize;
+    if (f != 0 && fclose(f) != 0)
+        ok = 0;
+    if (!ok) {
+        // A build without checkpoints still finishes; just say so
+        cerr << "Could not write checkpoint " << name << endl;
+        std::remove(temp.c_str());
+        return;
+    }
+    commit_table_file(temp, name.c_str());
+    last_save = steady_clock::now();
+}
+
+void build_checkpoint::remove(const char* table) {
+    std::remove(checkpoint_name(table).c_str());
+}
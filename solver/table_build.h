@@ -0,0 +1,84 @@
+#ifndef TABLE_BUILD_H
+#define TABLE_BUILD_H
+
+#include <chrono>
+
+// ============================================================================
+// TABLE_BUILD - PROGRESS AND CHECKPOINTS FOR PRUNING TABLE GENERATION
+// ============================================================================
+//
+// PURPOSE:
+//   Generating the pruning tables is a breadth-first search that runs one
+//   full sweep of the table per depth. Sweeps vary wildly in cost (the
+//   middle depths do nearly all the work), so reporting "depth d of 14"
+//   made progress jump. build_progress instead counts entries processed
+//   and prints a rate-based ETA at most once a second:
+//
+//       [phase1:48213408/170311680 entries, ETA 83s]
+//
+//   Each BFS counts what tracks its running time. Phase 1 time goes into
+//   generating the neighbours of frontier entries, and every entry is a
+//   frontier entry exactly once, so it counts entries expanded. Phase 2
+//   sweeps the whole table at every depth, and counts entries whose
+//   distance is known; a small share of its (symmetry-padded) slots is
+//   never reached. Either way the last line of a table is done == total.
+//
+// CHECKPOINTS:
+//   With checkpoints enabled (twophase --build-tables), the BFS state is
+//   saved as <table>.part after each completed depth: the depth, the
+//   entry counts and the raw table buffer, with a checksum. A
+//   later build that finds a valid checkpoint for the same buffer size
+//   resumes after that depth instead of starting over. Depths finishing
+//   less than CHECKPOINT_INTERVAL seconds after the previous checkpoint are
+//   not saved; the early depths take milliseconds, and writing a 680MB
+//   buffer after each of them would cost more than redoing them.
+//   Checkpoints are always written to a temporary file and renamed, so an
+//   interruption leaves the previous checkpoint intact.
+//
+// ============================================================================
+
+// Cleared by twophase --check-tables: a table that has to be generated is
+// then an error, since the caller only wanted to know whether they load.
+extern int generate_tables;
+
+const double CHECKPOINT_INTERVAL = 10.0;   // Seconds between checkpoints at the least
+
+// Counts processed entries of one table and prints them with an ETA.
+class build_progress {
+public:
+    // done is where a resumed build starts; the ETA only uses the rate
+    // measured since then.
+    build_progress(const char* name, unsigned long long total, unsigned long long done = 0);
+
+    void update(unsigned long long done);   // Prints if a second has passed
+    void finish();                          // Prints done == total
+
+private:
+    void print(unsigned long long done, double eta);
+
+    const char* name;
+    unsigned long long total, start_done;
+    std::chrono::steady_clock::time_point start, last_print;
+};
+
+// Save/restore of a BFS in progress; see CHECKPOINTS above.
+class build_checkpoint {
+public:
+    static int enabled;   // Set by --build-tables; off for implicit builds
+
+    // Restore the checkpoint for table into mem. Returns 1 and sets depth
+    // (the last completed depth), seen (entries with a distance) and done
+    // (the progress count) if a valid one exists.
+    static int load(const char* table, void* mem, unsigned int memsize,
+                    int& depth, unsigned int& seen, unsigned int& done);
+
+    // Save the state after depth, unless checkpoints are disabled or the
+    // previous save was less than CHECKPOINT_INTERVAL seconds ago.
+    static void save(const char* table, const void* mem, unsigned int memsize,
+                     int depth, unsigned int seen, unsigned int done);
+
+    // Delete the checkpoint once the finished table is in place.
+    static void remove(const char* table);
+};
+
+#endif
@@ -0,0 +1,276 @@
+#include "table_io.h"
+#include <iostream>
+#include <cstdio>
+#include <fcntl.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
+#include <unistd.h>
+#include <zlib.h>
+
+/*
+===============================================================================
+ TABLE_IO.CPP - VERSIONED PRUNING TABLE FILES
+===============================================================================
+
+PURPOSE:
+    Shared reader/writer for headered pruning table files. The payload is
+    streamed in TABLE_CHUNKSIZE pieces, hashed as it arrives, and followed
+    by the same datahash checksum the legacy files use.
+
+COMPRESSED PAYLOADS:
+    - Written with deflate, reading TABLE_CHUNKSIZE bytes of the table at a
+      time and flushing each output chunk to disk
+    - Read by inflating straight into the caller's table buffer, one
+      TABLE_CHUNKSIZE window at a time, so hashing sees the same chunks as
+      a raw read; only a small input buffer is allocated
+    - The checksum follows the deflate stream; any input read past the end
+      of the stream is given back with fseek
+
+MAPPED TABLES:
+    - map_table_file() maps a raw table read-only instead of copying it;
+      the pages are shared through the page cache by every process using
+      the table, and the checksum pass faults them in once
+
+NOTES:
+    - A header mismatch (older version, other format, other table size) is
+      reported and treated like a missing file, so the caller regenerates
+*/
+
+using namespace std;
+
+table_header make_table_header(int format, int bits, unsigned int d0, unsigned int d1,
+                               unsigned int d2, unsigned int bytes) {
+    table_header hdr;
+    hdr.magic = TABLE_MAGIC;
+    hdr.version = TABLE_VERSION;
+    hdr.format = format;
+    hdr.bits = bits;
+    hdr.compression = TABLE_RAW;
+    hdr.dims[0] = d0;
+    hdr.dims[1] = d1;
+    hdr.dims[2] = d2;
+    hdr.entries = d0 * d1 * d2;
+    hdr.bytes = bytes;
+    return hdr;
+}
+
+// Read memsize raw bytes into mem, returning the running datahash.
+static int read_raw(FILE* f, unsigned char* p, unsigned int togo, int& seed) {
+    while (togo > 0) {
+        unsigned int siz = (togo > (unsigned int)TABLE_CHUNKSIZE ? TABLE_CHUNKSIZE : togo);
+        if (fread(p, 1, siz, f) != siz)
+            return 0;
+        seed = datahash((unsigned int*)p, siz, seed);
+        togo -= siz;
+        p += siz;
+    }
+    return 1;
+}
+
+// Inflate a zlib stream into mem, one output chunk at a time.
+static int read_zlib(FILE* f, unsigned char* p, unsigned int togo, int& seed) {
+    z_stream strm;
+    strm.zalloc = Z_NULL;
+    strm.zfree = Z_NULL;
+    strm.opaque = Z_NULL;
+    strm.avail_in = 0;
+    strm.next_in = Z_NULL;
+    if (inflateInit(&strm) != Z_OK)
+        return 0;
+
+    unsigned char* in = new unsigned char[TABLE_CHUNKSIZE];
+    int ret = Z_OK;
+
+    while (togo > 0 && ret != Z_STREAM_END) {
+        unsigned int siz = (togo > (unsigned int)TABLE_CHUNKSIZE ? TABLE_CHUNKSIZE : togo);
+        strm.next_out = p;
+        strm.avail_out = siz;
+        while (strm.avail_out > 0) {
+            if (strm.avail_in == 0) {
+                strm.avail_in = fread(in, 1, TABLE_CHUNKSIZE, f);
+                strm.next_in = in;
+                if (strm.avail_in == 0)
+                    break;
+            }
+            ret = inflate(&strm, Z_NO_FLUSH);
+            if (ret != Z_OK)
+                break;
+        }
+        if (strm.avail_out != 0)
+            break;
+        seed = datahash((unsigned int*)p, siz, seed);
+        togo -= siz;
+        p += siz;
+    }
+
+    // The table is full, but inflate may not have consumed the stream
+    // trailer yet. Run it to Z_STREAM_END; any further output is an error.
+    unsigned char extra;
+    while (togo == 0 && ret == Z_OK) {
+        if (strm.avail_in == 0) {
+            strm.avail_in = fread(in, 1, TABLE_CHUNKSIZE, f);
+            strm.next_in = in;
+            if (strm.avail_in == 0)
+                break;
+        }
+        strm.next_out = &extra;
+        strm.avail_out = 1;
+        ret = inflate(&strm, Z_NO_FLUSH);
+        if (strm.avail_out == 0)
+            ret = Z_DATA_ERROR;
+    }
+
+    // Hand back whatever was read beyond the compressed stream (the
+    // checksum, usually) so the caller's next fread sees it.
+    if (strm.avail_in > 0)
+        fseek(f, -(long)strm.avail_in, SEEK_CUR);
+
+    inflateEnd(&strm);
+    delete[] in;
+    return togo == 0 && ret == Z_STREAM_END;
+}
+
+// Everything but the compression, which the caller checks.
+static int header_matches(const table_header& hdr, const table_header& expect,
+                          unsigned int memsize) {
+    return hdr.magic == expect.magic && hdr.version == expect.version &&
+           hdr.format == expect.format && hdr.bits == expect.bits &&
+           hdr.dims[0] == expect.dims[0] && hdr.dims[1] == expect.dims[1] &&
+           hdr.dims[2] == expect.dims[2] && hdr.entries == expect.entries &&
+           hdr.bytes == memsize;
+}
+
+int read_table_file(const char* filename, const table_header& expect,
+                    void* mem, unsigned int memsize, int& checksum) {
+    FILE* f = fopen(filename, "rb");
+    if (f == 0)
+        return 0;
+
+    table_header hdr;
+    if (fread(&hdr, sizeof(hdr), 1, f) != 1) {
+        cerr << "Out of data in " << filename << endl;
+        fclose(f);
+        return 0;
+    }
+    if (!header_matches(hdr, expect, memsize) ||
+        (hdr.compression != TABLE_RAW && hdr.compression != TABLE_ZLIB)) {
+        cerr << "Unexpected table header in " << filename << endl;
+        fclose(f);
+        return 0;
+    }
+
+    int seed = 0;
+    int ok;
+    if (hdr.compression == TABLE_ZLIB)
+        ok = read_zlib(f, (unsigned char*)mem, memsize, seed);
+    else
+        ok = read_raw(f, (unsigned char*)mem, memsize, seed);
+
+    if (!ok || fread(&checksum, sizeof(int), 1, f) != 1) {
+        cerr << "Out of data in " << filename << endl;
+        fclose(f);
+        return 0;
+    }
+    fclose(f);
+
+    if (checksum != seed) {
+        cerr << "Bad checksum in " << filename << endl;
+        return 0;
+    }
+    return 1;
+}
+
+const unsigned char* map_table_file(const char* filename, const table_header& expect,
+                                    unsigned int memsize, int& checksum) {
+    int fd = open(filename, O_RDONLY);
+    if (fd < 0)
+        return 0;
+    struct stat st;
+    size_t size = sizeof(table_header) + memsize + sizeof(int);
+    if (fstat(fd, &st) != 0 || (size_t)st.st_size != size) {
+        cerr << "Unexpected size of " << filename << endl;
+        close(fd);
+        return 0;
+    }
+    void* p = mmap(0, size, PROT_READ, MAP_SHARED, fd, 0);
+    close(fd);
+    if (p == MAP_FAILED) {
+        cerr << "Cannot map " << filename << endl;
+        return 0;
+    }
+
+    const unsigned char* base = (const unsigned char*)p;
+    const table_header& hdr = *(const table_header*)base;
+    const unsigned char* payload = base + sizeof(table_header);
+    memcpy(&checksum, payload + memsize, sizeof(int));
+    if (!header_matches(hdr, expect, memsize) || hdr.compression != TABLE_RAW) {
+        cerr << "Unexpected table header in " << filename << endl;
+    } else if (checksum != datahash((unsigned int*)payload, memsize, 0)) {
+        cerr << "Bad checksum in " << filename << endl;
+    } else {
+        return payload;
+    }
+    munmap(p, size);
+    return 0;
+}
+
+// Deflate mem to f, feeding and draining TABLE_CHUNKSIZE bytes at a time.
+static void write_zlib(FILE* f, const unsigned char* p, unsigned int togo) {
+    z_stream strm;
+    strm.zalloc = Z_NULL;
+    strm.zfree = Z_NULL;
+    strm.opaque = Z_NULL;
+    if (deflateInit(&strm, Z_BEST_COMPRESSION) != Z_OK)
+        error("! cannot initialize zlib");
+
+    unsigned char* out = new unsigned char[TABLE_CHUNKSIZE];
+    int flush;
+    do {
+        unsigned int siz = (togo > (unsigned int)TABLE_CHUNKSIZE ? TABLE_CHUNKSIZE : togo);
+        strm.next_in = (unsigned char*)p;
+        strm.avail_in = siz;
+        togo -= siz;
+        p += siz;
+        flush = (togo == 0 ? Z_FINISH : Z_NO_FLUSH);
+        do {
+            strm.next_out = out;
+            strm.avail_out = TABLE_CHUNKSIZE;
+            deflate(&strm, flush);
+            unsigned int have = TABLE_CHUNKSIZE - strm.avail_out;
+            if (fwrite(out, 1, have, f) != have)
+                error("! error writing pruning table");
+        } while (strm.avail_out == 0);
+    } while (flush != Z_FINISH);
+
+    deflateEnd(&strm);
+    delete[] out;
+}
+
+string table_temp_name(const char* filename) {
+    return string(filename) + "." + to_string(getpid()) + ".tmp";
+}
+
+void commit_table_file(const string& temp, const char* filename) {
+    if (rename(temp.c_str(), filename) != 0) {
+        remove(temp.c_str());
+        error("! cannot rename pruning table into place");
+    }
+}
+
+void write_table_file(const char* filename, const table_header& hdr,
+                      const void* mem, unsigned int memsize, int checksum) {
+    string temp = table_temp_name(filename);
+    FILE* f = fopen(temp.c_str(), "wb");
+    if (f == 0)
+        error("! cannot write pruning file to current directory");
+    if (fwrite(&hdr, sizeof(hdr), 1, f) != 1)
+        error("! error writing pruning table");
+    if (hdr.compression == TABLE_ZLIB) {
+        write_zlib(f, (const unsigned char*)mem, memsize);
+    } else if (fwrite(mem, 1, memsize, f) != memsize) {
+        error("! error writing pruning table");
+    }
+    if (fwrite(&checksum, sizeof(int), 1, f) != 1 || fclose(f) != 0)
+        error("! error writing pruning table");
+    commit_table_file(temp, filename);
+}
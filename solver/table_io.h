@@ -0,0 +1,128 @@
+#ifndef TABLE_IO_H
+#define TABLE_IO_H
+
+#include "cubepos.h"
+#include <string>
+
+// ============================================================================
+// TABLE_IO - VERSIONED PRUNING TABLE FILES
+// ============================================================================
+//
+// PURPOSE:
+//   The original data1.dat/data2.dat files are raw dumps of the in-memory
+//   table followed by a checksum, with nothing saying what format they hold.
+//   Newer formats start with a table_header so the loader can tell what it
+//   is reading and reject a mismatch instead of misreading the bytes.
+//   Each format uses its own filename, so old and new tables can coexist
+//   in the solver directory.
+//
+// FORMATS:
+//   - TABLE_FULL:    legacy layout (phase1: 4 bytes/entry, phase2: nibbles)
+//   - TABLE_COMPACT: 2 bits/entry holding the distance mod 3; the exact
+//                    distance is recovered from a parent's distance during
+//                    search, or by descending to the goal at the root
+//   - TABLE_EXACT:   4 bits/entry holding the exact distance (the optimal
+//                    solver's table, which is memory-mapped in place)
+//
+// COMPRESSION:
+//   Either format may be stored raw or zlib-deflated (TABLE_ZLIB). The
+//   tables are mostly long runs of the same few values, so deflate shrinks
+//   them several times over. Compressed payloads are inflated chunk by
+//   chunk directly into the table buffer; no full-size temporary is made.
+//   The checksum always covers the uncompressed payload. `make tables`
+//   runs twophase --make-tables to produce compressed artifacts once.
+//
+// ATOMIC WRITES:
+//   Every table file is written under table_temp_name() and renamed into
+//   place by commit_table_file(), so an interrupted write never leaves a
+//   truncated table where a loader (or another solver process) finds it.
+//
+// SELECTION:
+//   Build with -DTWOPHASE_COMPACT=1 (make COMPACT=1) to default to compact
+//   tables, or pass --compact / --full to twophase at run time.
+//
+// ============================================================================
+
+#ifndef TWOPHASE_COMPACT
+#define TWOPHASE_COMPACT 0
+#endif
+
+const int TABLE_MAGIC = 0x42545054;     // "TPTB" when read as little-endian bytes
+const int TABLE_VERSION = 2;            // Bump when the header or payload layout changes
+
+enum table_format {
+    TABLE_FULL = 0,
+    TABLE_COMPACT = 1,
+    TABLE_EXACT = 2
+};
+
+enum table_compression {
+    TABLE_RAW = 0,
+    TABLE_ZLIB = 1
+};
+
+// Fixed-size header written before the table payload.
+struct table_header {
+    int magic;                // TABLE_MAGIC
+    int version;              // TABLE_VERSION
+    int format;               // table_format
+    int bits;                 // Bits per entry
+    int compression;          // table_compression of the payload
+    unsigned int dims[3];     // Coordinate-space sizes (unused dims are 1)
+    unsigned int entries;     // Number of coordinates (product of dims)
+    unsigned int bytes;       // Uncompressed payload size in bytes
+};
+
+// Fill in a raw header for the current version.
+table_header make_table_header(int format, int bits, unsigned int d0, unsigned int d1,
+                               unsigned int d2, unsigned int bytes);
+
+// Load a headered table into mem. Raw and zlib payloads are both accepted;
+// the compression in expect is ignored. Returns 1 on success, 0 if the file
+// is missing, has a different header, is truncated, or fails its checksum.
+int read_table_file(const char* filename, const table_header& expect,
+                    void* mem, unsigned int memsize, int& checksum);
+
+// Map a raw headered table read-only, verifying header, size and checksum.
+// Returns the payload (valid for the life of the process), or 0 if the file
+// is missing, compressed, different or damaged, or cannot be mapped.
+const unsigned char* map_table_file(const char* filename, const table_header& expect,
+                                    unsigned int memsize, int& checksum);
+
+// Write a headered table followed by its checksum, deflating the payload
+// when hdr.compression is TABLE_ZLIB.
+void write_table_file(const char* filename, const table_header& hdr,
+                      const void* mem, unsigned int memsize, int checksum);
+
+// Temporary name for writing filename (unique per process).
+std::string table_temp_name(const char* filename);
+
+// Rename a finished temporary file over filename.
+void commit_table_file(const std::string& temp, const char* filename);
+
+// 2-bit packed entry access for compact tables.
+static inline int get_2bit(const unsigned char* p, unsigned int i) {
+    return (p[i >> 2] >> (2 * (i & 3))) & 3;
+}
+
+static inline void set_2bit(unsigned char* p, unsigned int i, int v) {
+    p[i >> 2] = (p[i >> 2] & ~(3 << (2 * (i & 3)))) | (v << (2 * (i & 3)));
+}
+
+// 4-bit packed entry access for exact tables.
+static inline int get_4bit(const unsigned char* p, unsigned int i) {
+    return (p[i >> 1] >> (4 * (i & 1))) & 15;
+}
+
+static inline void set_4bit(unsigned char* p, unsigned int i, int v) {
+    p[i >> 1] = (p[i >> 1] & ~(15 << (4 * (i & 1)))) | (v << (4 * (i & 1)));
+}
+
+// Change in distance from a parent to a child given both distances mod 3.
+// Neighbouring positions differ by at most one move, so this is exact.
+static inline int mod3_step(int parentdist, int childmod) {
+    static const int delta[3] = {0, 1, -1};
+    return parentdist + delta[(childmod - parentdist % 3 + 3) % 3];
+}
+
+#endif
@@ -0,0 +1,191 @@
+#include "phase2.h"
+
+#include <fstream>
+#include <iostream>
+#include <sstream>
+#include <string>
+#include <vector>
+
+using namespace std;
+
+// ============================================================================
+// TABLEGEN - BUILD-TIME LOOKUP TABLE GENERATOR
+// ============================================================================
+//
+// PURPOSE:
+//   Built with -DTWOPHASE_RUNTIME_TABLES, so cubepos::init(),
+//   CubeSymmetry::init() (with permcube::init()) and phase2::init_symmetry()
+//   compute their tables as they always did. tablegen runs them once and
+//   prints every table as a const array definition; the Makefile saves that
+//   as static_tables.cpp and links it into twophase, whose init() functions
+//   then have nothing left to do. The tables sit in .rodata: no start-up
+//   work, and one copy in the page cache however many solver processes
+//   run.
+//
+// USAGE:
+//   tablegen > static_tables.cpp       Generate the tables
+//   tablegen --check static_tables.cpp Self-check: compare each table in the
+//                                      file with a fresh runtime computation;
+//                                      exit status 1 on any difference
+//
+// ============================================================================
+
+// One generated definition, kept apart so --check can report by table.
+struct table_source {
+    string name;
+    string text;
+};
+
+static vector<table_source> tables;
+
+static void print_value(ostream& out, int v) {
+    out << v;
+}
+
+static void print_value(ostream& out, const corner_mapinfo& cm) {
+    out << "{" << cm.minbits << ", " << (int)cm.csymm << ", " << (int)cm.minmap << "}";
+}
+
+static void print_value(ostream& out, const corner_reduce& cr) {
+    out << "{" << (int)cr.m << ", " << (int)cr.parity << ", " << cr.c << ", " << cr.minbits << "}";
+}
+
+// Emit "const <decl> = {...};" for rows x cols elements starting at data.
+// Rows of a 2-D table get a line (and braces) each; 1-D tables (cols == 0)
+// and rows longer than 32 values are wrapped every 16 values.
+template <class T>
+static void emit(const string& name, const string& decl, const T* data, int rows, int cols = 0) {
+    ostringstream out;
+    out << "const " << decl << " = {\n";
+    if (cols == 0) {
+        for (int i = 0; i < rows; i++) {
+            out << (i % 16 == 0 ? "    " : " ");
+            print_value(out, data[i]);
+            out << (i + 1 < rows ? "," : "") << (i % 16 == 15 || i + 1 == rows ? "\n" : "");
+        }
+    } else {
+        for (int i = 0; i < rows; i++) {
+            out << "    {";
+            for (int j = 0; j < cols; j++) {
+                if (j)
+                    out << (cols > 32 && j % 16 == 0 ? ",\n     " : ", ");
+                print_value(out, data[i * cols + j]);
+            }
+            out << (i + 1 < rows ? "},\n" : "}\n");
+        }
+    }
+    out << "};\n";
+    tables.push_back(table_source{name, out.str()});
+}
+
+template <class T>
+static void emit_scalar(const string& name, const string& decl, T value) {
+    ostringstream out;
+    out << "const " << decl << " = " << value << ";\n";
+    tables.push_back(table_source{name, out.str()});
+}
+
+static void generate() {
+    cubepos::init();
+    CubeSymmetry::init();
+    phase2::init_symmetry();
+
+    emit("corner_ori_inc", "unsigned char cubepos::corner_ori_inc[CUBIES]", cubepos::corner_ori_inc, CUBIES);
+    emit("corner_ori_dec", "unsigned char cubepos::corner_ori_dec[CUBIES]", cubepos::corner_ori_dec, CUBIES);
+    emit("corner_ori_neg_strip", "unsigned char cubepos::corner_ori_neg_strip[CUBIES]",
+         cubepos::corner_ori_neg_strip, CUBIES);
+    emit("mod24", "unsigned char cubepos::mod24[2 * CUBIES]", cubepos::mod24, 2 * CUBIES);
+    emit("edge_trans", "unsigned char cubepos::edge_trans[NMOVES][CUBIES]",
+         &cubepos::edge_trans[0][0], NMOVES, CUBIES);
+    emit("corner_trans", "unsigned char cubepos::corner_trans[NMOVES][CUBIES]",
+         &cubepos::corner_trans[0][0], NMOVES, CUBIES);
+    emit("inv_move", "unsigned char cubepos::inv_move[NMOVES]", cubepos::inv_move, NMOVES);
+    emit("face_map", "unsigned char cubepos::face_map[M][FACES]", &cubepos::face_map[0][0], M, FACES);
+    emit("move_map", "unsigned char cubepos::move_map[M][NMOVES]", &cubepos::move_map[0][0], M, NMOVES);
+    emit("invm", "unsigned char cubepos::invm[M]", cubepos::invm, M);
+    emit("mm", "unsigned char cubepos::mm[M][M]", &cubepos::mm[0][0], M, M);
+    emit("rot_edge", "unsigned char cubepos::rot_edge[M][CUBIES]", &cubepos::rot_edge[0][0], M, CUBIES);
+    emit("rot_corner", "unsigned char cubepos::rot_corner[M][CUBIES]",
+         &cubepos::rot_corner[0][0], M, CUBIES);
+    emit("canon_seq", "unsigned char cubepos::canon_seq[CANONSEQSTATES][NMOVES]",
+         &cubepos::canon_seq[0][0], CANONSEQSTATES, NMOVES);
+    emit("canon_seq_mask", "int cubepos::canon_seq_mask[CANONSEQSTATES]",
+         cubepos::canon_seq_mask, CANONSEQSTATES);
+
+    emit("cornermove", "lookup_type CubeSymmetry::cornermove[CORNERSYMM][NMOVES]",
+         &CubeSymmetry::cornermove[0][0], CORNERSYMM, NMOVES);
+    emit("edgeomove", "lookup_type CubeSymmetry::edgeomove[EDGEOSYMM][NMOVES]",
+         &CubeSymmetry::edgeomove[0][0], EDGEOSYMM, NMOVES);
+    emit("edgepmove", "lookup_type CubeSymmetry::edgepmove[EDGEPERM][NMOVES]",
+         &CubeSymmetry::edgepmove[0][0], EDGEPERM, NMOVES);
+    emit("epsymm_compress", "lookup_type CubeSymmetry::epsymm_compress[1 << 12]",
+         CubeSymmetry::epsymm_compress, 1 << 12);
+    emit("epsymm_expand", "lookup_type CubeSymmetry::epsymm_expand[EDGEOSYMM]",
+         CubeSymmetry::epsymm_expand, EDGEOSYMM);
+    emit("cornersymm_expand", "lookup_type CubeSymmetry::cornersymm_expand[CORNERRSYMM]",
+         CubeSymmetry::cornersymm_expand, CORNERRSYMM);
+    emit("cornersymm", "corner_mapinfo CubeSymmetry::cornersymm[CORNERSYMM]",
+         CubeSymmetry::cornersymm, CORNERSYMM);
+    emit("edgeomap", "lookup_type CubeSymmetry::edgeomap[EDGEOSYMM][CUBE_SYMM]",
+         &CubeSymmetry::edgeomap[0][0], EDGEOSYMM, CUBE_SYMM);
+    emit("edgepmap", "lookup_type CubeSymmetry::edgepmap[EDGEPERM][CUBE_SYMM]",
+         &CubeSymmetry::edgepmap[0][0], EDGEPERM, CUBE_SYMM);
+    emit("edgepxor", "lookup_type CubeSymmetry::edgepxor[EDGEPERM][2]",
+         &CubeSymmetry::edgepxor[0][0], EDGEPERM, 2);
+
+    emit("s4mul", "unsigned char permcube::s4mul[FACT4][FACT4]", &permcube::s4mul[0][0], FACT4, FACT4);
+    emit("s4compress", "unsigned char permcube::s4compress[256]", permcube::s4compress, 256);
+    emit("s4expand", "unsigned char permcube::s4expand[FACT4]", permcube::s4expand, FACT4);
+    emit("c8_4_compact", "unsigned char permcube::c8_4_compact[256]", permcube::c8_4_compact, 256);
+    emit("c8_4_expand", "unsigned char permcube::c8_4_expand[C8_4]", permcube::c8_4_expand, C8_4);
+    emit("c8_4_parity", "unsigned char permcube::c8_4_parity[C8_4]", permcube::c8_4_parity, C8_4);
+    emit("c12_8", "unsigned char permcube::c12_8[EDGEPERM]", permcube::c12_8, EDGEPERM);
+    emit("c8_12", "lookup_type permcube::c8_12[C8_4]", permcube::c8_12, C8_4);
+    emit("eperm_move", "unsigned short permcube::eperm_move[EDGEPERM][NMOVES]",
+         &permcube::eperm_move[0][0], EDGEPERM, NMOVES);
+    emit("cperm_move", "int permcube::cperm_move[C8_4][NMOVES]",
+         &permcube::cperm_move[0][0], C8_4, NMOVES);
+
+    emit_scalar("cornermax", "int phase2::cornermax", phase2::cornermax);
+    emit("corner_reduction", "corner_reduce phase2::corner_reduction[FACT8]",
+         phase2::corner_reduction, FACT8);
+    emit("edgeud_remap", "lookup_type phase2::edgeud_remap[CUBE_SYMM][FACT8]",
+         &phase2::edgeud_remap[0][0], CUBE_SYMM, FACT8);
+}
+
+int main(int argc, char* argv[]) {
+    if (argc == 3 && string(argv[1]) == "--check") {
+        ifstream in(argv[2]);
+        if (!in) {
+            cerr << "Cannot read " << argv[2] << endl;
+            return 1;
+        }
+        stringstream file;
+        file << in.rdbuf();
+        string existing = file.str();
+
+        generate();
+        int bad = 0;
+        for (size_t i = 0; i < tables.size(); i++)
+            if (existing.find(tables[i].text) == string::npos) {
+                cerr << tables[i].name << " differs from the runtime tables" << endl;
+                bad++;
+            }
+        cout << tables.size() - bad << "/" << tables.size() << " tables in " << argv[2]
+             << " match the runtime tables" << endl;
+        return bad ? 1 : 0;
+    }
+    if (argc != 1) {
+        cerr << "Usage: tablegen [--check static_tables.cpp]" << endl;
+        return 1;
+    }
+
+    generate();
+    cout << "// Generated by tablegen from the runtime table code. Do not edit;\n"
+         << "// make regenerates it, and make check-static-tables compares it with\n"
+         << "// the runtime computation.\n\n"
+         << "#include \"phase2.h\"\n";
+    for (size_t i = 0; i < tables.size(); i++)
+        cout << "\n" << tables[i].text;
+    return 0;
+}
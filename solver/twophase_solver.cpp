@@ -26,7 +26,10 @@ ALGORITHM FLOW:
 FUNCTIONS:
     display_solution(): Outputs solution moves to stdout
     cubes_equal_up_to_symmetry(): Checks for state equivalence under symmetry
-    TwophaseSolver::solve(): Main entry, builds orientations and runs search
+    TwophaseSolver::solve(): Main entry, builds orientations and runs search,
+        returns the verified solution
+    TwophaseSolver::solve_seeded(): Search that only looks for solutions
+        shorter than a known one, within a phase 1 leaf budget
     TwophaseSolver::solve_phase1(): IDA* search for Phase 1
     TwophaseSolver::solve_phase2(): Phase 2 permutation solver
 
@@ -40,7 +43,7 @@ NOTES:
 // Global configuration
 // ============================================================================
 
-const int target_length = 45;                 // Target solution length (must be under 45 moves)
+int target_length = 45;                       // Target solution length (must be under 45 moves)
 const long long phase2limit = 0xffffffffffffffLL; // Phase 2 search limit
 const int skipwrite   = 0;   // Do not suppress writing pruning tables
 const int axesmask    = 63;  // Search all 6 axis/inversion orientations
@@ -78,17 +81,48 @@ TwophaseSolver::TwophaseSolver()
     : phase2probes(0),
       bestsol(MAX_MOVES),
       finished(0),
+      found(0),
+      target(0),
+      probe_limit(phase2limit),
       curm(0),
       solmap(0),
       seq(0),
       minmindepth(MAX_MOVES) {
 }
 
-void TwophaseSolver::solve(int seqarg, cubepos& cp) {
+moveseq TwophaseSolver::solve(int seqarg, cubepos& cp) {
+    search(seqarg, cp, MAX_MOVES, target_length, phase2limit);
+    return best_solution();
+}
+
+moveseq TwophaseSolver::solve_seeded(cubepos& cp, const moveseq& seed, int target, long long budget) {
+    // The seed must be an answer for cp, like best_solution()'s
+    cubepos cpt;
+    for (size_t i = 0; i < seed.size(); ++i) {
+        cpt.move(seed[i]);
+    }
+    if (cpt != cp) {
+        error("! seed sequence doesn't work");
+    }
+    phase2probes = 0;
+    if ((int)seed.size() <= target) {
+        return seed;
+    }
+    int bound = (int)seed.size() < MAX_MOVES ? (int)seed.size() : MAX_MOVES;
+    if (search(1, cp, bound, target, budget)) {
+        return best_solution();
+    }
+    return seed;
+}
+
+int TwophaseSolver::search(int seqarg, cubepos& cp, int bound, int target_arg, long long budget) {
     pos = cp;
     phase2probes = 0;
-    bestsol = MAX_MOVES;
+    bestsol = bound;
     finished = 0;
+    found = 0;
+    target = target_arg;
+    probe_limit = budget;
     seq = seqarg;
 
     // Build six orientations: three axes × two inversions. We keep the
@@ -143,10 +177,13 @@ void TwophaseSolver::solve(int seqarg, cubepos& cp) {
             if (finished || d >= bestsol || d < mindepth[curm]) {
                 continue;
             }
-            solve_phase1(kc6[curm], pc6[curm], d, 0, ALLMOVEMASK, CANONSEQSTART);
+            solve_phase1(kc6[curm], pc6[curm], mindepth[curm], d, 0, ALLMOVEMASK, CANONSEQSTART);
         }
     }
+    return found;
+}
 
+moveseq TwophaseSolver::best_solution() {
     // Rebuild the move sequence in the original orientation.
     moveseq sol;
     int m = cubepos::invm[(solmap % 3) * CUBE_SYMM];
@@ -166,10 +203,10 @@ void TwophaseSolver::solve(int seqarg, cubepos& cp) {
     if (cpt != pos) {
         error("! move sequence doesn't work");
     }
-    display_solution(sol);
+    return sol;
 }
 
-void TwophaseSolver::solve_phase1(const CubeSymmetry& kc, const permcube& pc, int togo, int sofar, int movemask, int canon) {
+void TwophaseSolver::solve_phase1(const CubeSymmetry& kc, const permcube& pc, int dist, int togo, int sofar, int movemask, int canon) {
     if (togo == 0) {
         if (kc == identity_kc) {
             solve_phase2(pc, sofar);
@@ -181,24 +218,41 @@ void TwophaseSolver::solve_phase1(const CubeSymmetry& kc, const permcube& pc, in
     }
 
     --togo;
-    CubeSymmetry kc2;
-    permcube pc2;
-    int newmovemask = 0;
 
-    while (!finished && movemask) {
+    // Expand in two passes: first compute every child's table index and
+    // prefetch it, then evaluate the children in move order. The lookups
+    // are random accesses into a table far larger than cache, so issuing
+    // them together overlaps the misses instead of taking them one by one.
+    CubeSymmetry kc2[NMOVES];
+    int offs[NMOVES];
+    unsigned char mvs[NMOVES];
+    int nchildren = 0;
+
+    while (movemask) {
         int mv = ffs(movemask) - 1;
         movemask &= movemask - 1;
 
-        kc2 = kc;
-        kc2.move(mv);
-        int nd = phase1::lookup(kc2, togo, newmovemask);
+        CubeSymmetry& child = kc2[nchildren];
+        child = kc;
+        child.move(mv);
+        offs[nchildren] = phase1::index(child);
+        phase1::prefetch(offs[nchildren]);
+        mvs[nchildren++] = static_cast<unsigned char>(mv);
+    }
+
+    permcube pc2;
+    int newmovemask = 0;
+
+    for (int i = 0; i < nchildren && !finished; ++i) {
+        int nd = phase1::lookup_at(kc2[i], offs[i], dist, togo, newmovemask);
 
         if (nd <= togo && (togo == nd || togo + nd >= 5)) {
+            int mv = mvs[i];
             pc2 = pc;
             pc2.move(mv);
             moves[sofar] = static_cast<unsigned char>(mv);
             int new_canon = cubepos::next_cs(canon, mv);
-            solve_phase1(kc2, pc2, togo, sofar + 1, newmovemask & cubepos::cs_mask(new_canon), new_canon);
+            solve_phase1(kc2[i], pc2, nd, togo, sofar + 1, newmovemask & cubepos::cs_mask(new_canon), new_canon);
         }
     }
 }
@@ -208,22 +262,20 @@ void TwophaseSolver::solve_phase2(const permcube& pc, int sofar) {
     int d = phase2::lookup(pc);
 
     if (d + sofar < bestsol) {
-        moveseq ms = phase2::solve(pc, bestsol - sofar - 1);
-        if (static_cast<int>(ms.size()) + sofar < bestsol &&
-            (!ms.empty() || pc == identity_pc)) {
-            bestsol = static_cast<int>(ms.size()) + sofar;
-            for (size_t i = 0; i < ms.size(); ++i) {
-                moves[sofar + static_cast<int>(i)] = static_cast<unsigned char>(ms[i]);
-            }
+        // Phase 2 writes straight into moves[] after the phase 1 prefix.
+        int len = phase2::solve(pc, bestsol - sofar - 1, moves + sofar, d);
+        if (len >= 0 && len + sofar < bestsol) {
+            bestsol = len + sofar;
             memcpy(bestmoves, moves, bestsol);
             solmap = curm;
-            if (bestsol <= target_length) {
+            found = 1;
+            if (bestsol <= target) {
                 finished = 1;
             }
         }
     }
 
-    if (phase2probes >= phase2limit && bestsol < MAX_MOVES) {
+    if (phase2probes >= probe_limit && bestsol < MAX_MOVES) {
         finished = 1;
     }
 }
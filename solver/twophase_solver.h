@@ -29,6 +29,8 @@ CONFIGURATION:
 CLASS OVERVIEW:
     TwophaseSolver orchestrates the two-phase search:
         - solve(): Entry point, tries all orientations
+        - solve_seeded(): Same search bounded by a known solution and a
+          phase 1 leaf budget (trajectories of neighbouring positions)
         - solve_phase1(): IDA* search for Phase 1
         - solve_phase2(): Phase 2 permutation solver
         - Internal state tracks best solution, move sequences, and symmetry info
@@ -44,7 +46,7 @@ FUNCTIONS:
 // Compile‑time limits used for static array sizes.
 #define MAX_MOVES   30           // Hard upper bound on move count
 
-extern const int target_length;       // Target maximum solution length
+extern int target_length;             // Target maximum solution length (settable from the CLI)
 extern const long long phase2limit;   // Limit on phase 2 node expansions
 extern const int skipwrite;           // If non‑zero, do not write pruning tables to disk
 extern const int axesmask;            // Mask controlling which cube orientations are searched
@@ -66,17 +68,38 @@ public:
     // Main entry point: Solve a single cube position.
     //   seqarg: sequence type (move encoding)
     //   cp: cube position to solve
-    void solve(int seqarg, cubepos& cp);
+    // Returns the solution, already checked against cp.
+    moveseq solve(int seqarg, cubepos& cp);
+
+    // Improve on a known solution of cp. seed must be a move sequence like
+    // solve() returns (turned on the solved cube it gives cp). Only
+    // solutions shorter than seed are searched for; the search stops at
+    // the first one of at most `target` moves or once `budget` phase 1
+    // leaves were handed to phase 2, and seed is returned if nothing
+    // shorter turned up.
+    moveseq solve_seeded(cubepos& cp, const moveseq& seed, int target, long long budget);
+
+    // Phase 1 leaves handed to phase 2 during the last solve().
+    long long probes() const { return phase2probes; }
 
 private:
+    // Search cp for solutions shorter than bound; stops at one of at most
+    // target moves or after budget phase 2 probes once any was found.
+    // Returns whether a solution shorter than bound was found.
+    int search(int seqarg, cubepos& cp, int bound, int target, long long budget);
+
+    // The best solution found by search(), in cp's orientation and checked
+    moveseq best_solution();
+
     // Phase 1: Reduce the cube into the Kociemba subgroup using pruning tables.
     //   kc: CubeSymmetry coordinate
     //   pc: Permcube representation
+    //   dist: phase 1 distance of kc (decodes compact table entries)
     //   togo: moves left to reach subgroup
     //   sofar: moves used so far
     //   movemask: valid moves mask
     //   canon: canonical orientation index
-    void solve_phase1(const CubeSymmetry& kc, const permcube& pc, int togo, int sofar, int movemask, int canon);
+    void solve_phase1(const CubeSymmetry& kc, const permcube& pc, int dist, int togo, int sofar, int movemask, int canon);
 
     // Phase 2: Solve the remaining permutation problem once orientations are fixed by phase 1.
     //   pc: Permcube representation
@@ -88,6 +111,9 @@ private:
     long long phase2probes;
     int bestsol;
     int finished;
+    int found;              // search() beat its bound
+    int target;             // Stop at a solution of at most this many moves
+    long long probe_limit;  // Stop after this many phase 2 probes
     int curm;
     int solmap;
     int seq;
@@ -0,0 +1,191 @@
+#include "verify.h"
+#include <thread>
+
+#if defined(__x86_64__) || defined(__i386__)
+#include <tmmintrin.h>
+#define VERIFY_SSSE3 1
+#elif defined(__aarch64__)
+#include <arm_neon.h>
+#define VERIFY_NEON 1
+#endif
+
+/*
+===============================================================================
+ VERIFY.CPP - BULK MOVE APPLICATION AND SOLUTION CHECKS
+===============================================================================
+
+PURPOSE:
+    Runs the checks described in verify.h: each record's moves are applied
+    to its position and the result compared with the solved cube.
+
+KEY FUNCTIONS:
+    - bulk_verify::init(): copies the move tables into shuffle layout
+    - bulk_verify::apply(): the per-position kernel (SSSE3, NEON or scalar)
+    - bulk_verify::check_batch(): splits a buffer into records and checks
+      them on several threads
+
+NOTES:
+    - A position is a corner vector (8 bytes used) and an edge vector (12
+      bytes used) for the whole move sequence; only the result is stored
+    - pshufb only looks at the low 4 bits of an index, so the SSSE3 kernel
+      looks values up in entries 0-15 and 16-31 of a table and keeps the
+      second result where the value is above 15
+    - The SSSE3 code is compiled for that target only and chosen with
+      __builtin_cpu_supports, so the binary still runs on plain x86-64
+*/
+
+using namespace std;
+
+int bulk_verify::allow_simd = 1;
+int bulk_verify::simd = 0;
+int bulk_verify::initialized = 0;
+
+// corner_trans/edge_trans per move, padded to 32 entries for vector loads
+alignas(16) static unsigned char corner_shuffle[NMOVES][32];
+alignas(16) static unsigned char edge_shuffle[NMOVES][32];
+
+void bulk_verify::init() {
+    if (!initialized) {
+        for (int m = 0; m < NMOVES; m++) {
+            for (int v = 0; v < CUBIES; v++) {
+                corner_shuffle[m][v] = cubepos::corner_trans[m][v];
+                edge_shuffle[m][v] = cubepos::edge_trans[m][v];
+            }
+        }
+        initialized = 1;
+    }
+#if defined(VERIFY_SSSE3)
+    simd = allow_simd && __builtin_cpu_supports("ssse3");
+#elif defined(VERIFY_NEON)
+    simd = allow_simd;
+#else
+    simd = 0;
+#endif
+}
+
+const char* bulk_verify::kernel() {
+#if defined(VERIFY_SSSE3)
+    return simd ? "ssse3" : "scalar";
+#elif defined(VERIFY_NEON)
+    return simd ? "neon" : "scalar";
+#else
+    return "scalar";
+#endif
+}
+
+#ifdef VERIFY_SSSE3
+__attribute__((target("ssse3")))
+static void apply_ssse3(cubepos& cp, const unsigned char* moves, int count) {
+    alignas(16) unsigned char buf[32] = {0};
+    memcpy(buf, cp.c, 8);
+    memcpy(buf + 16, cp.e, 12);
+    __m128i c = _mm_load_si128((const __m128i*)buf);
+    __m128i e = _mm_load_si128((const __m128i*)(buf + 16));
+    const __m128i fifteen = _mm_set1_epi8(15);
+    for (int i = 0; i < count; i++) {
+        const __m128i* ct = (const __m128i*)corner_shuffle[moves[i]];
+        const __m128i* et = (const __m128i*)edge_shuffle[moves[i]];
+        __m128i chigh = _mm_cmpgt_epi8(c, fifteen);
+        __m128i ehigh = _mm_cmpgt_epi8(e, fifteen);
+        c = _mm_or_si128(_mm_andnot_si128(chigh, _mm_shuffle_epi8(_mm_load_si128(ct), c)),
+                         _mm_and_si128(chigh, _mm_shuffle_epi8(_mm_load_si128(ct + 1), c)));
+        e = _mm_or_si128(_mm_andnot_si128(ehigh, _mm_shuffle_epi8(_mm_load_si128(et), e)),
+                         _mm_and_si128(ehigh, _mm_shuffle_epi8(_mm_load_si128(et + 1), e)));
+    }
+    _mm_store_si128((__m128i*)buf, c);
+    _mm_store_si128((__m128i*)(buf + 16), e);
+    memcpy(cp.c, buf, 8);
+    memcpy(cp.e, buf + 16, 12);
+}
+#endif
+
+#ifdef VERIFY_NEON
+static void apply_neon(cubepos& cp, const unsigned char* moves, int count) {
+    unsigned char buf[32] = {0};
+    memcpy(buf, cp.c, 8);
+    memcpy(buf + 16, cp.e, 12);
+    uint8x16_t c = vld1q_u8(buf);
+    uint8x16_t e = vld1q_u8(buf + 16);
+    for (int i = 0; i < count; i++) {
+        const unsigned char* ct = corner_shuffle[moves[i]];
+        const unsigned char* et = edge_shuffle[moves[i]];
+        uint8x16x2_t ctab = {{vld1q_u8(ct), vld1q_u8(ct + 16)}};
+        uint8x16x2_t etab = {{vld1q_u8(et), vld1q_u8(et + 16)}};
+        c = vqtbl2q_u8(ctab, c);
+        e = vqtbl2q_u8(etab, e);
+    }
+    vst1q_u8(buf, c);
+    vst1q_u8(buf + 16, e);
+    memcpy(cp.c, buf, 8);
+    memcpy(cp.e, buf + 16, 12);
+}
+#endif
+
+void bulk_verify::apply(cubepos& cp, const unsigned char* moves, int count) {
+#if defined(VERIFY_SSSE3)
+    if (simd) {
+        apply_ssse3(cp, moves, count);
+        return;
+    }
+#elif defined(VERIFY_NEON)
+    if (simd) {
+        apply_neon(cp, moves, count);
+        return;
+    }
+#endif
+    for (int i = 0; i < count; i++)
+        cp.move(moves[i]);
+}
+
+unsigned char bulk_verify::check(const unsigned char* record) {
+    int count = record[VERIFY_STATE_BYTES];
+    const unsigned char* moves = record + VERIFY_STATE_BYTES + 1;
+    for (int i = 0; i < VERIFY_STATE_BYTES; i++)
+        if (record[i] >= CUBIES)
+            return VERIFY_BAD_RECORD;
+    for (int i = 0; i < count; i++)
+        if (moves[i] >= NMOVES)
+            return VERIFY_BAD_RECORD;
+    cubepos cp;
+    memcpy(cp.c, record, 8);
+    memcpy(cp.e, record + 8, 12);
+    apply(cp, moves, count);
+    return cp == identity_cube ? VERIFY_OK : VERIFY_WRONG;
+}
+
+// Fewer records than this per thread are not worth starting it for
+const size_t VERIFY_RECORDS_PER_THREAD = 4096;
+
+size_t bulk_verify::check_batch(const unsigned char* data, size_t size,
+                                vector<unsigned char>& out, int threads) {
+    init();
+    vector<size_t> offsets;
+    size_t pos = 0;
+    while (pos + VERIFY_STATE_BYTES + 1 <= size) {
+        size_t next = pos + VERIFY_STATE_BYTES + 1 + data[pos + VERIFY_STATE_BYTES];
+        if (next > size)
+            break;
+        offsets.push_back(pos);
+        pos = next;
+    }
+
+    size_t first = out.size();
+    size_t count = offsets.size();
+    out.resize(first + count);
+    if (threads <= 0)
+        threads = (int)thread::hardware_concurrency();
+    threads = (int)min((size_t)max(threads, 1), count / VERIFY_RECORDS_PER_THREAD + 1);
+
+    auto work = [&](int t) {
+        size_t end = count * (t + 1) / threads;
+        for (size_t i = count * t / threads; i < end; i++)
+            out[first + i] = check(data + offsets[i]);
+    };
+    vector<thread> workers;
+    for (int t = 1; t < threads; t++)
+        workers.emplace_back(work, t);
+    work(0);
+    for (auto& w : workers)
+        w.join();
+    return pos;
+}
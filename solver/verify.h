@@ -0,0 +1,70 @@
+#ifndef VERIFY_H
+#define VERIFY_H
+
+#include "cubepos.h"
+
+// ============================================================================
+// BULK VERIFICATION - CHECK SOLUTIONS AGAINST THEIR POSITIONS
+// ============================================================================
+//
+// PURPOSE:
+//   Applies move sequences to batches of cubepos states and checks that
+//   each one ends at the solved cube, so bulk solver output can be checked
+//   at pipe speed instead of by replaying moves in Python.
+//
+// RECORDS (twophase --verify):
+//   20 bytes of cubepos (c[8] then e[12]), one length byte, then that many
+//   move indices (face * 3 + twist - 1) that should solve the position.
+//   Moves act like cubepos::move(), i.e. they are turned on the position in
+//   order; a TwophaseSolver answer solves its position once inverted (see
+//   cubepos::invert_sequence). One result byte per record: VERIFY_OK,
+//   VERIFY_WRONG, or VERIFY_BAD_RECORD for cubie values or move indices out
+//   of range.
+//
+// KERNELS:
+//   cubepos::move() maps each cubie value through corner_trans/edge_trans,
+//   24-entry byte tables. With SSSE3 (picked at run time) or NEON each
+//   table is held in registers and the corners and edges are translated
+//   with byte shuffles, two per table on SSSE3 and one on NEON; otherwise
+//   the records go through cubepos::move() itself.
+//
+// ============================================================================
+
+const unsigned char VERIFY_WRONG = 0;         // The moves do not solve the position
+const unsigned char VERIFY_OK = 1;            // The moves solve the position
+const unsigned char VERIFY_BAD_RECORD = 255;  // Cubie value or move index out of range
+
+const int VERIFY_STATE_BYTES = 20;            // cubepos c[8] then e[12]
+
+// Bulk verification - singleton pattern with static methods
+class bulk_verify {
+public:
+    // Fill the shuffle tables from cubepos::corner_trans/edge_trans and
+    // pick the kernel. check_batch() calls it; call it once before using
+    // apply() or check() directly.
+    static void init();
+
+    // Turn count moves on cp (as cp.move() would, one after another)
+    static void apply(cubepos& cp, const unsigned char* moves, int count);
+
+    // Result byte of one record (state, length, moves)
+    static unsigned char check(const unsigned char* record);
+
+    // Check every complete record at the start of data[0..size), appending
+    // one result byte each to out, on up to `threads` threads (0: one per
+    // CPU). Returns the bytes consumed; a trailing partial record is left.
+    static size_t check_batch(const unsigned char* data, size_t size,
+                              vector<unsigned char>& out, int threads = 1);
+
+    // Name of the kernel in use ("ssse3", "neon" or "scalar")
+    static const char* kernel();
+
+    // Set to 0 before init() to force the scalar kernel (benchmarks)
+    static int allow_simd;
+
+private:
+    static int simd;
+    static int initialized;
+};
+
+#endif